@@ -0,0 +1,56 @@
+"""
+Compares the parabolic-fit ('fit') and sonic-tangency ('tangency') CJ speed
+algorithms of postshock.CJspeed: CJ speed, number of gas.equilibrate calls
+and wall time for a set of H2/O2/Ar and CH4/O2 mixtures.
+
+Run from the repository root:
+    python -m benchmarks.bench_cjspeed
+"""
+import time
+
+import cantera as ct
+
+from sdtoolbox.postshock import CJspeed
+
+MECH = 'mechs/gri30_highT.yaml'
+P1 = 100000.
+T1 = 300.
+MIXTURES = ['H2:2,O2:1',
+            'H2:2,O2:1,AR:7',
+            'H2:1,O2:1,AR:5',
+            'H2:2,O2:1,N2:3.76',
+            'CH4:1,O2:2',
+            'CH4:1,O2:1.5',
+            'CH4:1,O2:2,AR:7']
+
+_equilibrate = ct.Solution.equilibrate
+counter = {'equilibrate': 0}
+
+
+def counted_equilibrate(self, *args, **kwargs):
+    counter['equilibrate'] += 1
+    return _equilibrate(self, *args, **kwargs)
+
+
+def run(q, method):
+    counter['equilibrate'] = 0
+    start = time.perf_counter()
+    cj_speed = CJspeed(P1, T1, q, MECH, method=method)
+    return cj_speed, counter['equilibrate'], time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    ct.Solution.equilibrate = counted_equilibrate
+    print('%-20s %-9s %12s %12s %10s'
+          % ('mixture', 'method', 'CJ speed', 'equilibrate', 'time, s'))
+    totals = {}
+    for q in MIXTURES:
+        for method in ['fit', 'tangency']:
+            cj_speed, calls, elapsed = run(q, method)
+            total = totals.setdefault(method, [0, 0.])
+            total[0] += calls
+            total[1] += elapsed
+            print('%-20s %-9s %12.3f %12d %10.3f' % (q, method, cj_speed, calls, elapsed))
+    for method, (calls, elapsed) in totals.items():
+        print('%-20s %-9s %12s %12d %10.3f' % ('total', method, '', calls, elapsed))
+    ct.Solution.equilibrate = _equilibrate
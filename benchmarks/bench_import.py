@@ -0,0 +1,42 @@
+"""
+Measures the cold-start cost of importing the toolbox: every statement is run
+in a fresh interpreter, reporting the wall time (best of several runs) and
+whether matplotlib was loaded as a side effect.
+
+Run from the repository root:
+    python -m benchmarks.bench_import
+"""
+import subprocess
+import sys
+
+STATEMENTS = ['import cantera',
+              'import sdtoolbox',
+              'from sdtoolbox.cp import cpsolve',
+              'from sdtoolbox.cv import cvsolve',
+              'from sdtoolbox.postshock import CJspeed',
+              'from sdtoolbox.utilities import cv_plot']
+REPEAT = 5
+
+CODE = '''
+import sys, time
+start = time.perf_counter()
+%s
+print(time.perf_counter() - start, 'matplotlib' in sys.modules)
+'''
+
+
+def run(statement):
+    times = []
+    for _ in range(REPEAT):
+        result = subprocess.run([sys.executable, '-c', CODE % statement],
+                                capture_output=True, text=True, check=True)
+        elapsed, matplotlib = result.stdout.split()
+        times.append(float(elapsed))
+    return min(times), matplotlib == 'True'
+
+
+if __name__ == '__main__':
+    print('%-42s %9s %11s' % ('statement', 'time, ms', 'matplotlib'))
+    for statement in STATEMENTS:
+        elapsed, matplotlib = run(statement)
+        print('%-42s %9.1f %11s' % (statement, 1000*elapsed, matplotlib))
@@ -0,0 +1,126 @@
+"""
+Measures the cost of the post-processing in cvsolve and cpsolve (pressure or
+density, temperature gradient and mole fractions of every output point) at
+10000 output points, compared to the per-point, per-species loop and the
+induction time search used before and to the integration itself. Also checks
+that both give the same results.
+
+Run from the repository root:
+    python -m benchmarks.bench_postprocessing
+"""
+import time
+
+import cantera as ct
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from sdtoolbox.cp import CPSys, cpsolve
+from sdtoolbox.cv import CVSys, cvsolve
+from sdtoolbox.mechcache import get_solution
+
+MECH = 'mechs/gri30_highT.yaml'
+Q = 'H2:2,O2:1,AR:7'
+P1 = 200000.
+T1 = 1200.
+T_END = 1e-4
+N = 10000
+
+
+def loop_cv(gas, T, Y, r0):
+    # per-point post-processing as done before
+    P = np.zeros(len(T))
+    temp_grad = np.zeros(len(T))
+    X = np.zeros(Y.shape)
+    for i, Ti in enumerate(T):
+        gas.TDY = Ti, r0, Y[:, i]
+        wt = gas.mean_molecular_weight
+        s = 0
+        for z in range(gas.n_species):
+            w = gas.molecular_weights[z]
+            e = ct.gas_constant*Ti*(gas.standard_enthalpies_RT[z]/w - 1/wt)
+            s = s + e*w*gas.net_production_rates[z]
+        temp_grad[i] = -s/(r0*gas.cv_mass)
+        P[i] = gas.P
+        X[:, i] = gas.X
+    return {'P': P, 'dTdt': temp_grad, 'speciesX': X}
+
+
+def loop_cp(gas, T, Y, P0):
+    D = np.zeros(len(T))
+    temp_grad = np.zeros(len(T))
+    X = np.zeros(Y.shape)
+    for i, Ti in enumerate(T):
+        gas.TPY = Ti, P0, Y[:, i]
+        s = 0
+        for z in range(gas.n_species):
+            w = gas.molecular_weights[z]
+            e = ct.gas_constant*Ti*(gas.standard_enthalpies_RT[z]/w)
+            s = s + e*w*gas.net_production_rates[z]
+        temp_grad[i] = -s/(gas.density*gas.cp_mass)
+        D[i] = gas.density
+        X[:, i] = gas.X
+    return {'D': D, 'dTdt': temp_grad, 'speciesX': X}
+
+
+def loop_times(time, temp_grad):
+    # search of induction and exothermic times as done before
+    n = temp_grad.argmax()
+    k = 0
+    d = temp_grad[0]
+    while d < 0.1*max(temp_grad) and k < n:
+        k = k + 1
+        d = temp_grad[k]
+    ind_time_10 = time[k]
+    k = 0
+    d = temp_grad[0]
+    while d < 0.9*max(temp_grad) and k < n:
+        k = k + 1
+        d = temp_grad[k]
+    ind_time_90 = time[k]
+    tstep1 = tstep2 = 0
+    flag1 = flag2 = 0
+    for j, tgrad in enumerate(list(temp_grad)):
+        if flag1 == 0:
+            if tgrad > 0.5*max(temp_grad):
+                flag1 = 1
+                tstep1 = j
+        elif flag2 == 0:
+            if tgrad < 0.5*max(temp_grad):
+                flag2 = 1
+                tstep2 = j
+    return {'ind_time': time[n], 'ind_time_10': ind_time_10, 'ind_time_90': ind_time_90,
+            'exo_time': time[tstep2] - time[tstep1] if tstep2 else 0}
+
+
+def run(name, solve, system, loop):
+    t_eval = np.linspace(0, T_END, N)
+    gas = get_solution(MECH)
+    gas.TPX = T1, P1, Q
+    state = gas.density if name == 'CV' else gas.P
+    y0 = np.hstack((gas.T, gas.Y))
+    start = time.perf_counter()
+    solve_ivp(system(gas), [0., T_END], y0, method='LSODA', jac=system(gas).jac,
+              atol=1e-8, rtol=1e-5, max_step=1e-5, t_eval=t_eval)
+    integration = time.perf_counter() - start
+
+    gas.TPY = T1, P1, y0[1:]
+    start = time.perf_counter()
+    out = solve(gas, t_end=T_END, t_eval=t_eval)
+    total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ref = loop(gas, out['T'], out['speciesY'], state)
+    ref.update(loop_times(out['time'], ref['dTdt']))
+    looped = time.perf_counter() - start
+
+    print('%s: integration %.3f s, post-processing %.3f s (loop %.3f s, speedup %.1f)'
+          % (name, integration, total - integration, looped,
+             looped/max(total - integration, 1e-9)))
+    for key in ref:
+        error = np.max(np.abs(out[key] - ref[key])/(np.abs(ref[key]).max() or 1))
+        print('    max. relative difference in %-11s %.2e' % (key, error))
+
+
+if __name__ == '__main__':
+    run('CV', cvsolve, CVSys, loop_cv)
+    run('CP', cpsolve, CPSys, loop_cp)
@@ -0,0 +1,63 @@
+"""
+Compares the per-point reconstruction of ZND profile properties (temperature,
+sound speed, gamma, molecular weight, thermicity and temperature derivative,
+as previously done in zndsolve) with the batched one used by zndsolve and
+stgsolve, for 10^4 and 10^5 output points of a gri30 H2-O2-Ar detonation.
+
+Run from the repository root:
+    python -m benchmarks.bench_profiles
+"""
+import time
+
+import numpy as np
+
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.postshock import CJspeed, PostShock_fr
+from sdtoolbox.thermo import soundspeed_fr
+from sdtoolbox.znd import _profile_properties, getTempDeriv, getThermicity, zndsolve
+
+MECH = 'mechs/gri30_highT.yaml'
+Q = 'H2:2,O2:1,AR:7'
+P1 = 100000.
+T1 = 300.
+T_END = 2e-5
+
+
+def loop(gas, rho, P, Y, r1, U1):
+    T = np.zeros(len(rho))
+    af = np.zeros(len(rho))
+    thermicity = np.zeros(len(rho))
+    dTdt = np.zeros(len(rho))
+    for i in range(len(rho)):
+        gas.DPY = rho[i], P[i], Y[:, i]
+        T[i] = gas.T
+        af[i] = soundspeed_fr(gas)
+        thermicity[i] = getThermicity(gas)
+        dTdt[i] = getTempDeriv(gas, r1, U1)
+    return T, af, thermicity, dTdt
+
+
+if __name__ == '__main__':
+    gas1 = get_solution(MECH)
+    gas1.TPX = T1, P1, Q
+    U1 = CJspeed(P1, T1, Q, MECH, method='tangency')
+    for n in [10000, 100000]:
+        gas = PostShock_fr(U1, P1, T1, Q, MECH)
+        start = time.perf_counter()
+        out = zndsolve(gas, gas1, U1, t_end=T_END, t_eval=np.linspace(0, T_END, n))
+        total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _profile_properties(gas, out['rho'], out['P'], out['species'])
+        batched = time.perf_counter() - start
+
+        start = time.perf_counter()
+        T, af, thermicity, dTdt = loop(gas, out['rho'], out['P'], out['species'],
+                                       gas1.density, U1)
+        looped = time.perf_counter() - start
+        error = max(np.max(np.abs(out[key] - value))/np.abs(value).max()
+                    for key, value in [('T', T), ('af', af), ('thermicity', thermicity),
+                                       ('dTdt', dTdt)])
+        print('%6d points: zndsolve %.3f s, properties %.3f s (per point loop %.3f s,'
+              ' speedup %.1f), max. relative difference %.1e'
+              % (n, total, batched, looped, looped/batched, error))
@@ -0,0 +1,76 @@
+"""
+Compares ignition delay computations by cvsolve and cpsolve with the
+analytic Jacobian (CVSys.jac, CPSys.jac) and with the finite difference
+Jacobian estimated by the integrator: wall time, number of right-hand side
+and Jacobian evaluations and induction times.
+
+Run from the repository root:
+    python -m benchmarks.bench_reactor_jacobian
+"""
+import time
+
+import numpy as np
+
+import sdtoolbox.cp
+import sdtoolbox.cv
+from sdtoolbox.cp import cpsolve
+from sdtoolbox.cv import cvsolve
+from sdtoolbox.mechcache import get_solution
+
+MECH = 'mechs/gri30_highT.yaml'
+CASES = [('H2:2,O2:1,AR:7', 1200., 200000., 1e-3),
+         ('CH4:1,O2:2,AR:7', 1600., 200000., 2e-3)]
+METHODS = ['LSODA', 'BDF', 'Radau']
+
+
+class Counted(object):
+    """
+    Wraps reactor system counting right-hand side and Jacobian evaluations.
+    """
+    calls = {'rhs': 0, 'jac': 0}
+
+    def __init__(self, system):
+        self.system = system
+
+    def __call__(self, t, y):
+        Counted.calls['rhs'] += 1
+        return self.system(t, y)
+
+    def jac(self, t, y):
+        Counted.calls['jac'] += 1
+        return self.system.jac(t, y)
+
+
+def counted(cls):
+    return lambda gas: Counted(cls(gas))
+
+
+def run(solve, q, T, P, t_end, method, jacobian):
+    gas = get_solution(MECH)
+    gas.TPX = T, P, q
+    Counted.calls = {'rhs': 0, 'jac': 0}
+    start = time.perf_counter()
+    out = solve(gas, t_end=t_end, max_step=t_end, Method=method, jacobian=jacobian)
+    return time.perf_counter() - start, dict(Counted.calls), out['ind_time']
+
+
+if __name__ == '__main__':
+    CVSys = sdtoolbox.cv.CVSys
+    CPSys = sdtoolbox.cp.CPSys
+    sdtoolbox.cv.CVSys = counted(CVSys)
+    sdtoolbox.cp.CPSys = counted(CPSys)
+    print('%-3s %-17s %-6s %-9s %9s %7s %6s %12s'
+          % ('', 'mixture', 'method', 'jacobian', 'time, s', 'rhs', 'jac', 'ind. time'))
+    for name, solve in [('CV', cvsolve), ('CP', cpsolve)]:
+        for q, T, P, t_end in CASES:
+            for method in METHODS:
+                times = []
+                for jacobian in ['fd', 'analytic']:
+                    elapsed, calls, ind_time = run(solve, q, T, P, t_end, method, jacobian)
+                    times.append(elapsed)
+                    print('%-3s %-17s %-6s %-9s %9.3f %7d %6d %12.5e'
+                          % (name, q, method, jacobian, elapsed,
+                             calls['rhs'], calls['jac'], ind_time))
+                print('%-3s %-17s %-6s speedup %.2f' % ('', '', method, np.divide(*times)))
+    sdtoolbox.cv.CVSys = CVSys
+    sdtoolbox.cp.CPSys = CPSys
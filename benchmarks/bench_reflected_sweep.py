@@ -0,0 +1,83 @@
+"""
+Compares independent reflected shock calculations (PostShock_fr/eq followed by
+reflected_fr/eq for every incident shock speed) with reflections.reflected_sweep
+for a sweep of incident shock speeds in O2-Ar and H2-O2-Ar mixtures, reporting
+the wall time, the number of equilibrium calculations (Cantera equilibrate
+calls) and the largest relative difference of the reflected shock states.
+
+Run from the repository root:
+    python -m benchmarks.bench_reflected_sweep
+"""
+import io
+import time
+from contextlib import redirect_stdout
+
+import cantera as ct
+import numpy as np
+
+from sdtoolbox import config
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.postshock import PostShock_eq, PostShock_fr
+from sdtoolbox.reflections import reflected_eq, reflected_fr, reflected_sweep
+
+MECH = 'mechs/gri30_highT.yaml'
+CASES = [('O2:1,AR:4', 5000., 295., np.linspace(700., 2500., 50)),
+         ('H2:2,O2:1,AR:7', 10000., 295., np.linspace(1900., 3200., 50))]
+
+calls = [0]
+_equilibrate = ct.Solution.equilibrate
+
+
+def equilibrate(self, *args, **kwargs):
+    calls[0] += 1
+    return _equilibrate(self, *args, **kwargs)
+
+
+def independent(UI, P1, T1, q, frozen):
+    gas1 = get_solution(MECH)
+    gas1.TPX = T1, P1, q
+    output = np.full((len(UI), 3), np.nan)
+    for k, U in enumerate(UI):
+        gas3 = get_solution(MECH)
+        try:
+            if frozen:
+                gas2 = PostShock_fr(U, P1, T1, q, MECH)
+                [p3, UR, gas3] = reflected_fr(gas1, gas2, gas3, U)
+            else:
+                gas2 = PostShock_eq(U, P1, T1, q, MECH)
+                [p3, UR, gas3] = reflected_eq(gas1, gas2, gas3, U)
+        except AttributeError:
+            # reflected_fr failed to converge
+            continue
+        output[k] = (p3, gas3.T, UR)
+    return output
+
+
+def measure(function, *args):
+    calls[0] = 0
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        result = function(*args)
+    return result, time.perf_counter() - start, calls[0]
+
+
+if __name__ == '__main__':
+    # count the equilibrium calculations, without the on-disk cache of PostShock_eq
+    config.resultCache = False
+    ct.Solution.equilibrate = equilibrate
+    print('%-16s %6s %6s %8s %12s %12s %10s %10s %10s' % (
+        'mixture', 'model', 'points', 'failed', 'loop, s', 'sweep, s', 'loop eq',
+        'sweep eq', 'max diff'))
+    for q, P1, T1, UI in CASES:
+        gas1 = get_solution(MECH)
+        gas1.TPX = T1, P1, q
+        for frozen in [True, False]:
+            reference, looped, looped_calls = measure(independent, UI, P1, T1, q, frozen)
+            output, swept, swept_calls = measure(reflected_sweep, gas1, UI, frozen)
+            difference = max(np.nanmax(np.abs(output[key]/reference[:, k] - 1))
+                             for k, key in enumerate(['P3', 'T3', 'UR']))
+            failed = '%d/%d' % (np.sum(np.isnan(reference[:, 1])),
+                                np.sum(np.isnan(output['T3'])))
+            print('%-16s %6s %6d %8s %12.3f %12.3f %10d %10d %10.2e' % (
+                q, 'fr' if frozen else 'eq', len(UI), failed, looped, swept,
+                looped_calls, swept_calls, difference))
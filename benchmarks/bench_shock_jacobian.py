@@ -0,0 +1,67 @@
+"""
+Compares finite-difference and analytic Jacobians in the frozen incident
+(shk_calc) and reflected (PostReflectedShock_fr) shock solvers: number of
+Newton iterations, gas state evaluations and wall time.
+
+Run from the repository root:
+    python -m benchmarks.bench_shock_jacobian
+"""
+import time
+
+import numpy as np
+
+from sdtoolbox.config import ERRFT, ERRFV, volumeBoundRatio
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.postshock import shk_calc
+from sdtoolbox.reflections import PostReflectedShock_fr
+
+MECH = 'mechs/gri30_highT.yaml'
+MIXTURES = ['H2:2,O2:1,AR:7', 'CH4:1,O2:2,AR:7']
+SPEEDS = np.linspace(1000., 2200., 13)
+P1 = 10000.
+T1 = 300.
+
+
+def run(q, jacobian):
+    gas1 = get_solution(MECH)
+    gas2 = get_solution(MECH)
+    gas3 = get_solution(MECH)
+    iterations = 0
+    calls = 0
+    results = []
+    start = time.perf_counter()
+    for U1 in SPEEDS:
+        gas1.TPX = T1, P1, q
+        gas2.TPX = T1, P1, q
+        [gas2, info] = shk_calc(U1, gas2, gas1, ERRFT, ERRFV,
+                                jacobian=jacobian, fullOutput=True)
+        iterations += info['iterations']
+        calls += info['state_calls']
+        u2 = np.sqrt((gas2.P-gas1.P)*(1/gas1.density-1/gas2.density))
+        # same initial guess as in reflected_fr
+        v2 = 1/gas2.density
+        v3 = v2/volumeBoundRatio
+        p3 = gas2.P + gas2.density*(U1**2)*(1-v3/v2)
+        gas3.TPX = gas2.T*p3*v3/(gas2.P*v2), p3, gas2.X
+        [gas3, info] = PostReflectedShock_fr(u2, gas2, gas3,
+                                             jacobian=jacobian, fullOutput=True)
+        iterations += info['iterations']
+        calls += info['state_calls']
+        results.append((gas2.T, gas2.P, gas3.T, gas3.P))
+    elapsed = time.perf_counter() - start
+    return iterations, calls, elapsed, np.array(results)
+
+
+if __name__ == '__main__':
+    print('%-18s %-9s %10s %12s %10s'
+          % ('mixture', 'jacobian', 'iterations', 'state calls', 'time, ms'))
+    for q in MIXTURES:
+        reference = None
+        for jacobian in ['fd', 'analytic']:
+            iterations, calls, elapsed, results = run(q, jacobian)
+            print('%-18s %-9s %10d %12d %10.1f' % (q, jacobian, iterations,
+                                                   calls, 1000*elapsed))
+            if reference is None:
+                reference = results
+        print('max relative difference: %.2e'
+              % np.max(np.abs(results/reference - 1)))
@@ -0,0 +1,71 @@
+"""
+Compares the equilibrium sound speed from equilibrium derivatives
+(thermo.soundspeed_eq(gas)) with the finite difference approximation
+(thermo.soundspeed_eq(gas, exact=False)) at CJ states of gri30 detonations,
+and the batch evaluation (thermo.soundspeed_eq_batch) with a loop over the
+points of a ZND profile.
+
+Run from the repository root:
+    python -m benchmarks.bench_soundspeed_eq
+"""
+import time
+
+import numpy as np
+
+from sdtoolbox import config
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.postshock import CJspeed, PostShock_eq, PostShock_fr
+from sdtoolbox.profiling import Profile
+from sdtoolbox.thermo import soundspeed_eq, soundspeed_eq_batch
+from sdtoolbox.znd import zndsolve
+
+MECH = 'mechs/gri30_highT.yaml'
+MIXTURES = ['H2:2,O2:1,AR:7', 'H2:2,O2:1,N2:3.76', 'CH4:1,O2:2', 'CH4:1,O2:0.5']
+P1 = 100000.
+T1 = 300.
+N = 50
+
+
+def measured(func, n):
+    with Profile() as profile:
+        value = func()
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    elapsed = (time.perf_counter() - start)/n
+    return value, elapsed, profile.report()['groups']['equilibrate']['calls']
+
+
+if __name__ == '__main__':
+    config.resultCache = False
+    print('%-20s %12s %12s %9s %9s %10s' % ('CJ state', 'fin. diff.', 'exact', 'equil.',
+                                            'speedup', 'rel. diff.'))
+    for q in MIXTURES:
+        U1 = CJspeed(P1, T1, q, MECH)
+        gas = PostShock_eq(U1, P1, T1, q, MECH)
+        fd, t_fd, n_fd = measured(lambda: soundspeed_eq(gas, exact=False), N)
+        ex, t_ex, n_ex = measured(lambda: soundspeed_eq(gas), N)
+        print('%-20s %12.5f %12.5f %4d/%-4d %9.2f %10.2e'
+              % (q, fd, ex, n_fd, n_ex, t_fd/t_ex, abs(fd - ex)/ex))
+
+    q = MIXTURES[0]
+    U1 = CJspeed(P1, T1, q, MECH)
+    gas1 = get_solution(MECH)
+    gas1.TPX = T1, P1, q
+    gas = PostShock_fr(U1, P1, T1, q, MECH)
+    out = zndsolve(gas, gas1, U1, t_end=2e-4)
+    states = (gas, out['T'], out['rho'], out['species'].T)
+
+    def loop():
+        ae = np.zeros(out['T'].size)
+        for i in range(ae.size):
+            gas.TDY = out['T'][i], out['rho'][i], out['species'][:, i]
+            ae[i] = soundspeed_eq(gas, exact=False)
+        return ae
+
+    ae_loop, t_loop, n_loop = measured(loop, 1)
+    ae_batch, t_batch, n_batch = measured(lambda: soundspeed_eq_batch(*states), 1)
+    print('\nZND profile, %d points: loop %.4f s (%d equilibrate), batch %.4f s '
+          '(%d equilibrate), max rel. diff. %.2e'
+          % (ae_loop.size, t_loop, n_loop, t_batch, n_batch,
+             np.max(np.abs(ae_loop - ae_batch)/ae_batch)))
@@ -0,0 +1,67 @@
+"""
+Compares the exact ideal-gas frozen sound speed with the finite difference
+approximation (thermo.soundspeed_fr(gas, exact=False)): cost of a single
+evaluation, of ZNDSys and StgSys right-hand side evaluations and of a whole
+zndsolve run for a gri30 H2-O2-Ar detonation.
+
+Run from the repository root:
+    python -m benchmarks.bench_soundspeed_fr
+"""
+import time
+from functools import partial
+
+import numpy as np
+
+import sdtoolbox.stagnation
+import sdtoolbox.znd
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.postshock import CJspeed, PostShock_fr
+from sdtoolbox.stagnation import StgSys
+from sdtoolbox.thermo import soundspeed_fr
+from sdtoolbox.znd import ZNDSys, zndsolve
+
+MECH = 'mechs/gri30_highT.yaml'
+Q = 'H2:2,O2:1,AR:7'
+P1 = 100000.
+T1 = 300.
+N = 2000
+
+
+def timed(func, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - start)/n
+
+
+def run(exact):
+    sdtoolbox.znd.soundspeed_fr = partial(soundspeed_fr, exact=exact)
+    sdtoolbox.stagnation.soundspeed_fr = partial(soundspeed_fr, exact=exact)
+    gas1 = get_solution(MECH)
+    gas1.TPX = T1, P1, Q
+    U1 = CJspeed(P1, T1, Q, MECH, method='tangency')
+    gas = PostShock_fr(U1, P1, T1, Q, MECH)
+    times = {}
+    times['soundspeed_fr'] = timed(lambda: soundspeed_fr(gas, exact=exact), N)
+    y = np.hstack((gas.P, gas.density, 0., gas.Y))
+    rhs = ZNDSys(gas, U1, gas1.density)
+    times['ZNDSys'] = timed(lambda: rhs(0., y), N)
+    y = np.hstack((gas.P, gas.density, U1*gas1.density/gas.density, 0., gas.Y))
+    rhs = StgSys(gas, U1, gas1.density, 0.01)
+    times['StgSys'] = timed(lambda: rhs(0., y), N)
+    gas = PostShock_fr(U1, P1, T1, Q, MECH)
+    start = time.perf_counter()
+    out = zndsolve(gas, gas1, U1, t_end=2e-4, advanced_output=True)
+    times['zndsolve'] = time.perf_counter() - start
+    sdtoolbox.znd.soundspeed_fr = soundspeed_fr
+    sdtoolbox.stagnation.soundspeed_fr = soundspeed_fr
+    return times, out['ind_len_ZND']
+
+
+if __name__ == '__main__':
+    fd, ind_fd = run(exact=False)
+    ex, ind_ex = run(exact=True)
+    print('%-14s %14s %14s %8s' % ('', 'fin. diff., ms', 'exact, ms', 'speedup'))
+    for key in fd:
+        print('%-14s %14.4f %14.4f %8.2f' % (key, 1000*fd[key], 1000*ex[key], fd[key]/ex[key]))
+    print('induction length: %.5e m (finite differences), %.5e m (exact)' % (ind_fd, ind_ex))
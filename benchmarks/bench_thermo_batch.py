@@ -0,0 +1,63 @@
+"""
+Compares the batch evaluation of sound speeds and Gruneisen coefficients
+(thermo.soundspeed_fr_batch, soundspeed_eq_batch, gruneisen_fr_batch,
+gruneisen_eq_batch) with loops of the single state functions over the points
+of a gri30 H2-O2-Ar ZND profile.
+
+Run from the repository root:
+    python -m benchmarks.bench_thermo_batch
+"""
+import time
+
+import numpy as np
+
+from sdtoolbox import config
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.postshock import CJspeed, PostShock_fr
+from sdtoolbox.thermo import (gruneisen_eq, gruneisen_eq_batch, gruneisen_fr,
+                              gruneisen_fr_batch, soundspeed_eq, soundspeed_eq_batch,
+                              soundspeed_fr, soundspeed_fr_batch)
+from sdtoolbox.znd import zndsolve
+
+MECH = 'mechs/gri30_highT.yaml'
+Q = 'H2:2,O2:1,AR:7'
+P1 = 100000.
+T1 = 300.
+
+
+def timed(func):
+    start = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    config.resultCache = False
+    U1 = CJspeed(P1, T1, Q, MECH, method='tangency')
+    gas1 = get_solution(MECH)
+    gas1.TPX = T1, P1, Q
+    gas = PostShock_fr(U1, P1, T1, Q, MECH)
+    out = zndsolve(gas, gas1, U1, t_end=2e-4)
+    T, rho, Y = out['T'], out['rho'], out['species'].T
+
+    def loop(func):
+        values = np.zeros(T.size)
+        for i in range(T.size):
+            gas.TDY = T[i], rho[i], Y[i]
+            values[i] = func(gas)
+        return values
+
+    print('ZND profile, %d points' % T.size)
+    print('%-14s %10s %10s %8s %12s' % ('', 'loop, s', 'batch, s', 'speedup', 'max diff.'))
+    for name, single, batch in [
+            ('soundspeed_fr', soundspeed_fr, soundspeed_fr_batch),
+            ('gruneisen_fr', gruneisen_fr, gruneisen_fr_batch),
+            ('soundspeed_eq', lambda gas: soundspeed_eq(gas, exact=False), soundspeed_eq_batch),
+            ('gruneisen_eq', gruneisen_eq, gruneisen_eq_batch)]:
+        looped, t_loop = timed(lambda: loop(single))
+        batched, t_batch = timed(lambda: batch(gas, T, rho, Y))
+        print('%-14s %10.4f %10.4f %8.2f %12.2e' % (name, t_loop, t_batch, t_loop/t_batch,
+                                                    np.max(np.abs(looped - batched)
+                                                           / np.abs(batched))))
+    print('(gruneisen_eq of the reaction zone differs: the loop uses the frozen reference '
+          'state, the batch the equilibrium state)')
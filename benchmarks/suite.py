@@ -0,0 +1,273 @@
+"""
+Benchmark suite of the toolbox hot paths with canonical cases using
+mechs/gri30_highT.yaml: CJspeed (H2-air and CH4-O2), PostShock_fr,
+PostShock_eq, reflected_eq, cvsolve, cpsolve and vpsolve ignition, zndsolve
+and stgsolve.
+
+Every case runs in a fresh interpreter (with the on-disk result cache
+disabled). After an untimed setup (mechanism parsing, incident shock states,
+...) the case is timed without instrumentation: REPEAT samples of at least
+0.2 s each (short cases are run several times per sample), the best time per
+run is reported. Then it is run once more with sdtoolbox.profiling counting
+Cantera calls: equilibrate calls, state setters (TPX, TDY, ...),
+thermodynamic property reads and kinetics reads (rates, rate constants, ...).
+Peak memory is the peak resident set size of the process.
+
+Run from the repository root:
+    python -m benchmarks.suite                      (run and print)
+    python -m benchmarks.suite --save               (store as baseline)
+    python -m benchmarks.suite --compare            (compare with baseline)
+    python -m benchmarks.suite --cases cvsolve,cpsolve --compare
+
+The baseline (benchmarks/baseline.json) records versions of Python, Cantera,
+NumPy and SciPy. With --compare a case is flagged as a regression if its time
+exceeds the baseline by more than --threshold (relative, 0.25 by default) or
+its Cantera call counts increased; the exit status is then 1. Timings depend
+on the machine, so the baseline should be saved on the machine used for
+comparison (e.g. before upgrading Cantera or SciPy). Call counts do not depend
+on the machine: a change of them means a change of the algorithms (or of the
+results of Cantera calls), while time alone may be noise of a busy machine
+(rerun the flagged cases).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import timeit
+
+MECH = 'mechs/gri30_highT.yaml'
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+REPEAT = 5
+P1 = 100000.
+T1 = 300.
+H2_AIR = 'H2:2,O2:1,N2:3.76'
+CH4_O2 = 'CH4:1,O2:2'
+H2_O2_AR = 'H2:2,O2:1,AR:7'
+COUNTERS = ['equilibrate', 'state_set', 'thermo_get', 'kinetics_get']
+
+
+# CASES
+# Every case function does the setup and returns the function to be timed.
+
+def case_cjspeed_h2_air():
+    from sdtoolbox.postshock import CJspeed
+
+    return lambda: CJspeed(P1, T1, H2_AIR, MECH)
+
+
+def case_cjspeed_ch4_o2():
+    from sdtoolbox.postshock import CJspeed
+
+    return lambda: CJspeed(P1, T1, CH4_O2, MECH)
+
+
+def case_postshock_fr():
+    from sdtoolbox.postshock import PostShock_fr
+
+    return lambda: PostShock_fr(2000., P1, T1, H2_AIR, MECH)
+
+
+def case_postshock_eq():
+    from sdtoolbox.postshock import PostShock_eq
+
+    return lambda: PostShock_eq(2000., P1, T1, H2_AIR, MECH)
+
+
+def case_reflected_eq():
+    from sdtoolbox.mechcache import get_solution
+    from sdtoolbox.postshock import PostShock_eq
+    from sdtoolbox.reflections import reflected_eq
+
+    gas1 = get_solution(MECH)
+    gas1.TPX = T1, 10000., H2_O2_AR
+    gas2 = PostShock_eq(2000., 10000., T1, H2_O2_AR, MECH)
+    gas3 = get_solution(MECH)
+    return lambda: reflected_eq(gas1, gas2, gas3, 2000.)
+
+
+def case_cvsolve():
+    from sdtoolbox.cv import cvsolve
+    from sdtoolbox.mechcache import get_solution
+
+    gas = get_solution(MECH)
+    gas.TPX = 1200., P1, H2_O2_AR
+    return lambda: cvsolve(gas, t_end=1e-3, max_step=1e-4)
+
+
+def case_cpsolve():
+    from sdtoolbox.cp import cpsolve
+    from sdtoolbox.mechcache import get_solution
+
+    gas = get_solution(MECH)
+    gas.TPX = 1200., P1, H2_O2_AR
+    return lambda: cpsolve(gas, t_end=1e-3, max_step=1e-4)
+
+
+def case_vpsolve():
+    from sdtoolbox.mechcache import get_solution
+    from sdtoolbox.vp import vpsolve
+
+    gas = get_solution(MECH)
+    gas.TPX = 1200., P1, H2_O2_AR
+    return lambda: vpsolve(gas, 30., t_end=1e-3, max_step=1e-4)
+
+
+def _cj_states():
+    from sdtoolbox.mechcache import get_solution
+    from sdtoolbox.postshock import CJspeed, PostShock_fr
+
+    U1 = CJspeed(P1, T1, H2_O2_AR, MECH, method='tangency')
+    gas1 = get_solution(MECH)
+    gas1.TPX = T1, P1, H2_O2_AR
+    gas = PostShock_fr(U1, P1, T1, H2_O2_AR, MECH)
+    return gas, gas1, U1
+
+
+def case_zndsolve():
+    from sdtoolbox.znd import zndsolve
+
+    gas, gas1, U1 = _cj_states()
+    return lambda: zndsolve(gas, gas1, U1, t_end=2e-5, advanced_output=True)
+
+
+def case_stgsolve():
+    from sdtoolbox.stagnation import stgsolve
+
+    gas, gas1, U1 = _cj_states()
+    return lambda: stgsolve(gas, gas1, U1, 1e-3, t_end=2e-5, max_step=1e-6)
+
+
+CASES = dict((name[5:], function) for name, function in list(globals().items())
+             if name.startswith('case_'))
+
+
+def run_case(name, repeat):
+    """
+    Runs one case in the current interpreter and returns its measurements.
+    """
+    from sdtoolbox import config
+    from sdtoolbox.profiling import Profile
+
+    config.resultCache = False
+    function = CASES[name]()
+    timer = timeit.Timer(function)
+    number = timer.autorange()[0]
+    times = [sample/number for sample in timer.repeat(repeat, number)]
+    with Profile() as profile:
+        function()
+    groups = profile.report()['groups']
+    result = {'time': min(times), 'times': times, 'number': number}
+    result.update((key, groups.get(key, {'calls': 0})['calls']) for key in COUNTERS)
+    # kilobytes on Linux, bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    result['peak_memory'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*scale/1024**2
+    return result
+
+
+def run_isolated(name, repeat):
+    """
+    Runs one case in a fresh interpreter and returns its measurements.
+    """
+    process = subprocess.run([sys.executable, '-m', 'benchmarks.suite', '--run-case', name,
+                              '--repeat', str(repeat)],
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        return {'error': (process.stderr.strip().split('\n') or [''])[-1]}
+    return json.loads(process.stdout.strip().split('\n')[-1])
+
+
+def environment():
+    import cantera
+    import numpy
+    import scipy
+
+    return {'python': platform.python_version(), 'cantera': cantera.__version__,
+            'numpy': numpy.__version__, 'scipy': scipy.__version__,
+            'machine': platform.machine(), 'system': platform.system(),
+            'date': time.strftime('%Y-%m-%d')}
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints comparison with the baseline and returns number of regressions.
+    """
+    print('%-18s %10s %10s %8s  %s' % ('case', 'base, s', 'time, s', 'ratio', 'calls'))
+    regressions = 0
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None or 'error' in base or 'error' in result:
+            print('%-18s %s' % (name, result.get('error', 'no baseline')))
+            continue
+        ratio = result['time']/base['time']
+        changed = ['%s %+d' % (key, result[key] - base[key]) for key in COUNTERS
+                   if result[key] != base[key]]
+        regression = ratio > 1 + threshold or any(result[key] > base[key] for key in COUNTERS)
+        regressions = regressions + regression
+        print('%-18s %10.4f %10.4f %8.2f  %s%s' % (
+            name, base['time'], result['time'], ratio, ', '.join(changed) or 'same',
+            '  REGRESSION' if regression else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite of the toolbox hot paths.')
+    parser.add_argument('--cases', help='comma-separated case names (default all): '
+                        + ', '.join(CASES))
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='timed samples per case')
+    parser.add_argument('--save', action='store_true', help='store results as baseline')
+    parser.add_argument('--compare', action='store_true', help='compare with baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative time increase reported as regression')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.repeat)))
+        return 0
+
+    names = args.cases.split(',') if args.cases else list(CASES)
+    for name in names:
+        if name not in CASES:
+            parser.error("unknown case '%s'" % name)
+    env = environment()
+    print(', '.join('%s %s' % item for item in env.items()))
+    print('%-18s %10s %12s %10s %12s %12s %10s' % ('case', 'time, s', 'equilibrate',
+                                                   'state set', 'thermo get',
+                                                   'kinetics get', 'peak, MB'))
+    results = {}
+    for name in names:
+        result = run_isolated(name, args.repeat)
+        results[name] = result
+        if 'error' in result:
+            print('%-18s %s' % (name, result['error']))
+            continue
+        print('%-18s %10.4f %12d %10d %12d %12d %10.1f' % (
+            name, result['time'], result['equilibrate'], result['state_set'],
+            result['thermo_get'], result['kinetics_get'], result['peak_memory']))
+
+    status = 0
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print('\nbaseline: ' + ', '.join('%s %s' % item
+                                         for item in baseline['environment'].items()))
+        status = 1 if compare(results, baseline, args.threshold) else 0
+    if args.save:
+        baseline = {'environment': env, 'results': results}
+        if args.cases and os.path.exists(args.baseline):
+            # update the selected cases only
+            with open(args.baseline) as f:
+                baseline['results'] = dict(json.load(f)['results'], **results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print('baseline saved to ' + args.baseline)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""
+Batch reactor driver: runs constant-volume (cv.cvsolve), constant-pressure
+(cp.cpsolve) and shock-tube (vp.vpsolve, linear pressure rise) explosion
+cases listed in a manifest on a pool of worker processes.
+
+Manifest is a YAML or CSV file. YAML contains either a list of cases or a
+dictionary with optional 'mech' and 'defaults' entries and a 'cases' list:
+
+    mech: mechs/gri30_highT.yaml
+    defaults: {reactor: CV, t_end: 1.0e-3}
+    cases:
+      - {mixture: 'H2:2,O2:1,AR:7', T: 1200, P: 2.0e+5}
+      - {id: ch4-1600, mixture: 'CH4:1,O2:2,AR:7', T: 1600, P: 2.0e+5, reactor: CP}
+      - {id: h2-1000-vp, mixture: 'H2:2,O2:1,AR:7', T: 1000, P: 2.0e+5, reactor: VP, dPdt: 30}
+
+CSV has a header with the same case fields (mixture values quoted):
+
+    id,mixture,T,P,reactor,t_end
+    h2-1200,"H2:2,O2:1,AR:7",1200,2e5,CV,1e-3
+
+Case fields: mixture, T (K), P (Pa), reactor ('CV', 'CP' or 'VP', default
+CV), t_end (s, default 1e-3), optional id (default: case number), max_step
+(s, default t_end/100) and dPdt (normalized pressure rise rate of VP cases,
+1/s, default 0).
+
+Every worker parses the mechanism once and reuses its gas object for all its
+cases. Trajectories (time, T, P, density, species mass fractions) are written
+to the store directory, one compressed NumPy archive per chunk of cases
+(chunk_NNNNN.npz with arrays '<id>/time', '<id>/T', '<id>/P', '<id>/D',
+'<id>/Y' and the list of species), and ignition metrics of all cases to the
+summary CSV file. Throughput and per-case timings are reported at the end.
+
+Run from the repository root, e.g.:
+    python -m scripts.kinetics.batch_reactor cases.yaml -o results -j 8
+"""
+import argparse
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from sdtoolbox.cp import cpsolve
+from sdtoolbox.cv import cvsolve
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.vp import vpsolve
+
+SUMMARY_FIELDS = ['id', 'mixture', 'T', 'P', 'reactor', 't_end', 'dPdt', 'ind_time', 'ind_time_10',
+                  'ind_time_90', 'exo_time', 'T_final', 'P_final', 'points', 'chunk',
+                  'time', 'message']
+
+_gas = None
+
+
+def read_manifest(path, mech=None):
+    """
+    Returns [mech, cases] read from a YAML or CSV manifest; every case is a
+    dictionary with all case fields filled in.
+    """
+    defaults = {'reactor': 'CV', 't_end': 1e-3}
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            cases = [dict((key.strip(), value.strip()) for key, value in row.items()
+                          if value is not None and value.strip() != '')
+                     for row in csv.DictReader(f)]
+    else:
+        from ruamel.yaml import YAML
+        with open(path) as f:
+            data = YAML(typ='safe').load(f)
+        if isinstance(data, dict):
+            mech = mech or data.get('mech')
+            defaults.update(data.get('defaults') or {})
+            cases = data['cases']
+        else:
+            cases = data
+    if mech is None:
+        mech = 'mechs/gri30_highT.yaml'
+
+    result = []
+    for k, case in enumerate(cases):
+        case = dict(defaults, **case)
+        case['id'] = str(case.get('id', k))
+        case['reactor'] = str(case['reactor']).upper()
+        if case['reactor'] not in ('CV', 'CP', 'VP'):
+            raise ValueError("case %s: reactor must be 'CV', 'CP' or 'VP'" % case['id'])
+        for key in ('T', 'P', 't_end'):
+            case[key] = float(case[key])
+        case['max_step'] = float(case.get('max_step', case['t_end']/100))
+        case['dPdt'] = float(case.get('dPdt', 0.))
+        result.append(case)
+    ids = [case['id'] for case in result]
+    if len(set(ids)) != len(ids):
+        raise ValueError('case ids must be unique')
+    return [mech, result]
+
+
+def _init_worker(mech):
+    # one gas object per worker process, reused for all its cases
+    global _gas
+    _gas = get_solution(mech)
+
+
+def run_case(gas, case, ignition=None):
+    """
+    Runs one case and returns [summary, trajectory].
+    """
+    start = time.perf_counter()
+    summary = dict((key, case.get(key, np.nan)) for key in SUMMARY_FIELDS)
+    summary['message'] = ''
+    trajectory = None
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            gas.TPX = case['T'], case['P'], case['mixture']
+            if case['reactor'] == 'VP':
+                out = vpsolve(gas, case['dPdt'], t_end=case['t_end'],
+                              max_step=case['max_step'], ignition=ignition)
+            else:
+                solve = cvsolve if case['reactor'] == 'CV' else cpsolve
+                out = solve(gas, t_end=case['t_end'], max_step=case['max_step'],
+                            ignition=ignition)
+        if case['reactor'] == 'CV':
+            P = out['P']
+            D = np.full(len(P), gas.density)
+        elif case['reactor'] == 'VP':
+            P = out['P']
+            D = out['D']
+        else:
+            D = out['D']
+            P = np.full(len(D), case['P'])
+        trajectory = {'time': out['time'], 'T': out['T'], 'P': P, 'D': D,
+                      'Y': out['speciesY']}
+        summary.update(ind_time=out['ind_time'], ind_time_10=out['ind_time_10'],
+                       ind_time_90=out['ind_time_90'], exo_time=out['exo_time'],
+                       T_final=out['T'][-1], P_final=P[-1], points=len(P))
+        # keep the first diagnostic line printed by the toolbox, if any
+        summary['message'] = log.getvalue().strip().split('\n')[0]
+    except Exception as error:
+        summary['message'] = ' '.join(line.strip() for line in str(error).splitlines()
+                                      if line.strip('* ')) or repr(error)
+    summary['time'] = time.perf_counter() - start
+    return [summary, trajectory]
+
+
+def run_chunk(number, cases, store, ignition=None):
+    """
+    Runs a chunk of cases in a worker and writes their trajectories to the
+    store. Returns the list of case summaries.
+    """
+    summaries = []
+    arrays = {'species': np.array(_gas.species_names)}
+    for case in cases:
+        summary, trajectory = run_case(_gas, case, ignition)
+        summary['chunk'] = number
+        summaries.append(summary)
+        if trajectory is not None:
+            for key, value in trajectory.items():
+                arrays['%s/%s' % (case['id'], key)] = value
+    path = os.path.join(store, 'chunk_%05d.npz' % number)
+    tmp = path + '.tmp.npz'
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+    return summaries
+
+
+def report(summaries, elapsed, slowest=5):
+    """
+    Returns text of the throughput and per-case timing report.
+    """
+    times = np.array([summary['time'] for summary in summaries])
+    failed = sum(1 for summary in summaries if not np.isfinite(summary['ind_time']))
+    lines = ['%d cases (%d failed) in %.2f s: %.2f cases/s'
+             % (len(summaries), failed, elapsed, len(summaries)/elapsed)]
+    if len(times):
+        lines.append('per case: mean %.3f s, median %.3f s, min %.3f s, max %.3f s'
+                     % (times.mean(), np.median(times), times.min(), times.max()))
+        lines.append('slowest cases:')
+        for k in np.argsort(-times)[:slowest]:
+            summary = summaries[k]
+            lines.append('    %-16s %s %-20s T = %6.1f K, P = %9.4g Pa: %.3f s'
+                         % (summary['id'], summary['reactor'], summary['mixture'],
+                            summary['T'], summary['P'], summary['time']))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('manifest', help='YAML or CSV file with the cases')
+    parser.add_argument('-m', '--mech', default=None,
+                        help='mechanism file (overrides the one in the manifest)')
+    parser.add_argument('-o', '--output', default='batch_reactor',
+                        help='output directory for the store and the summary')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=50,
+                        help='number of cases per chunk of the store')
+    parser.add_argument('--ignition', default=None,
+                        help="stop cases after ignition ('dTdt', 'T' or species name, "
+                             "see sdtoolbox.ignition), t_end is then the first guess")
+    args = parser.parse_args(argv)
+
+    mech, cases = read_manifest(args.manifest, args.mech)
+    store = os.path.join(args.output, 'store')
+    os.makedirs(store, exist_ok=True)
+    chunks = [cases[k:k + args.chunk_size] for k in range(0, len(cases), args.chunk_size)]
+    print('%d cases in %d chunks, mechanism %s' % (len(cases), len(chunks), mech))
+
+    start = time.perf_counter()
+    summaries = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(mech,)) as executor:
+        futures = [executor.submit(run_chunk, number, chunk, store, args.ignition)
+                   for number, chunk in enumerate(chunks)]
+        for future in as_completed(futures):
+            summaries.extend(future.result())
+            print('%d/%d cases done, %.2f cases/s'
+                  % (len(summaries), len(cases),
+                     len(summaries)/(time.perf_counter() - start)))
+    elapsed = time.perf_counter() - start
+
+    # summary in the manifest order
+    order = dict((case['id'], k) for k, case in enumerate(cases))
+    summaries.sort(key=lambda summary: order[summary['id']])
+    with open(os.path.join(args.output, 'summary.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+    print(report(summaries, elapsed))
+
+
+if __name__ == '__main__':
+    main()
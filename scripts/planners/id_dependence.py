@@ -0,0 +1,260 @@
+"""
+Ignition delay dependence planner for shock tube experiments.
+
+For a mixture and a set of initial states (P1, T1) finds the incident shock
+speeds giving reflected shock temperatures T5 evenly distributed in the
+target window and computes the constant-volume ignition delay behind the
+reflected shock:
+
+    PostShock_fr -> reflections.reflected_fr -> cv.cvsolve
+
+Points are computed in parallel by a pool of worker processes. Every result
+is appended to the CSV output file as soon as it is available, so an
+interrupted run is resumed from the points already stored (use --overwrite
+to start anew). Points that failed or reported a diagnostic message (e.g.
+non-converged shock solution, no ignition) are computed again. At the end an
+Arrhenius-style table of ignition delays (tau = A*exp(E/RT5) for every
+initial state, and tau = A*P5^n*exp(E/RT5) for all points together) is
+written next to the CSV file.
+
+Run from the repository root, e.g.:
+    python -m scripts.planners.id_dependence -q H2:2,O2:1,AR:7 --P1 2000 5000 \\
+        --T5 1000 1400 --points 9 -o id_h2.csv
+"""
+import argparse
+import csv
+import io
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import cantera as ct
+import numpy as np
+from scipy.optimize import brentq
+
+from sdtoolbox.cv import cvsolve
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.postshock import PostShock_fr
+from sdtoolbox.reflections import reflected_fr
+from sdtoolbox.thermo import soundspeed_fr
+
+FIELDS = ['P1', 'T1', 'T5_target', 'UI', 'MI', 'P2', 'T2', 'UR', 'P5', 'T5', 'rho5',
+          'ind_time', 'ind_time_10', 'ind_time_90', 'exo_time', 'time', 'message']
+
+
+def _key(P1, T1, T5):
+    return ('%.6g' % float(P1), '%.6g' % float(T1), '%.6g' % float(T5))
+
+
+def reflected_state(UI, P1, T1, q, mech):
+    """
+    Returns incident (gas2) and reflected (gas5) shock states and the
+    reflected shock speed for the incident shock speed UI.
+    """
+    gas1 = get_solution(mech)
+    gas1.TPX = T1, P1, q
+    gas2 = PostShock_fr(UI, P1, T1, q, mech)
+    gas5 = get_solution(mech)
+    gas5.TPX = T1, P1, q
+    [p5, UR, gas5] = reflected_fr(gas1, gas2, gas5, UI)
+    return gas2, gas5, UR
+
+
+def incident_speed(T5, P1, T1, q, mech, xtol=0.01):
+    """
+    Finds the incident shock speed giving the reflected shock temperature T5.
+    """
+    gas1 = get_solution(mech)
+    gas1.TPX = T1, P1, q
+    a1 = soundspeed_fr(gas1)
+
+    def residual(UI):
+        return reflected_state(UI, P1, T1, q, mech)[1].T - T5
+
+    # T5 increases with the shock speed, expand the bracket upwards
+    lo = 1.05*a1
+    hi = 2*a1
+    while residual(hi) < 0:
+        lo = hi
+        hi = 1.25*hi
+    return brentq(residual, lo, hi, xtol=xtol)
+
+
+def _init_worker(mech):
+    # parse the mechanism once per worker process
+    get_solution(mech)
+
+
+def compute_point(P1, T1, T5, q, mech, t_end, t_max):
+    """
+    Computes one row of the planner table. Errors are reported in the
+    'message' field instead of being raised.
+    """
+    start = time.perf_counter()
+    row = dict.fromkeys(FIELDS, np.nan)
+    row.update(P1=P1, T1=T1, T5_target=T5, message='')
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log), warnings.catch_warnings(record=True) as caught:
+            # convergence failures of the shock solvers are reported as warnings
+            warnings.simplefilter('always')
+            UI = incident_speed(T5, P1, T1, q, mech)
+            gas2, gas5, UR = reflected_state(UI, P1, T1, q, mech)
+            gas1 = get_solution(mech)
+            gas1.TPX = T1, P1, q
+            row.update(UI=UI, MI=UI/soundspeed_fr(gas1), P2=gas2.P, T2=gas2.T,
+                       UR=UR, P5=gas5.P, T5=gas5.T, rho5=gas5.density)
+            out = cvsolve(gas5, t_end=t_end, max_step=t_max, ignition='dTdt', t_max=t_max)
+        row.update(ind_time=out['ind_time'], ind_time_10=out['ind_time_10'],
+                   ind_time_90=out['ind_time_90'], exo_time=out['exo_time'])
+        # keep the first diagnostic line printed or warned by the toolbox, if any
+        lines = [str(warning.message) for warning in caught] + log.getvalue().split('\n')
+        row['message'] = ([line.strip() for line in lines if line.strip()] + [''])[0]
+    except Exception as error:
+        row['message'] = ' '.join(line.strip() for line in str(error).splitlines()
+                                  if line.strip('* ')) or repr(error)
+    row['time'] = time.perf_counter() - start
+    return row
+
+
+def completed(row):
+    """
+    Returns True for a stored row computed without error or diagnostic message.
+    """
+    try:
+        ind_time = float(row['ind_time'])
+    except (TypeError, ValueError):
+        return False
+    return not row['message'] and np.isfinite(ind_time)
+
+
+def read_rows(path):
+    """
+    Returns complete rows stored in the output file, skipping a partially
+    written last row of an interrupted run.
+    """
+    rows = []
+    if not os.path.isfile(path):
+        return rows
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if None in row.values() or None in row:
+                continue
+            try:
+                float(row['time'])
+            except ValueError:
+                continue
+            rows.append(row)
+    return rows
+
+
+def write_rows(path, rows):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def arrhenius_table(rows):
+    """
+    Returns text of the Arrhenius-style ignition delay table: ignition delays
+    versus 1000/T5 for every initial state with tau = A*exp(E/RT5) fits and a
+    global tau = A*P5^n*exp(E/RT5) fit.
+    """
+    R = ct.gas_constant/1e6  # kJ/mol/K
+    data = []
+    for row in rows:
+        values = [float(row[key]) for key in ('P1', 'T1', 'T5', 'P5', 'ind_time')]
+        if np.all(np.isfinite(values)) and values[-1] > 0:
+            data.append(values)
+    lines = ['%10s %8s %9s %9s %10s %12s' % ('P1, Pa', 'T1, K', 'T5, K', '1000/T5',
+                                             'P5, atm', 'tau, us')]
+    if not data:
+        return '\n'.join(lines + ['no ignition delays computed']) + '\n'
+    data = np.array(data)
+    for P1, T1 in sorted(set(map(tuple, data[:, :2]))):
+        group = data[(data[:, 0] == P1) & (data[:, 1] == T1)]
+        group = group[np.argsort(group[:, 2])]
+        for _, _, T5, P5, tau in group:
+            lines.append('%10.6g %8.6g %9.1f %9.4f %10.4g %12.5g'
+                         % (P1, T1, T5, 1000/T5, P5/ct.one_atm, 1e6*tau))
+        if len(group) > 1:
+            [E, lnA] = np.polyfit(1/group[:, 2], np.log(group[:, 4]), 1)
+            lines.append('    fit: tau = %.4g s * exp(%.2f kJ/mol / RT5)' % (np.exp(lnA), E*R))
+        lines.append('')
+    if len(data) > 3 and len(set(data[:, 3])) > 1:
+        A = np.column_stack((np.ones(len(data)), np.log(data[:, 3]/ct.one_atm), 1/data[:, 2]))
+        [lnA, n, E] = np.linalg.lstsq(A, np.log(data[:, 4]), rcond=None)[0]
+        lines.append('all points: tau = %.4g s * (P5/atm)^%.3f * exp(%.2f kJ/mol / RT5)'
+                     % (np.exp(lnA), n, E*R))
+    return '\n'.join(lines) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-q', '--mixture', required=True, help="e.g. 'H2:2,O2:1,AR:7'")
+    parser.add_argument('-m', '--mech', default='mechs/gri30_highT.yaml')
+    parser.add_argument('--P1', type=float, nargs='+', required=True,
+                        help='initial pressures, Pa')
+    parser.add_argument('--T1', type=float, nargs='+', default=[295.],
+                        help='initial temperatures, K')
+    parser.add_argument('--T5', type=float, nargs=2, required=True, metavar=('MIN', 'MAX'),
+                        help='target window of reflected shock temperatures, K')
+    parser.add_argument('--points', type=int, default=10,
+                        help='number of T5 points in the window')
+    parser.add_argument('-o', '--output', default='id_dependence.csv')
+    parser.add_argument('-j', '--workers', type=int, default=None)
+    parser.add_argument('--t-end', type=float, default=1e-5,
+                        help='first guess of the ignition delay integration time, s')
+    parser.add_argument('--t-max', type=float, default=0.1,
+                        help='maximal integration time, s')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='discard results of a previous run')
+    args = parser.parse_args(argv)
+
+    points = [(P1, T1, T5) for P1 in args.P1 for T1 in args.T1
+              for T5 in np.linspace(args.T5[0], args.T5[1], args.points)]
+    rows = [] if args.overwrite else read_rows(args.output)
+    # failed and non-converged points are computed again
+    rows = [row for row in rows if completed(row)]
+    done = set(_key(row['P1'], row['T1'], row['T5_target']) for row in rows)
+    todo = [point for point in points if _key(*point) not in done]
+    # rewrite the file without a partially written row and failed points
+    write_rows(args.output, rows)
+    print('%d points, %d stored, %d to compute' % (len(points), len(points) - len(todo),
+                                                   len(todo)))
+
+    if todo:
+        with open(args.output, 'a', newline='') as f, \
+                ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                    initargs=(args.mech,)) as executor:
+            writer = csv.DictWriter(f, FIELDS)
+            futures = [executor.submit(compute_point, P1, T1, T5, args.mixture, args.mech,
+                                       args.t_end, args.t_max) for P1, T1, T5 in todo]
+            try:
+                for k, future in enumerate(as_completed(futures)):
+                    row = future.result()
+                    writer.writerow(row)
+                    f.flush()
+                    rows.append(row)
+                    print('[%d/%d] P1 = %g Pa, T1 = %g K, T5 = %.1f K: tau = %.4g s %s'
+                          % (k + 1, len(todo), row['P1'], row['T1'], row['T5'],
+                             row['ind_time'], row['message']))
+            except KeyboardInterrupt:
+                executor.shutdown(wait=False, cancel_futures=True)
+                print('interrupted, run again to resume')
+                raise
+
+    table = arrhenius_table(rows)
+    path = os.path.splitext(args.output)[0] + '_arrhenius.txt'
+    with open(path, 'w') as f:
+        f.write(table)
+    print(table)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Incident and reflected shock state tables (gri30 mechanism by default).
+
+Sweeps incident shock Mach numbers for a mixture at the given initial state
+and computes frozen and equilibrium post-incident-shock and
+post-reflected-shock states (reflections.reflected_sweep). Every point
+starts from the solution extrapolated from the previous Mach numbers
+(continuation), which takes far fewer iterations than independent
+calculations.
+
+The table is written to <output>.npz (structured NumPy array with the
+mixture, initial state and mechanism) and <output>.csv. Running the script
+again with the same output adds only the Mach numbers not yet in the table;
+the initial state and mixture must be the same (use --overwrite otherwise).
+
+Table columns (frozen state columns have _fr, equilibrium ones _eq suffix):
+    M, UI = incident shock Mach number and speed (m/s)
+    P2, T2, rho2, u2 = post-incident-shock pressure (Pa), temperature (K),
+                       density (kg/m^3) and lab frame particle speed (m/s)
+    P5, T5, rho5, UR = post-reflected-shock pressure, temperature, density
+                       and reflected shock speed (m/s)
+
+Run from the repository root, e.g.:
+    python -m scripts.waves.equilib30 -q O2:1,AR:4 --P1 5000 --mach 2 8 --step 0.25
+"""
+import argparse
+import os
+
+import numpy as np
+
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.reflections import reflected_sweep
+from sdtoolbox.thermo import soundspeed_fr
+
+STATE = ['P2', 'T2', 'rho2', 'u2', 'P5', 'T5', 'rho5', 'UR']
+COLUMNS = ['M', 'UI'] + [name + '_fr' for name in STATE] + [name + '_eq' for name in STATE]
+
+
+def shock_table(mach, P1, T1, q, mech):
+    """
+    Returns the table (structured array) for the Mach numbers.
+    """
+    gas1 = get_solution(mech)
+    gas1.TPX = T1, P1, q
+    a1 = soundspeed_fr(gas1)
+    mach = np.sort(np.asarray(mach, dtype=float))
+    table = np.full(len(mach), np.nan, dtype=[(name, float) for name in COLUMNS])
+    table['M'] = mach
+    table['UI'] = mach*a1
+    for frozen, suffix in [(True, '_fr'), (False, '_eq')]:
+        states = reflected_sweep(gas1, table['UI'], frozen=frozen)
+        for name in ('P2', 'T2', 'rho2', 'u2', 'UR'):
+            table[name + suffix] = states[name]
+        for name in ('P', 'T', 'rho'):
+            table[name + '5' + suffix] = states[name + '3']
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-q', '--mixture', required=True, help="e.g. 'O2:1,AR:4'")
+    parser.add_argument('-m', '--mech', default='mechs/gri30_highT.yaml')
+    parser.add_argument('--P1', type=float, default=100000., help='initial pressure, Pa')
+    parser.add_argument('--T1', type=float, default=295., help='initial temperature, K')
+    parser.add_argument('--mach', type=float, nargs=2, required=True, metavar=('MIN', 'MAX'),
+                        help='range of incident shock Mach numbers')
+    parser.add_argument('--step', type=float, default=0.1, help='Mach number step')
+    parser.add_argument('-o', '--output', default='equilib30',
+                        help='output file name without extension')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='discard the existing table')
+    args = parser.parse_args(argv)
+
+    mach = np.round(np.arange(args.mach[0], args.mach[1] + 0.5*args.step, args.step), 6)
+    path = args.output + '.npz'
+    table = np.zeros(0, dtype=[(name, float) for name in COLUMNS])
+    if os.path.isfile(path) and not args.overwrite:
+        with np.load(path) as data:
+            stored = (str(data['mixture']), float(data['P1']), float(data['T1']),
+                      str(data['mech']))
+            if stored != (args.mixture, args.P1, args.T1, args.mech):
+                parser.error('%s was computed for mixture %s, P1 = %g Pa, T1 = %g K, '
+                             'mechanism %s; use --overwrite to replace it' % ((path,) + stored))
+            table = data['table']
+    new = np.setdiff1d(mach, np.round(table['M'], 6))
+    print('%d Mach numbers, %d in the table, %d to compute'
+          % (len(mach), len(mach) - len(new), len(new)))
+
+    if len(new):
+        table = np.concatenate((table, shock_table(new, args.P1, args.T1, args.mixture,
+                                                   args.mech)))
+        table = table[np.argsort(table['M'], kind='stable')]
+        np.savez(path, table=table, mixture=args.mixture, P1=args.P1, T1=args.T1,
+                 mech=args.mech)
+        header = '# mixture %s, P1 = %g Pa, T1 = %g K, mechanism %s\n' % (
+            args.mixture, args.P1, args.T1, args.mech)
+        np.savetxt(args.output + '.csv', table, delimiter=',', fmt='%.8g',
+                   header=header + ','.join(COLUMNS), comments='')
+    failed = np.sum(~np.isfinite(table['T5_fr']) | ~np.isfinite(table['T5_eq']))
+    print('%d points in %s.npz and %s.csv, %d with failed reflected shock calculation'
+          % (len(table), args.output, args.output, failed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,48 @@
 '''
  Shock and Detonation Toolbox
  http://www.galcit.caltech.edu/EDL/PublicResources/SDT/
+
+ Submodules are imported on first access (e.g. sdtoolbox.postshock), so that
+ importing the package does not load modules (and their dependencies, such
+ as matplotlib) that are not used.
 '''
-import sdtoolbox.postshock
-import sdtoolbox.reflections
-import sdtoolbox.thermo
-import sdtoolbox.cv
-import sdtoolbox.cp
-import sdtoolbox.znd
-import sdtoolbox.stagnation
-
-import sdtoolbox.config
-import sdtoolbox.utilities
+import importlib
+
+_submodules = ['postshock',
+               'reflections',
+               'thermo',
+               'cv',
+               'cp',
+               'vp',
+               'znd',
+               'stagnation',
+               'cjmap',
+               'ignition',
+               'convergence',
+               'options',
+               'profiling',
+               'config',
+               'mechcache',
+               'resultcache',
+               'utilities']
+
+# exported by 'from sdtoolbox import *', other submodules are imported by name
+__all__ = ['postshock',
+           'reflections',
+           'thermo',
+           'cv',
+           'cp',
+           'znd',
+           'stagnation',
+           'config',
+           'utilities']
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module('sdtoolbox.' + name)
+    raise AttributeError("module 'sdtoolbox' has no attribute '%s'" % name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules))
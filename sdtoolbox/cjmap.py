@@ -0,0 +1,195 @@
+"""
+Shock and Detonation Toolbox
+"cjmap" module
+
+Calculates CJ detonation speeds on grids of initial pressure, temperature and
+composition using a pool of worker processes.
+
+Grid points are sorted so that neighbouring points (same composition, close
+temperature and pressure) are computed one after another by the same worker,
+each CJ calculation starting from the result of the previous one
+(see postshock.CJ_tangency). Every worker parses the mechanism only once.
+
+This module defines the following functions:
+
+    cj_map
+    cj_map_iter
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+
+import numpy as np
+
+from sdtoolbox.mechcache import get_solution
+from sdtoolbox.options import get_options
+from sdtoolbox.postshock import CJ_tangency
+
+
+def _grid_points(grid):
+    """
+    Returns list of (P1, T1, q) tuples for a list of points or a dictionary
+    of values to be combined.
+    """
+    if isinstance(grid, dict):
+        compositions = grid['q']
+        if isinstance(compositions, (str, dict)):
+            compositions = [compositions]
+        return list(product(np.atleast_1d(grid['P1']).astype(float).tolist(),
+                            np.atleast_1d(grid['T1']).astype(float).tolist(),
+                            compositions))
+    return [tuple(point) for point in grid]
+
+
+def _chunks(points, n_chunks):
+    """
+    Splits point indices into contiguous chunks of neighbouring points.
+    """
+    compositions = {}
+    for P1, T1, q in points:
+        compositions.setdefault(str(q), len(compositions))
+    order = sorted(range(len(points)),
+                   key=lambda k: (compositions[str(points[k][2])], points[k][1], points[k][0]))
+    return [chunk.tolist() for chunk in np.array_split(order, n_chunks) if len(chunk)]
+
+
+def _init_worker(mech):
+    # parse the mechanism once per worker process
+    get_solution(mech)
+
+
+def _cj_chunk(indices, points, mech, options=None):
+    """
+    Calculates CJ speeds for a chunk of neighbouring points, every point
+    starting from the result of the previous one.
+    """
+    results = []
+    guess = None
+    q_prev = None
+    for k, (P1, T1, q) in zip(indices, points):
+        if str(q) != q_prev:
+            guess = None
+            q_prev = str(q)
+        start = time.perf_counter()
+        try:
+            [cj_speed, R2, plot_data, result, cj_guess] = CJ_tangency(
+                P1, T1, q, mech, fullOutput=True, guess=guess, options=options, state=True)
+            rr = plot_data[2]
+            evaluations = len(plot_data[0]) + 1
+            converged = result.converged
+            message = result.message
+            # a solution that did not converge is a poor starting point
+            guess = cj_guess if converged else None
+        except Exception as error:
+            cj_speed = np.nan
+            rr = np.nan
+            evaluations = 0
+            converged = False
+            # drop Cantera's decoration lines
+            message = ' '.join(line.strip() for line in str(error).splitlines()
+                               if line.strip('* ')) or repr(error)
+            guess = None
+        results.append((k, cj_speed, rr, converged, evaluations,
+                        time.perf_counter() - start, message))
+    return results
+
+
+def cj_map_iter(grid, mech, workers=None, chunks_per_worker=4, options=None):
+    """
+    Calculates CJ speeds on a grid of initial states and yields the results
+    as soon as they are available (in arbitrary order).
+
+    FUNCTION SYNTAX:
+        for (k, cj_speed, rr, converged, evaluations, elapsed, message) in
+                cj_map_iter(grid, mech, workers=N):
+            ...
+
+    INPUT:
+        grid = list of (P1, T1, q) tuples or dictionary with keys 'P1', 'T1', 'q'
+               containing values to be combined into all possible points
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml')
+
+    OPTIONAL INPUT:
+        workers = number of worker processes, number of processors by default
+        chunks_per_worker = number of chunks of neighbouring points per worker;
+                            larger values balance the load better, smaller
+                            values give more warm-started points
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
+    OUTPUT:
+        k = index of the point in grid
+        cj_speed = CJ detonation speed (m/s), nan if calculation failed
+        rr = CJ density ratio
+        converged = True if all CJ_calc solutions converged
+        evaluations = number of CJ_calc solutions
+        elapsed = calculation time (s)
+        message = error or convergence message for failed point
+    """
+    points = _grid_points(grid)
+    if not points:
+        return
+    if workers is None:
+        from os import cpu_count
+        workers = cpu_count() or 1
+    chunks = _chunks(points, max(1, workers*chunks_per_worker))
+    # worker processes do not see the default options of this thread
+    options = get_options(options)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(mech,)) as executor:
+        futures = [executor.submit(_cj_chunk, chunk, [points[k] for k in chunk], mech,
+                                   options) for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
+
+
+def cj_map(grid, mech, workers=None, chunks_per_worker=4, callback=None, options=None):
+    """
+    Calculates CJ speeds on a grid of initial states using a process pool.
+
+    FUNCTION SYNTAX:
+        [cj, diagnostics] = cj_map(grid, mech, workers=N)
+
+    INPUT:
+        grid = list of (P1, T1, q) tuples or dictionary with keys 'P1', 'T1', 'q'
+               containing values to be combined into all possible points
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml')
+
+    OPTIONAL INPUT:
+        workers = number of worker processes, number of processors by default
+        chunks_per_worker = number of chunks of neighbouring points per worker
+        callback = function called as callback(k, cj_speed) for every point as
+                   soon as its result is available (e.g. to report progress)
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
+    OUTPUT:
+        cj = record array in the order of grid points with fields
+            P1 = initial pressure (Pa)
+            T1 = initial temperature (K)
+            q = composition
+            cj_speed = CJ detonation speed (m/s), nan if calculation failed
+            rr = CJ density ratio
+        diagnostics = record array in the order of grid points with fields
+            converged = True if all CJ_calc solutions converged
+            evaluations = number of CJ_calc solutions
+            time = calculation time (s)
+            message = error or convergence message for failed points
+    """
+    points = _grid_points(grid)
+    n = len(points)
+    cj = np.recarray(n, dtype=[('P1', float), ('T1', float), ('q', object),
+                               ('cj_speed', float), ('rr', float)])
+    diagnostics = np.recarray(n, dtype=[('converged', bool), ('evaluations', int),
+                                        ('time', float), ('message', object)])
+    for k, (P1, T1, q) in enumerate(points):
+        cj[k] = (P1, T1, q, np.nan, np.nan)
+        diagnostics[k] = (False, 0, 0., '')
+    for (k, cj_speed, rr, converged, evaluations, elapsed, message) in \
+            cj_map_iter(points, mech, workers, chunks_per_worker, options):
+        cj.cj_speed[k] = cj_speed
+        cj.rr[k] = rr
+        diagnostics[k] = (converged, evaluations, elapsed, message)
+        if callback is not None:
+            callback(k, cj_speed)
+    return [cj, diagnostics]
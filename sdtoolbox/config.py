@@ -6,14 +6,45 @@ Used by:
         PostShock_eq
         shock_calc
         shk_eq_calc
+        CJ_calc
 
     "reflections" module:
         reflected_fr
         reflected_eq
         PostReflectedShock_fr
         PostReflectedShock_eq
+        reflected_sweep
+
+    "mechcache" module:
+        get_solution
+        pooled_solutions
+
+    "resultcache" module (on-disk cache of CJspeed and PostShock_eq results):
+        cached
+
+ERRFT, ERRFV, volumeBoundRatio, maxIterations and solverFallback are the
+process-wide defaults of solver options, which can be set per call or per
+thread with SolverOptions (see the "options" module).
 """
+import os
 
 ERRFT = 1e-4
 ERRFV = 1e-4
 volumeBoundRatio = 5
+
+# Iteration cap of the Newton solvers of jump conditions and fallback strategies
+# tried in turn if Newton iteration does not converge: 'damped' and 'bisection'
+# (see the "convergence" module), none by default
+maxIterations = 500
+solverFallback = ()
+
+# Maximal number of parsed mechanisms kept in memory
+mechCacheSize = 8
+
+# Maximal number of idle gas objects per mechanism kept by each thread for reuse
+gasPoolSize = 4
+
+# Persistent cache of results, set resultCache = True to enable
+resultCache = False
+resultCacheDir = os.path.join(os.path.expanduser('~'), '.cache', 'sdtoolbox')
+resultCacheSize = 256*1024**2  # bytes
@@ -0,0 +1,245 @@
+"""
+Shock and Detonation Toolbox
+"convergence" module
+
+Convergence records and fallback strategies of the iterative (Newton) solvers
+of jump conditions: postshock.shk_calc, postshock.shk_eq_calc,
+postshock.CJ_calc, reflections.PostReflectedShock_fr and
+reflections.PostReflectedShock_eq.
+
+With fullOutput=True these solvers return a SolverResult with the converged
+flag, number of iterations, final residuals, number of (equilibrium) state
+evaluations and elapsed time, so batch drivers can detect and retry failed
+points instead of parsing printed messages. Otherwise a RuntimeWarning is
+issued if the calculation did not converge. The gas object of a calculation
+that did not converge is restored to its state on entry (initial guess).
+
+When Newton iteration does not converge within the iteration cap
+(maxIterations from the "config" module), the fallback strategies
+(solverFallback from the "config" module, none by default) are tried in
+order:
+
+    'damped' = Newton iteration restarted from the initial guess with step
+               limits reduced by the factor DAMPING
+    'bisection' = jump conditions reduced to a single equation along the
+               Rayleigh line (or for the temperature in CJ_calc), the root
+               is bracketed on a grid and refined by Brent's method
+
+Where no solution exists (e.g. equilibrium shock slower than the CJ wave),
+the damped restart costs another iteration cap and the bisection some
+hundreds of (equilibrium) state evaluations, several times the cost of the
+failed Newton iteration.
+
+This module defines the following functions:
+
+    apply_fallback
+    bracket_root
+    fold_result
+    rayleigh_bisection
+
+and the following classes:
+
+    SolverResult
+"""
+
+import time
+
+import cantera as ct
+import numpy as np
+from scipy.optimize import brentq
+
+# Step limit factor of the 'damped' fallback strategy
+DAMPING = 0.25
+
+
+class SolverResult(dict):
+    """
+    Convergence record of an iterative solver. A dictionary whose items are
+    also available as attributes:
+
+        converged = True if the tolerances were met
+        iterations = number of iterations (of all strategies tried)
+        residuals = residuals of the jump conditions at the solution
+                    ([FH, FP], J/kg and Pa)
+        state_calls = number of gas (or equilibrium) state evaluations
+        time = elapsed time (s)
+        strategy = strategy that produced the solution ('newton', 'damped'
+                   or 'bisection')
+        message = description of the failure ('' if converged)
+    """
+    def __init__(self, converged=True, iterations=0, residuals=None, state_calls=0,
+                 time=0., strategy='newton', message=''):
+        super(SolverResult, self).__init__(converged=converged, iterations=iterations,
+                                           residuals=residuals, state_calls=state_calls,
+                                           time=time, strategy=strategy, message=message)
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def apply_fallback(result, fallback, strategies):
+    """
+    Tries fallback strategies in turn until one of them converges.
+
+    FUNCTION SYNTAX:
+        result = apply_fallback(result,fallback,strategies)
+
+    INPUT:
+        result = SolverResult of the failed Newton iteration
+        fallback = sequence of strategy names to try, e.g. ('damped', 'bisection')
+        strategies = dictionary of functions (without arguments) returning the
+                     SolverResult of every available strategy
+
+    OUTPUT:
+        result = SolverResult of the last strategy tried, with iterations and
+                 state_calls of all strategies summed up
+    """
+    for name in fallback:
+        if name not in strategies:
+            raise ValueError("unknown solver fallback strategy '%s'" % name)
+        attempt = strategies[name]()
+        attempt.iterations += result.iterations
+        attempt.state_calls += result.state_calls
+        result = attempt
+        if result.converged:
+            break
+    return result
+
+
+def fold_result(record, result):
+    """
+    Adds the convergence record of an inner calculation (e.g. CJ_calc within
+    CJspeed) to the record of the outer one.
+
+    FUNCTION SYNTAX:
+        fold_result(record,result)
+
+    INPUT:
+        record = SolverResult of the outer calculation (updated in place)
+        result = SolverResult of the inner calculation
+    """
+    record.iterations += result.iterations
+    record.state_calls += result.state_calls
+    record.residuals = result.residuals
+    record.strategy = result.strategy
+    if not result.converged:
+        record.converged = False
+        record.message = result.message
+
+
+def bracket_root(f, grid, xtol=2e-12):
+    """
+    Finds the first sign change of f on the grid and refines the root by
+    Brent's method. Points where f fails (raises an exception or returns nan)
+    are skipped.
+
+    FUNCTION SYNTAX:
+        x = bracket_root(f,grid)
+
+    INPUT:
+        f = scalar function
+        grid = sequence of points to look for a sign change
+
+    OPTIONAL INPUT:
+        xtol = absolute tolerance of the root
+
+    OUTPUT:
+        x = root of f (None if no sign change was found)
+    """
+    def value(x):
+        try:
+            return f(x)
+        except Exception:
+            return np.nan
+
+    previous = None
+    for x in grid:
+        fx = value(x)
+        if not np.isfinite(fx):
+            continue
+        if fx == 0:
+            return x
+        if previous is not None and previous[1]*fx < 0:
+            return brentq(f, previous[0], x, xtol=xtol)
+        previous = (x, fx)
+    return None
+
+
+def rayleigh_bisection(gas, state, pressure, energy, V_max, ERRFT, ERRFV):
+    """
+    Solves jump conditions by reduction to a single equation along the
+    Rayleigh line: for a volume V the temperature is found at which the state
+    pressure equals the Rayleigh line pressure, and the first root (from the
+    smallest volume, i.e. the strong shock solution) of the energy residual is
+    bracketed on a grid of volumes below V_max. The gas is left at the solution.
+
+    FUNCTION SYNTAX:
+        result = rayleigh_bisection(gas,state,pressure,energy,V_max,ERRFT,ERRFV)
+
+    INPUT:
+        gas = working gas object
+        state = function (gas,r,T) setting the state and returning [P, H],
+                e.g. thermo.state or thermo.eq_state
+        pressure = function (V) of the Rayleigh line pressure
+        energy = function () of the energy and pressure residuals [FH, FP]
+                 at the current state of gas
+        V_max = upstream volume (bound of the volume grid)
+        ERRFT,ERRFV = error tolerances
+
+    OUTPUT:
+        result = SolverResult with strategy 'bisection' (iterations are the
+                 evaluations of the energy residual)
+    """
+    start = time.perf_counter()
+    calls = [0]
+    evaluations = [0]
+
+    def set_temperature(V):
+        # temperature at which the pressure is on the Rayleigh line
+        PR = pressure(V)
+        if PR <= 0:
+            raise ValueError('negative pressure on the Rayleigh line')
+
+        def residual(T):
+            calls[0] = calls[0] + 1
+            return state(gas, 1/V, T)[0] - PR
+
+        # ideal gas estimate, bracket expanded by factors of 1.5
+        T = PR*V*gas.mean_molecular_weight/ct.gas_constant
+        lo = T/1.5
+        hi = T*1.5
+        k = 0
+        while residual(lo) > 0 and k < 10:
+            lo = lo/1.5
+            k = k + 1
+        while residual(hi) < 0 and k < 20:
+            hi = hi*1.5
+            k = k + 1
+        T = brentq(residual, lo, hi, xtol=0.1*ERRFT*T)
+        calls[0] = calls[0] + 1
+        state(gas, 1/V, T)
+
+    def residual(V):
+        evaluations[0] = evaluations[0] + 1
+        set_temperature(V)
+        return energy()[0]
+
+    grid = V_max*np.linspace(0.02, 1 - 10*ERRFV, 50)
+    V = bracket_root(residual, grid, xtol=0.1*ERRFV*V_max)
+    result = SolverResult(strategy='bisection')
+    if V is None:
+        result.converged = False
+        result.message = 'no root bracketed along the Rayleigh line'
+    else:
+        set_temperature(V)
+        result.residuals = energy()
+    result.iterations = evaluations[0]
+    result.state_calls = calls[0]
+    result.time = time.perf_counter() - start
+    return result
@@ -42,7 +42,10 @@ Formatted according to PEP by Alexander Drakon
 
 import cantera as ct
 import numpy as np
-from scipy.integrate import solve_ivp
+
+from sdtoolbox.ignition import explosion_times, integrate
+from sdtoolbox.mechcache import preserves_state
+from sdtoolbox.profiling import phase, profiled
 
 
 class CVSys(object):
@@ -79,10 +82,67 @@ class CVSys(object):
 
         return np.hstack((dTdt, dYdt))
 
+    def jac(self, t, y):
+        """
+        Evaluates the Jacobian of the system defined in __call__ using
+        Cantera's analytic derivatives of net production rates with respect
+        to temperature and species concentrations. Derivative of the mixture
+        heat capacity with respect to temperature is evaluated by a finite
+        difference.
+
+        INPUT:
+            t = time
+            y = solution array [temperature, species mass 1, 2, ...]
+
+        OUTPUT:
+            Jacobian matrix d(dy/dt)/dy (dense array: temperature, pressure
+            and mass fraction normalization couple all species).
 
+        """
+        gas = self.gas
+        rho = gas.density
+        # Heat capacity derivative
+        gas.TDY = y[0]*1.0001, rho, y[1:]
+        cv1 = gas.cv_mass
+        gas.TDY = y[0], rho, y[1:]
+        T = gas.T
+        cv = gas.cv_mass
+        dcvdT = (cv1 - cv)/(0.0001*T)
+
+        W = gas.molecular_weights
+        wdot = gas.net_production_rates
+        u = ct.gas_constant*T*(gas.standard_enthalpies_RT - 1)
+        cvk = ct.gas_constant*(gas.standard_cp_R - 1)
+
+        # Derivatives of production rates at constant density, P = RT*sum(C)
+        ddP = gas.net_production_rates_ddP
+        dwdT = gas.net_production_rates_ddT + ddP*gas.P/T
+        dwdY = (gas.net_production_rates_ddCi
+                + np.outer(ddP, ct.gas_constant*T*np.ones(gas.n_species)))*(rho/W)
+
+        dTdt = -np.dot(u, wdot)/(rho*cv)
+        J = np.empty((gas.n_species + 1, gas.n_species + 1))
+        J[0, 0] = -(np.dot(cvk, wdot) + np.dot(u, dwdT))/(rho*cv) - dTdt*dcvdT/cv
+        J[0, 1:] = -np.dot(u, dwdY)/(rho*cv) - dTdt*cvk/(W*cv)
+        J[1:, 0] = W*dwdT/rho
+        J[1:, 1:] = (W/rho)[:, np.newaxis]*dwdY
+
+        # Cantera clips negative mass fractions and normalizes the rest
+        # when the state is set, account for that in mass fraction derivatives
+        Y = y[1:]
+        dfdY = J[:, 1:]
+        dfdY -= np.dot(dfdY, gas.Y)[:, np.newaxis]
+        dfdY /= np.sum(Y[Y > 0])
+        dfdY[:, Y < 0] = 0
+        return J
+
+
+@profiled()
+@preserves_state('gas')
 def cvsolve(gas,
             t_end=1e-6, max_step=1e-5, t_eval=None,
-            relTol=1e-5, absTol=1e-8, Method='LSODA'):
+            relTol=1e-5, absTol=1e-8, Method='LSODA',
+            jacobian='auto', ignition=None, ignition_threshold=None, t_max=None):
     """
     Solves the ODE system defined in CVSys, taking the gas object input as the
     initial state.
@@ -99,7 +159,7 @@ def cvsolve(gas,
         output = cvsolve(gas,**kwargs)
 
     INPUT:
-        gas = working gas object
+        gas = gas object at initial state (restored on return)
 
     OPTIONAL INPUT:
         t_end = end time for integration, in sec
@@ -110,6 +170,17 @@ def cvsolve(gas,
         relTol = relative tolerance
         absTol = absolute tolerances
         Method = method of integration, 'LSODA' is default.
+        jacobian = 'auto' (default) to pass Jacobian from CVSys.jac to 'LSODA'
+                   and 'BDF' methods, 'analytic' to pass it to 'Radau' as well
+                   (usually slower there than the integrator's own estimate),
+                   'fd' to let the integrator estimate it by finite differences
+        ignition = ignition criterion stopping the integration shortly after
+                   ignition: 'dTdt', 'T' or species name (see ignition module);
+                   t_end is then only the first guess of the end time and is
+                   doubled while ignition has not occurred.
+                   None (default) integrates to t_end.
+        ignition_threshold = threshold of the ignition criterion
+        t_max = maximal end time with ignition criterion, 1000*t_end by default
 
     OUTPUT:
         output = a dictionary containing the following results:
@@ -119,7 +190,9 @@ def cvsolve(gas,
             speciesY = species mass fraction array
             speciesX = species mole fraction array
 
-            gas = working gas object
+            gas = input gas object (restored to its initial state on return)
+            state = final state (T, density, Y) of the reacted gas,
+                    set with gas.TDY = output['state']
 
             exo_time = pulse width (in secs) of temperature gradient (using 1/2 max)
             ind_time = time to maximum temperature gradient
@@ -129,118 +202,48 @@ def cvsolve(gas,
     r0 = gas.density
     y0 = np.hstack((gas.T, gas.Y))
 
-    tel = [0., t_end]  # Timespan
-
     output = {}
 
-    out = solve_ivp(CVSys(gas), tel, y0, method=Method,
-                    atol=absTol, rtol=relTol, max_step=max_step, t_eval=t_eval)
+    system = CVSys(gas)
+    if (jacobian == 'auto' and Method in ('LSODA', 'BDF')
+            or jacobian == 'analytic' and Method in ('LSODA', 'Radau', 'BDF')):
+        jac = system.jac
+    else:
+        jac = None
 
-    output['time'] = out.t
-    output['T'] = out.y[0, :]
-    output['speciesY'] = out.y[1:, :]
+    phase('integration')
+    [t, y, ignited] = integrate(system, y0, t_end, ignition, ignition_threshold,
+                                t_max, t_eval=t_eval, method=Method, jac=jac,
+                                atol=absTol, rtol=relTol, max_step=max_step)
+    phase('post-processing')
+
+    output['time'] = t
+    output['T'] = y[0, :]
+    output['speciesY'] = y[1:, :]
 
-    # Initialize additional output matrices where needed
     b = len(output['time'])
-    output['P'] = np.zeros(b)
-    output['dTdt'] = np.zeros(b)
-    output['speciesX'] = np.zeros(output['speciesY'].shape)
-    output['ind_time'] = 0
-    output['ind_time_90'] = 0
-    output['ind_time_10'] = 0
-    output['exo_time'] = 0
-    temp_grad = np.zeros(b)
 
     #############################################################################
     # Extract PRESSSURE and TEMPERATURE GRADIENT
     #############################################################################
 
-    # Have to loop for operations involving the working gas object
-    for i, T in enumerate(output['T']):
-        gas.TDY = T, r0, output['speciesY'][:, i]
-        wt = gas.mean_molecular_weight
-        s = 0
-        for z in range(gas.n_species):
-            w = gas.molecular_weights[z]
-            e = ct.gas_constant*T*(gas.standard_enthalpies_RT[z]/w - 1/wt)
-            s = s + e*w*gas.net_production_rates[z]
-
-        temp_grad[i] = -s/(r0*gas.cv_mass)
-        output['P'][i] = gas.P
-        output['speciesX'][:, i] = gas.X
-        output['dTdt'][i] = temp_grad[i]
-
-    n = temp_grad.argmax()
-
-    if n == b:
-        print('Error: Maximum temperature gradient occurs at the end of the reaction zone')
-        print('       Your final integration length may be too short,')
-        print('       your mixture may be too rich/lean, or something else may be wrong')
-        print(' ')
-        output['ind_time'] = output['time'][b]
-        output['ind_time_10'] = output['time'][b]
-        output['ind_time_90'] = output['time'][b]
-        output['exo_time'] = 0
-        print('Induction Time: '+str(output['ind_time']))
-        print('Exothermic Pulse Time: '+str(output['exo_time']))
-        return output
-    elif n == 0:
-        print('Error: Maximum temperature gradient occurs at the beginning of the reaction zone')
-        print('       Your final integration length may be too short,')
-        print('       your mixture may be too rich/lean, or something else may be wrong')
-        print(' ')
-        output['ind_time'] = output['time'][0]
-        output['ind_time_10'] = output['time'][0]
-        output['ind_time_90'] = output['time'][0]
-        output['exo_time'] = 0
-        print('Induction Time: '+str(output['ind_time']))
-        print('Exothermic Pulse Time: '+str(output['exo_time']))
-        return output
-    else:
-        output['ind_time'] = output['time'][n]
-
-        k = 0
-        MAX10 = 0.1*max(temp_grad)
-        d = temp_grad[0]
-        while d < MAX10 and k < n:
-            k = k + 1
-            d = temp_grad[k]
-        output['ind_time_10'] = output['time'][k]
-
-        k = 0
-        MAX90 = 0.9*max(temp_grad)
-        d = temp_grad[0]
-        while d < MAX90 and k < n:
-            k = k + 1
-            d = temp_grad[k]
-        output['ind_time_90'] = output['time'][k]
-
-        # find exothermic time
-        tstep2 = 0
-        half_T_flag1 = 0
-        half_T_flag2 = 0
-        # Go into a loop to find two times when temperature is half its maximum
-        for j, tgrad in enumerate(list(temp_grad)):
-            if half_T_flag1 == 0:
-                if tgrad > 0.5*max(temp_grad):
-                    half_T_flag1 = 1
-                    tstep1 = j
-
-            elif half_T_flag2 == 0:
-                if tgrad < 0.5*max(temp_grad):
-                    half_T_flag2 = 1
-                    tstep2 = j
-                else:
-                    tstep2 = 0
-
-    # Exothermic time for CV explosion
-    if tstep2 == 0:
-        print('Error: No pulse in the temperature gradient')
-        print('       Your final integration length may be too short,')
-        print('       your mixture may be too rich/lean, or something else may be wrong')
-        output['exo_time'] = 0
-    else:
-        output['exo_time'] = output['time'][tstep2] - output['time'][tstep1]
+    # Evaluate properties of all states at once
+    states = ct.SolutionArray(gas, b)
+    states.TDY = output['T'], r0, output['speciesY'].T
+    W = gas.molecular_weights
+    wt = states.mean_molecular_weight
+    e = ct.gas_constant*output['T'][:, np.newaxis]*(states.standard_enthalpies_RT/W
+                                                    - 1/wt[:, np.newaxis])
+    s = np.sum(e*W*states.net_production_rates, axis=1)
+
+    temp_grad = -s/(r0*states.cv_mass)
+    output['P'] = states.P
+    output['speciesX'] = states.X.T
+    output['dTdt'] = temp_grad
+    output['state'] = (output['T'][-1], r0, output['speciesY'][:, -1])
+
+    [output['ind_time'], output['ind_time_10'], output['ind_time_90'],
+     output['exo_time']] = explosion_times(output['time'], temp_grad)
 
     output['gas'] = gas
     return output
@@ -0,0 +1,214 @@
+"""
+Shock and Detonation Toolbox
+"ignition" module
+
+Event-driven integration of explosion (reactor) problems. Instead of
+integrating to a fixed end time, the integration is stopped shortly after
+ignition is detected and the end time is extended automatically while
+ignition has not occurred yet. Used by cv.cvsolve, cp.cpsolve and vp.vpsolve.
+
+Ignition is detected by one of the criteria:
+
+    'dTdt' = temperature gradient has passed its peak (fallen to a half of it)
+             after the temperature has risen by more than the threshold
+             (default 10 K); early small peaks of the gradient are ignored
+    'T' = temperature has risen above the initial one by more than the
+          threshold (default 100 K)
+    species name (e.g. 'OH') = mass fraction of the species has passed its
+             peak and decreased by the threshold fraction (default 0.05) of it
+             after the temperature has risen by more than 10 K; suitable for
+             intermediates only
+
+After ignition is detected the integration continues until the temperature
+gradient decays to 10% of its peak, so the whole exothermic pulse is resolved
+and the induction and exothermic times are evaluated as usual (explosion_times).
+
+This module defines the following functions:
+
+    integrate
+    explosion_times
+
+and the following classes:
+
+    IgnitionEvent
+"""
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+
+class IgnitionEvent(object):
+    """
+    Terminal event function for scipy.integrate.solve_ivp detecting ignition.
+
+    FUNCTION SYNTAX:
+        event = IgnitionEvent(system, criterion, threshold)
+
+    INPUT:
+        system = reactor system (e.g. CVSys) with the gas object at the initial
+                 state, solution array is [temperature, species mass 1, 2, ...]
+
+    OPTIONAL INPUT:
+        criterion = 'dTdt' (default), 'T' or species name
+        threshold = threshold of the criterion (temperature rise in K for 'dTdt'
+                    and 'T', decrease fraction of the peak for species)
+    """
+    terminal = True
+    direction = -1
+    # minimal temperature rise (K) for peak criteria, smaller peaks of the
+    # temperature gradient or species are considered as induction chemistry
+    min_rise = 10.
+
+    def __init__(self, system, criterion='dTdt', threshold=None):
+        self.system = system
+        self.criterion = criterion
+        self.T0 = system.gas.T
+        self.peak = 0.
+        self.species_peak = 0.
+        self.detected = False
+        if criterion == 'dTdt':
+            self.threshold = self.min_rise if threshold is None else threshold
+        elif criterion == 'T':
+            self.threshold = 100. if threshold is None else threshold
+        else:
+            self.threshold = 0.05 if threshold is None else threshold
+            self.index = 1 + system.gas.species_index(criterion)
+
+    def _detect(self, y, dTdt):
+        if self.criterion == 'dTdt':
+            return y[0] - self.T0 > self.threshold and dTdt < 0.5*self.peak
+        if self.criterion == 'T':
+            return y[0] - self.T0 > self.threshold
+        self.species_peak = max(self.species_peak, y[self.index])
+        return (y[0] - self.T0 > self.min_rise
+                and y[self.index] < (1 - self.threshold)*self.species_peak)
+
+    def __call__(self, t, y):
+        dTdt = self.system(t, y)[0]
+        self.peak = max(self.peak, dTdt)
+        if not self.detected:
+            self.detected = self._detect(y, dTdt)
+            if not self.detected:
+                return 1.
+        return dTdt - 0.1*self.peak
+
+
+def integrate(system, y0, t_end, ignition=None, threshold=None, t_max=None,
+              t_eval=None, **options):
+    """
+    Integrates the reactor system from t = 0 using scipy.integrate.solve_ivp.
+
+    Without ignition criterion the system is integrated to t_end. Otherwise the
+    integration stops when ignition is detected (see IgnitionEvent); if it has
+    not occurred by t_end, the end time is doubled until ignition or t_max.
+
+    FUNCTION SYNTAX:
+        [t, y, ignited] = integrate(system, y0, t_end, **kwargs)
+
+    INPUT:
+        system = reactor system (e.g. CVSys) with the gas object at the initial state
+        y0 = initial solution array
+        t_end = end time (first guess of the end time with ignition criterion), s
+
+    OPTIONAL INPUT:
+        ignition = None (fixed end time), 'dTdt', 'T' or species name
+        threshold = ignition criterion threshold, see IgnitionEvent
+        t_max = maximal end time with ignition criterion, 1000*t_end by default
+        t_eval = array of time values to evaluate the solution at
+        options = other solve_ivp keyword arguments (method, jac, atol, ...)
+
+    OUTPUT:
+        t = time array
+        y = solution array
+        ignited = True if ignition criterion was met, None without criterion
+    """
+    if ignition is None:
+        out = solve_ivp(system, [0., t_end], y0, t_eval=t_eval, **options)
+        return [out.t, out.y, None]
+
+    if t_max is None:
+        t_max = 1000*t_end
+    event = IgnitionEvent(system, ignition, threshold)
+    t = []
+    y = []
+    t0 = 0.
+    t1 = min(t_end, t_max)
+    while True:
+        out = solve_ivp(system, [t0, t1], y0, events=event,
+                        dense_output=t_eval is not None, **options)
+        if t_eval is None:
+            # the first point of a segment repeats the last one of the previous
+            start = 1 if t else 0
+            t.append(out.t[start:])
+            y.append(out.y[:, start:])
+        else:
+            t_eval = np.asarray(t_eval)
+            inside = (t_eval <= out.t[-1]) & ((t_eval > t0) if t else (t_eval >= t0))
+            t.append(t_eval[inside])
+            y.append(out.sol(t_eval[inside]))
+        ignited = out.status == 1
+        if ignited or out.status < 0 or t1 >= t_max:
+            break
+        t0 = t1
+        t1 = min(2*t1, t_max)
+        y0 = out.y[:, -1]
+    return [np.hstack(t), np.hstack(y), ignited]
+
+
+def explosion_times(time, temp_grad):
+    """
+    Evaluates induction and exothermic times of an explosion from the
+    temperature gradient history.
+
+    FUNCTION SYNTAX:
+        [ind_time, ind_time_10, ind_time_90, exo_time] = explosion_times(time, temp_grad)
+
+    INPUT:
+        time = time array
+        temp_grad = temperature gradient array
+
+    OUTPUT:
+        ind_time = time to maximum temperature gradient
+        ind_time_10 = time to 10% of maximum temperature gradient
+        ind_time_90 = time to 90% of maximum temperature gradient
+        exo_time = pulse width (in secs) of temperature gradient (using 1/2 max)
+    """
+    n = temp_grad.argmax()
+
+    if n == 0:
+        print('Error: Maximum temperature gradient occurs at the beginning of the reaction zone')
+        print('       Your final integration length may be too short,')
+        print('       your mixture may be too rich/lean, or something else may be wrong')
+        print(' ')
+        print('Induction Time: '+str(time[0]))
+        print('Exothermic Pulse Time: '+str(0))
+        return [time[0], time[0], time[0], 0]
+
+    ind_time = time[n]
+
+    MAX10 = 0.1*temp_grad[n]
+    k = np.nonzero(temp_grad[:n + 1] >= MAX10)[0]
+    ind_time_10 = time[k[0] if len(k) else n]
+
+    MAX90 = 0.9*temp_grad[n]
+    k = np.nonzero(temp_grad[:n + 1] >= MAX90)[0]
+    ind_time_90 = time[k[0] if len(k) else n]
+
+    # find exothermic time: two times when temperature gradient is half its maximum
+    tstep2 = 0
+    above = np.nonzero(temp_grad > 0.5*temp_grad[n])[0]
+    if len(above):
+        tstep1 = above[0]
+        below = np.nonzero(temp_grad[tstep1 + 1:] < 0.5*temp_grad[n])[0]
+        if len(below):
+            tstep2 = tstep1 + 1 + below[0]
+
+    if tstep2 == 0:
+        print('Error: No pulse in the temperature gradient')
+        print('       Your final integration length may be too short,')
+        print('       your mixture may be too rich/lean, or something else may be wrong')
+        exo_time = 0
+    else:
+        exo_time = time[tstep2] - time[tstep1]
+
+    return [ind_time, ind_time_10, ind_time_90, exo_time]
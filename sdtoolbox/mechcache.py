@@ -0,0 +1,336 @@
+"""
+Shock and Detonation Toolbox
+"mechcache" module
+
+Process-wide cache of parsed reaction mechanisms. Parsing a mechanism file is
+by far the most expensive part of creating a Cantera Solution, so every
+mechanism (file path + phase name + file modification time) is parsed only
+once; afterwards independent Solution objects are cloned from the parsed
+species and reactions of a template object. Clones are identical to objects
+parsed from the file, including the order of elements (which affects the
+path of equilibrium calculations, and with it the number of iterations).
+Cantera adds the elements of a cloned phase in the order of their first
+appearance in the species, so mechanisms declaring the elements in another
+order (e.g. elements: [O, H, C, N, Ar] with H2 as the first species, as in
+GRI-Mech) cannot be cloned; for them the template is kept only to check
+this once per mechanism and new objects are reloaded with Cantera, which
+reuses its own cache of the parsed input file.
+
+The number of cached mechanisms is bounded (least recently used entries are
+dropped first) by mechCacheSize from the "config" module.
+
+Functions that need internal working gas objects (postshock.CJspeed,
+postshock.PostShock_fr, ...) check them out of a pool of idle Solution
+objects with pooled_solutions and return them after use, so inner loops do
+not pay for creating Solution objects. Pools are local to a thread (and to a
+process), at most gasPoolSize from the "config" module idle objects are kept
+per mechanism. Functions taking gas objects of the caller (cv.cvsolve, ...)
+restore their state on return (preserves_state).
+
+This module defines the following functions:
+
+    get_solution
+    copy_solution
+    pooled_solutions
+    preserves_state
+    clear_cache
+    cache_info
+"""
+
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import cantera as ct
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+# idle gas objects of this thread with their initial states,
+# dictionary (name, path, mtime) -> list of (gas, TPY)
+_local = threading.local()
+
+
+class _Template(object):
+    """
+    Parsed mechanism from which new Solution objects are cloned.
+    """
+    def __init__(self, gas):
+        self.name = gas.name
+        self.thermo_model = gas.thermo_model
+        self.kinetics_model = gas.kinetics_model
+        self.transport_model = gas.transport_model
+        self.species = gas.species()
+        self.reactions = gas.reactions()
+        self.state = gas.TPY
+        # Cloning from species and reactions reproduces the phase exactly only
+        # for ideal gas mixtures, and only if the elements (added in the order
+        # of their first appearance in the species) come in the order declared
+        # in the file: the order changes the path of equilibrium calculations.
+        # Other phases are reloaded from the file (Cantera keeps its own cache
+        # of the parsed input in that case).
+        self.element_names = gas.element_names
+        self.clonable = (gas.thermo_model == 'ideal-gas'
+                         and self._build().element_names == gas.element_names)
+
+    def matches(self, gas):
+        """
+        Returns True if the gas object has the species, elements and
+        reactions of the template (i.e. was not modified after parsing).
+        """
+        return (gas.thermo_model == self.thermo_model
+                and gas.species_names == [species.name for species in self.species]
+                and gas.element_names == self.element_names
+                and gas.n_reactions == len(self.reactions))
+
+    def _build(self):
+        return ct.Solution(thermo=self.thermo_model, kinetics=self.kinetics_model,
+                           transport_model=self.transport_model,
+                           species=self.species, reactions=self.reactions,
+                           name=self.name)
+
+    def clone(self, mech, name):
+        if not self.clonable:
+            return ct.Solution(mech, name)
+        gas = self._build()
+        gas.TPY = self.state
+        return gas
+
+
+def _resolve(mech):
+    """
+    Returns absolute path and modification time of the mechanism file.
+    Files not found locally are looked up in the Cantera data directories;
+    if not found there either (e.g. built-in data) the name is used as is.
+    """
+    candidates = [mech] + [os.path.join(d, mech) for d in ct.get_data_directories()]
+    for path in candidates:
+        if os.path.isfile(path):
+            path = os.path.abspath(path)
+            return path, os.path.getmtime(path)
+    return mech, None
+
+
+def get_solution(mech, name=''):
+    """
+    Returns new Solution object for the mechanism, parsing the mechanism file
+    only on the first request (or after the file was modified).
+
+    FUNCTION SYNTAX:
+        gas = get_solution(mech)
+        gas = get_solution(mech, name)
+
+    INPUT:
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml')
+
+    OPTIONAL INPUT:
+        name = name of the phase in mechanism file, first phase is used by default
+
+    OUTPUT:
+        gas = new gas object independent of any other object returned before,
+              identical to ct.Solution(mech, name)
+    """
+    [template, gas] = _template(mech, name)
+    if gas is None:
+        gas = template.clone(mech, name)
+    return gas
+
+
+def _template(mech, name):
+    """
+    Returns the cached template of the mechanism and, if the mechanism was
+    parsed by this call, the parsed gas object (None otherwise).
+    """
+    from sdtoolbox.config import mechCacheSize
+
+    path, mtime = _resolve(mech)
+    key = (path, name)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == mtime:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return [entry[1], None]
+        _stats['misses'] += 1
+
+    gas = ct.Solution(mech, name)
+    template = _Template(gas)
+    with _lock:
+        _cache[key] = (mtime, template)
+        _cache.move_to_end(key)
+        while len(_cache) > max(mechCacheSize, 0):
+            _cache.popitem(last=False)
+    return [template, gas]
+
+
+def copy_solution(gas):
+    """
+    Returns new Solution object with the same species, reactions and state as
+    the given one, for functions that need working gas objects but get only
+    the initial state. Gas objects loaded from a file are cloned from the
+    cached template of the file (see get_solution).
+
+    FUNCTION SYNTAX:
+        gas2 = copy_solution(gas)
+
+    INPUT:
+        gas = gas object (not modified)
+
+    OUTPUT:
+        gas2 = new gas object independent of gas
+    """
+    template = None
+    if _resolve(gas.source)[1] is not None:
+        template = _template(gas.source, gas.name)[0]
+        if not template.matches(gas):
+            # modified after parsing, copy the gas object itself
+            template = None
+    if template is None:
+        template = _Template(gas)
+        source = None
+    else:
+        source = gas.source
+    if template.clonable or source is not None:
+        copy = template.clone(source, gas.name)
+    else:
+        # defined in memory, copy its definition
+        copy = ct.Solution(yaml=json.dumps({
+            'phases': [dict(gas.input_data, species=gas.species_names)],
+            'species': [species.input_data for species in template.species],
+            'reactions': [reaction.input_data for reaction in template.reactions]}))
+    copy.TDY = gas.TDY
+    return copy
+
+
+def _pool():
+    """
+    Returns pool of idle gas objects of the current thread. A process forked
+    with the pool of its parent starts with an empty one.
+    """
+    if getattr(_local, 'pid', None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.pool = {}
+    return _local.pool
+
+
+@contextlib.contextmanager
+def pooled_solutions(mech, count=1, name=''):
+    """
+    Context manager checking out gas objects of the mechanism from the pool
+    of the current thread (new objects are created with get_solution if the
+    pool is empty) and returning them to the pool on exit. Checked out objects
+    are in the initial state of new objects, they must not be used after exit.
+
+    FUNCTION SYNTAX:
+        with pooled_solutions(mech, 2) as [gas, gas1]:
+            ...
+
+    INPUT:
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml')
+
+    OPTIONAL INPUT:
+        count = number of gas objects
+        name = name of the phase in mechanism file, first phase is used by default
+
+    OUTPUT:
+        gases = list of gas objects
+    """
+    from sdtoolbox.config import gasPoolSize
+
+    key = (name,) + _resolve(mech)
+    idle = _pool().setdefault(key, [])
+    entries = []
+    for _ in range(count):
+        if idle:
+            entry = idle.pop()
+            entry[0].TPY = entry[1]
+        else:
+            gas = get_solution(mech, name)
+            entry = (gas, gas.TPY)
+        entries.append(entry)
+    try:
+        yield [entry[0] for entry in entries]
+    finally:
+        # the pool may have been cleared meanwhile
+        idle = _pool().setdefault(key, [])
+        idle.extend(entries[:max(gasPoolSize - len(idle), 0)])
+
+
+def preserves_state(*names):
+    """
+    Decorator restoring the state (T, density, Y) of gas objects passed as
+    the given arguments when the function returns or raises, so that
+    functions using the gas objects of the caller as working objects never
+    leave them modified.
+
+    FUNCTION SYNTAX:
+        @preserves_state('gas', 'gas1')
+        def zndsolve(gas, gas1, U1, ...):
+
+    INPUT:
+        names = names of the gas object arguments
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            gases = [arguments[name] for name in names if name in arguments]
+            states = [gas.TDY for gas in gases]
+            try:
+                return func(*args, **kwargs)
+            finally:
+                for gas, state in zip(gases, states):
+                    gas.TDY = state
+        return wrapper
+    return decorator
+
+
+def clear_cache(mech=None):
+    """
+    Drops cached mechanisms and idle gas objects of the current thread.
+
+    FUNCTION SYNTAX:
+        clear_cache()
+        clear_cache(mech)
+
+    OPTIONAL INPUT:
+        mech = mechanism file to drop (all phases), all mechanisms are dropped by default
+    """
+    pool = _pool()
+    with _lock:
+        if mech is None:
+            _cache.clear()
+            pool.clear()
+            _stats['hits'] = 0
+            _stats['misses'] = 0
+            return
+        path = _resolve(mech)[0]
+        for key in [key for key in _cache if key[0] == path]:
+            del _cache[key]
+        for key in [key for key in pool if key[1] == path]:
+            del pool[key]
+
+
+def cache_info():
+    """
+    Returns cache statistics.
+
+    FUNCTION SYNTAX:
+        info = cache_info()
+
+    OUTPUT:
+        info = dictionary with number of hits, misses, current size and maximal
+               size, and number of idle gas objects in the pool of the current thread
+    """
+    from sdtoolbox.config import mechCacheSize
+
+    pooled = sum(len(idle) for idle in _pool().values())
+    with _lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses'],
+                'size': len(_cache), 'maxsize': mechCacheSize, 'pooled': pooled}
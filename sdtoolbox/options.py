@@ -0,0 +1,141 @@
+"""
+Shock and Detonation Toolbox
+"options" module
+
+Solver options (iteration tolerances, volume bound ratio, iteration cap and
+fallback strategies) passed per call instead of the process-wide settings of
+the "config" module.
+
+Functions solving jump conditions (postshock, reflections, cjmap) take an
+optional options argument. Settings not given there are taken from the
+default options of the current thread (set by using SolverOptions as a context
+manager) and then from the "config" module:
+
+    fine = SolverOptions(ERRFT=1e-6, ERRFV=1e-6)
+    gas = PostShock_eq(U1, P1, T1, q, mech, options=fine)
+    with SolverOptions(ERRFT=1e-3, ERRFV=1e-3):
+        # coarse screening pass, does not affect other threads
+        output = PostShock_eq_batch(U1, P1, T1, q, mech)
+
+Defaults are stored in a context variable, so they are local to a thread (and
+to an asyncio task). Worker processes do not inherit them: pass options
+explicitly to functions running in other processes.
+
+This module defines the following functions:
+
+    get_options
+
+and the following classes:
+
+    SolverOptions
+"""
+
+import contextvars
+
+# stack of default options entered in the current thread (or task)
+_defaults = contextvars.ContextVar('sdtoolbox_solver_options', default=())
+
+
+class SolverOptions(object):
+    """
+    Immutable set of solver options. Settings not given are inherited from
+    the default options and the "config" module when the options are used.
+
+    SYNTAX:
+        options = SolverOptions(ERRFT=1e-6, ERRFV=1e-6)
+        with SolverOptions(maxIterations=100, solverFallback=()):
+            ...
+
+    OPTIONAL INPUT:
+        ERRFT, ERRFV = relative tolerances of temperature and volume (or speed)
+                       in Newton iteration
+        volumeBoundRatio = lower bound on volume/density ratio, used for the
+                           preliminary guess of post-shock states
+        maxIterations = iteration cap of Newton solvers
+        solverFallback = sequence of fallback strategies ('damped',
+                         'bisection'), see sdtoolbox.convergence
+    """
+    FIELDS = ('ERRFT', 'ERRFV', 'volumeBoundRatio', 'maxIterations', 'solverFallback')
+
+    def __init__(self, **settings):
+        for name in settings:
+            if name not in self.FIELDS:
+                raise TypeError("unknown solver option '%s'" % name)
+        # None stands for an inherited setting
+        settings = dict((name, value) for name, value in settings.items() if value is not None)
+        if settings.get('solverFallback') is not None:
+            settings['solverFallback'] = tuple(settings['solverFallback'])
+        object.__setattr__(self, '_settings', settings)
+
+    def __getattr__(self, name):
+        if name in self.FIELDS:
+            return self._settings.get(name)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SolverOptions are immutable, use replace()')
+
+    def __repr__(self):
+        return 'SolverOptions(%s)' % ', '.join('%s=%r' % (name, self._settings[name])
+                                               for name in self.FIELDS
+                                               if name in self._settings)
+
+    def __eq__(self, other):
+        return isinstance(other, SolverOptions) and self._settings == other._settings
+
+    def __hash__(self):
+        return hash(tuple(sorted(self._settings.items())))
+
+    def __getstate__(self):
+        return self._settings
+
+    def __setstate__(self, settings):
+        object.__setattr__(self, '_settings', settings)
+
+    def replace(self, **settings):
+        """
+        Returns new options with the given settings changed.
+        """
+        return SolverOptions(**dict(self._settings, **settings))
+
+    def as_dict(self):
+        """
+        Returns dictionary of the given settings.
+        """
+        return dict(self._settings)
+
+    def __enter__(self):
+        # options complete the enclosing defaults of this thread
+        _defaults.set(_defaults.get() + (get_options(self),))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _defaults.set(_defaults.get()[:-1])
+        return False
+
+
+def get_options(options=None):
+    """
+    Returns complete solver options: settings given in options, completed by
+    the default options of the current thread and the "config" module.
+
+    FUNCTION SYNTAX:
+        options = get_options(options)
+
+    INPUT:
+        options = SolverOptions, dictionary of settings or None
+
+    OUTPUT:
+        options = SolverOptions with all settings given
+    """
+    from sdtoolbox import config
+
+    if isinstance(options, dict):
+        options = SolverOptions(**options)
+    settings = dict((name, getattr(config, name)) for name in SolverOptions.FIELDS)
+    defaults = _defaults.get()
+    if defaults:
+        settings.update(defaults[-1].as_dict())
+    if options is not None:
+        settings.update(options.as_dict())
+    return SolverOptions(**settings)
@@ -9,11 +9,15 @@ This module defines the following functions:
     LSQ_CJspeed
     hug_fr
     hug_eq
+    hugoniot_curve
     FHFP
     CJ_calc
     CJspeed
+    CJ_tangency
     PostShock_fr
     PostShock_eq
+    PostShock_fr_batch
+    PostShock_eq_batch
     shock_calc
     shk_eq_calc
 
@@ -41,9 +45,19 @@ Under these operating systems:
     Windows 10, Linux (Ubuntu)
 """
 
+import time
+import warnings
+
 import cantera as ct
 import numpy as np
-from sdtoolbox.thermo import eq_state, state
+from scipy.optimize import brentq
+from sdtoolbox.convergence import (DAMPING, SolverResult, apply_fallback, bracket_root,
+                                   fold_result, rayleigh_bisection)
+from sdtoolbox.mechcache import copy_solution, get_solution, pooled_solutions
+from sdtoolbox.options import get_options
+from sdtoolbox.profiling import phase, profiled
+from sdtoolbox.resultcache import cached
+from sdtoolbox.thermo import eq_state, soundspeed_eq, state, state_derivs
 
 
 def LSQ_CJspeed(x, y):
@@ -182,6 +196,142 @@ def hug_eq(x, vb, h1, P1, v1, gas):
     return hb2-hb1
 
 
+@profiled()
+def hugoniot_curve(gas1, v_array, frozen=True, gas=None, fullOutput=False,
+                   options=None):
+    """
+    Traces the frozen or equilibrium Hugoniot through the initial state over an
+    array of specific volumes. At every volume the Hugoniot temperature is found
+    by Newton iteration on the residual of hug_fr/hug_eq (the derivative is exact
+    for the frozen curve, secant for the equilibrium one), starting from the
+    temperature extrapolated from the previous points of the curve. Volumes are
+    traced from the one closest to the initial volume outwards on both sides.
+    The temperature is a single-valued function of volume on the Hugoniot, so
+    no arclength parametrization is needed.
+
+    FUNCTION SYNTAX:
+        [P,T,w1] = hugoniot_curve(gas1,v_array)
+        [P,T,w1] = hugoniot_curve(gas1,v_array,frozen=False)
+        If iteration statistics required:
+        [P,T,w1,info] = hugoniot_curve(gas1,v_array,fullOutput=True)
+
+    INPUT:
+        gas1 = gas object at initial state (not modified)
+        v_array = array of specific volumes (m^3/kg)
+
+    OPTIONAL INPUT:
+        frozen = True for the frozen composition Hugoniot, False for the
+                 equilibrium one
+        gas = working gas object, a copy of gas1 is used by default
+        fullOutput = set True to also return iteration statistics
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
+    OUTPUT:
+        P = pressure array (Pa)
+        T = temperature array (K)
+        w1 = wave speed array (m/s) from the Rayleigh line through the initial
+             state, nan where the line has positive slope
+        info = dictionary (optional)
+               iterations = array of numbers of Newton iterations
+               state_calls = total number of state evaluations
+        Values at volumes where iteration did not converge are nan (a
+        RuntimeWarning is issued for each of them).
+    """
+    # INITIALIZE ERROR VALUES AND ITERATION CAP
+    options = get_options(options)
+    ERRFT = options.ERRFT
+    max_iter = options.maxIterations
+
+    v = np.atleast_1d(np.asarray(v_array, dtype=float))
+    if gas is None:
+        gas = copy_solution(gas1)
+    h1 = gas1.enthalpy_mass
+    P1 = gas1.P
+    T1 = gas1.T
+    v1 = 1/gas1.density
+    Y1 = gas1.Y
+    gamma = gas1.cp_mass/gas1.cv_mass
+
+    P = np.full(v.size, np.nan)
+    T = np.full(v.size, np.nan)
+    iterations = np.zeros(v.size, dtype=int)
+    calls = 0
+
+    def residual(Tb, vb, Y):
+        gas.TDY = Tb, 1/vb, Y
+        if not frozen:
+            gas.equilibrate('TV')
+        return h1 + 0.5*(gas.P - P1)*(vb + v1) - gas.enthalpy_mass
+
+    order = np.argsort(np.abs(v - v1), kind='stable')
+    for branch in (order[v[order] <= v1], order[v[order] > v1]):
+        # previous converged points of the branch, (v, T)
+        points = []
+        Y = Y1
+        for i in branch:
+            vb = v[i]
+            if len(points) >= 2:
+                (va, Ta), (vc, Tc) = points[-2:]
+                Tb = Tc + (Tc - Ta)*(vb - vc)/(vc - va)
+            elif points:
+                Tb = points[-1][1]
+            else:
+                # ideal gas frozen Hugoniot estimate
+                ratio = ((gamma + 1)*v1 - (gamma - 1)*vb)/((gamma + 1)*vb - (gamma - 1)*v1)
+                Tb = T1*ratio*vb/v1 if ratio > 0 else 10*T1
+            Tb = max(Tb, 0.5*T1)
+
+            F = residual(Tb, vb, Y)
+            calls = calls + 1
+            Tp = Fp = None
+            j = 0
+            converged = False
+            while j < max_iter:
+                j = j + 1
+                if frozen:
+                    [DPDT, DPDV, DHDT, DHDV] = state_derivs(gas)
+                    DF = 0.5*DPDT*(vb + v1) - DHDT
+                elif Tp is None:
+                    # derivative by perturbation on the first iteration, secant afterwards
+                    DT = 1e-4*Tb
+                    DF = (residual(Tb + DT, vb, gas.Y) - F)/DT
+                    calls = calls + 1
+                else:
+                    DF = (F - Fp)/(Tb - Tp)
+                if DF == 0 or not np.isfinite(DF):
+                    break
+                deltaT = -F/DF
+                # limit the step to keep the temperature positive
+                deltaT = max(deltaT, -0.5*Tb)
+                Tp, Fp = Tb, F
+                Tb = Tb + deltaT
+                if not frozen:
+                    Y = gas.Y
+                F = residual(Tb, vb, Y)
+                calls = calls + 1
+                if abs(deltaT) < ERRFT*Tb:
+                    converged = True
+                    break
+            iterations[i] = j
+            if not converged:
+                warnings.warn('Hugoniot calculation did not converge for v = %.4g' % vb,
+                              RuntimeWarning)
+                points = []
+                Y = Y1
+                continue
+            T[i] = gas.T
+            P[i] = gas.P
+            points.append((vb, Tb))
+            if not frozen:
+                Y = gas.Y
+
+    with np.errstate(invalid='ignore'):
+        w1 = v1*np.sqrt((P - P1)/(v1 - v))
+    if fullOutput:
+        return [P, T, w1, {'iterations': iterations, 'state_calls': calls}]
+    return [P, T, w1]
+
+
 def FHFP(w1, gas2, gas1):
     """
     Uses the momentum and energy conservation equations to calculate
@@ -212,12 +362,16 @@ def FHFP(w1, gas2, gas1):
     return [FH, FP]
 
 
-def CJ_calc(gas, gas1, ERRFT, ERRFV, x):
+@profiled()
+def CJ_calc(gas, gas1, ERRFT, ERRFV, x, guess=None, fullOutput=False, max_iter=None,
+            fallback=None, damping=1., options=None):
     """
     Calculates the Chapman-Jouguet wave speed using Reynolds' iterative method.
 
     FUNCTION SYNTAX:
         [gas,w1] = CJ_calc(gas,gas1,ERRFT,ERRFV,x)
+        If convergence record required:
+        [gas,w1,result] = CJ_calc(gas,gas1,ERRFT,ERRFV,x,fullOutput=True)
 
     INPUT:
         gas = working gas object
@@ -225,12 +379,33 @@ def CJ_calc(gas, gas1, ERRFT, ERRFV, x):
         ERRFT,ERRFV = error tolerances for iteration
         x = density ratio
 
+    OPTIONAL INPUT:
+        guess = [T, w1] initial guess for temperature and speed
+                (e.g. solution for a close density ratio), [2000, 2000] by default
+        fullOutput = set True to also return the convergence record
+        max_iter = iteration cap (maxIterations from the "config" module by default)
+        fallback = sequence of strategies tried if Newton iteration does not
+                   converge ('damped', 'bisection'; solverFallback from the
+                   "config" module by default), see sdtoolbox.convergence
+        damping = factor of the Newton step limit
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
     OUTPUT:
         gas = gas object at equilibrium state
         w1 = initial velocity to yield prescribed density ratio
+        result = SolverResult (optional), see sdtoolbox.convergence
 
     """
-    T = 2000
+    # ITERATION CAP AND FALLBACK STRATEGIES
+    options = get_options(options)
+    if max_iter is None:
+        max_iter = options.maxIterations
+    if fallback is None:
+        fallback = options.solverFallback
+    start = time.perf_counter()
+    if guess is None:
+        guess = [2000, 2000]
+    T = guess[0]
     r1 = gas1.density
     V1 = 1/r1
     i = 0
@@ -239,14 +414,17 @@ def CJ_calc(gas, gas1, ERRFT, ERRFV, x):
     # PRELIMINARY GUESS
     V = V1/x
     r = 1/V
-    w1 = 2000
+    w1 = guess[1]
     [P, H] = eq_state(gas, r, T)
+    calls = 1
+    converged = True
+    phase('newton')
     # START LOOP
     while (abs(DT) > ERRFT*T or abs(DW) > ERRFV*w1):
+        if i == max_iter:
+            converged = False
+            break
         i = i + 1
-        if i == 500:
-            'i = 500'
-            return
         # CALCULATE FH & FP FOR GUESS 1
         [FH, FP] = FHFP(w1, gas, gas1)
         # TEMPERATURE PERTURBATION
@@ -272,6 +450,7 @@ def CJ_calc(gas, gas1, ERRFT, ERRFV, x):
         # ELEMENTS OF JACOBIAN
         DFHDW = (FHX-FH)/DW
         DFPDW = (FPX-FP)/DW
+        calls = calls + 2
         # INVERT MATRIX
         J = DFHDT*DFPDW - DFPDT*DFHDW
         b = [DFPDW, -DFHDW, -DFPDT, DFHDT]
@@ -280,36 +459,89 @@ def CJ_calc(gas, gas1, ERRFT, ERRFV, x):
         DW = (b[2]*a[0]+b[3]*a[1])/J
         # CHECK & LIMIT CHANGE VALUES
         # VOLUME
-        DTM = 0.2*T
+        DTM = 0.2*T*damping
         if abs(DT) > DTM:
             DT = DTM*DT/abs(DT)
         # MAKE THE CHANGES
         T = T + DT
         w1 = w1 + DW
         [P, H] = eq_state(gas, r, T)
+        calls = calls + 1
+
+    result = SolverResult(converged, i, FHFP(w1, gas, gas1), calls,
+                          strategy='newton' if damping == 1 else 'damped')
+    if not converged:
+        def damped():
+            [_, w, attempt] = CJ_calc(gas, gas1, ERRFT, ERRFV, x, guess=guess, fullOutput=True,
+                                      max_iter=max_iter, fallback=(), damping=DAMPING,
+                                      options=options)
+            solution[0] = w
+            return attempt
+
+        def bisection():
+            # energy residual for the speed on the Rayleigh line through (P, V)
+            attempt = SolverResult(strategy='bisection')
+
+            def residual(T):
+                attempt.iterations = attempt.iterations + 1
+                attempt.state_calls = attempt.state_calls + 1
+                [P, H] = eq_state(gas, r, T)
+                solution[0] = np.sqrt((P - gas1.P)/(r1*(1 - r1*V)))
+                return FHFP(solution[0], gas, gas1)[0]
+
+            grid = gas1.T*np.geomspace(1.1, 40, 50)
+            T = bracket_root(residual, grid, xtol=0.1*ERRFT*gas1.T)
+            if T is None:
+                attempt.converged = False
+            else:
+                residual(T)
+                attempt.residuals = FHFP(solution[0], gas, gas1)
+            return attempt
+
+        solution = [w1]
+        phase('fallback')
+        result = apply_fallback(result, fallback, {'damped': damped, 'bisection': bisection})
+        w1 = solution[0]
+        if not result.converged:
+            result.message = 'CJ_calc did not converge for density ratio %.4f' % x
+    result.time = time.perf_counter() - start
+    if fullOutput:
+        return [gas, w1, result]
+    if not result.converged:
+        warnings.warn(result.message, RuntimeWarning)
     return [gas, w1]
 
 
-def CJspeed(P1, T1, q, mech, fullOutput=False):
+@profiled()
+@cached()
+def CJspeed(P1, T1, q, mech, fullOutput=False, method='fit', options=None):
     """
     Calculates CJ detonation velocity for a given pressure, temperature, and
-    composition.
+    composition. Results are stored in the on-disk cache when enabled (see
+    sdtoolbox.resultcache).
 
     FUNCTION SYNTAX:
         If only CJ speed required:
         cj_speed = CJspeed(P1,T1,q,mech)
         If full output required:
-        [cj_speed,R2,plot_data] = CJspeed(P1,T1,q,mech,fullOutput=True)
+        [cj_speed,R2,plot_data,result] = CJspeed(P1,T1,q,mech,fullOutput=True)
 
     INPUT:
         P1 = initial pressure (Pa)
         T1 = initial temperature (K)
         q = reactant species mole fractions in one of Cantera's recognized formats
-        mech = cti file containing mechanism data (e.g. 'gri30.cti')
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml'),
+               parsed once and cached (see sdtoolbox.mechcache)
 
     OPTIONAL INPUT:
-        fullOutput = set True for R-squared value and pre-formatted plot data
-                    (the latter for use with sdtoolbox.utilities.CJspeed_plot)
+        fullOutput = set True for R-squared value, pre-formatted plot data
+                    (for use with sdtoolbox.utilities.CJspeed_plot) and the
+                    convergence record
+        method = 'fit' to find the minimum of the wave speed over the density
+                 ratio by repeated parabolic fits (default), or 'tangency' to
+                 solve directly for the density ratio where the post-shock
+                 velocity equals the equilibrium sound speed (see CJ_tangency)
+        options = solver options (SolverOptions, see sdtoolbox.options)
 
     OUTPUT
         cj_speed = CJ detonation speed (m/s)
@@ -319,59 +551,194 @@ def CJspeed(P1, T1, q, mech, fullOutput=False):
                     w1 = speed
                     dnew = minimum density
                     a,b,c = quadratic fit coefficients
+        result = SolverResult of all CJ_calc solutions (optional), not
+                 converged if any of them did not converge, see
+                 sdtoolbox.convergence
 
     """
+    if method == 'tangency':
+        return CJ_tangency(P1, T1, q, mech, fullOutput, options=options)
     # DECLARATIONS
     numsteps = 20
     maxv = 2.0
     minv = 1.5
     w1 = np.zeros(numsteps+1, float)
     rr = np.zeros(numsteps+1, float)
-    gas1 = ct.Solution(mech)
-    gas = ct.Solution(mech)
-    # INTIAL CONDITIONS
-    gas.TPX = T1, P1, q
-    gas1.TPX = T1, P1, q
-    # INITIALIZE ERROR VALUES & CHANGE VALUES
-    ERRFT = 1.0*10**-4
-    ERRFV = 1.0*10**-4
-    i = 1
-    T1 = gas1.T
-    P1 = gas1.P
-    counter = 1
-    R2 = 0.0
-    cj_speed = 0.0
-    a = 0.0
-    b = 0.0
-    c = 0.0
-    dnew = 0.0
-    while (counter <= 4) or (R2 < 0.99999):
-        step = (maxv-minv)/float(numsteps)
-        i = 0
-        x = minv
-        while x <= maxv:
-            gas.TPX = T1, P1, q
-            [gas, temp] = CJ_calc(gas, gas1, ERRFT, ERRFV, x)
-            w1[i] = temp
-            rr[i] = gas.density/gas1.density
-            i = i + 1
-            x = x + step
-        [a, b, c, R2, SSE, SST] = LSQ_CJspeed(rr, w1)
-        dnew = -b/(2.0*a)
-        minv = dnew - dnew*0.001
-        maxv = dnew + dnew*0.001
-        counter = counter + 1
-        cj_speed = a*dnew**2 + b*dnew + c
+    with pooled_solutions(mech, 2) as [gas, gas1]:
+        # INTIAL CONDITIONS
+        gas.TPX = T1, P1, q
+        gas1.TPX = T1, P1, q
+        # INITIALIZE ERROR VALUES & CHANGE VALUES
+        options = get_options(options)
+        ERRFT = options.ERRFT
+        ERRFV = options.ERRFV
+        i = 1
+        T1 = gas1.T
+        P1 = gas1.P
+        counter = 1
+        R2 = 0.0
+        cj_speed = 0.0
+        a = 0.0
+        b = 0.0
+        c = 0.0
+        dnew = 0.0
+        record = SolverResult()
+        start = time.perf_counter()
+        while (counter <= 4) or (R2 < 0.99999):
+            step = (maxv-minv)/float(numsteps)
+            i = 0
+            x = minv
+            while x <= maxv:
+                gas.TPX = T1, P1, q
+                [gas, temp, result] = CJ_calc(gas, gas1, ERRFT, ERRFV, x, fullOutput=True,
+                                              options=options)
+                fold_result(record, result)
+                w1[i] = temp
+                rr[i] = gas.density/gas1.density
+                i = i + 1
+                x = x + step
+            [a, b, c, R2, SSE, SST] = LSQ_CJspeed(rr, w1)
+            dnew = -b/(2.0*a)
+            minv = dnew - dnew*0.001
+            maxv = dnew + dnew*0.001
+            counter = counter + 1
+            cj_speed = a*dnew**2 + b*dnew + c
+        record.time = time.perf_counter() - start
+
+        if fullOutput:
+            # Optional output data for plotting (with sdtoolbox.utilities.CJspeed_plot)
+            plot_data = (rr, w1, dnew, a, b, c)
+            return [cj_speed, R2, plot_data, record]
+        else:
+            if not record.converged:
+                warnings.warn(record.message, RuntimeWarning)
+            return cj_speed
 
-    if fullOutput:
-        # Optional output data for plotting (with sdtoolbox.utilities.CJspeed_plot)
-        plot_data = (rr, w1, dnew, a, b, c)
-        return [cj_speed, R2, plot_data]
-    else:
-        return cj_speed
 
+@profiled()
+def CJ_tangency(P1, T1, q, mech, fullOutput=False, guess=None, options=None, state=False):
+    """
+    Calculates CJ detonation velocity by solving the tangency condition: at the
+    CJ point the flow behind the wave is sonic, i.e. the post-shock velocity
+    w2 = w1/x is equal to the equilibrium sound speed. The density ratio x is
+    found with Brent's method, every CJ_calc solution starting from the
+    previous one. This needs about ten CJ_calc solutions instead of the
+    hundred required by the parabolic fit in CJspeed.
+
+    FUNCTION SYNTAX:
+        If only CJ speed required:
+        cj_speed = CJ_tangency(P1,T1,q,mech)
+        If full output required:
+        [cj_speed,R2,plot_data,result] = CJ_tangency(P1,T1,q,mech,fullOutput=True)
+        If the CJ solution is required as guess for close initial conditions:
+        [cj_speed,cj_guess] = CJ_tangency(P1,T1,q,mech,state=True)
+
+    INPUT:
+        P1 = initial pressure (Pa)
+        T1 = initial temperature (K)
+        q = reactant species mole fractions in one of Cantera's recognized formats
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml'),
+               parsed once and cached (see sdtoolbox.mechcache)
+
+    OPTIONAL INPUT:
+        fullOutput = set True for R-squared value, pre-formatted plot data
+                    (for use with sdtoolbox.utilities.CJspeed_plot) and the
+                    convergence record
+        guess = [x, w1] or [x, w1, T] estimate of CJ density ratio, speed and
+                temperature (e.g. cj_guess of a calculation for close initial
+                conditions) used to narrow the initial bracket and as initial
+                guess of the first CJ_calc solution; density ratio 1.5 to 2.0
+                and the default guess of CJ_calc are used by default
+        options = solver options (SolverOptions, see sdtoolbox.options)
+        state = set True to also return the CJ solution as guess
+
+    OUTPUT
+        cj_speed = CJ detonation speed (m/s)
+        R2 = R-squared value of LSQ curve fit through the computed points (optional)
+        plot_data = tuple (rr,w1,dnew,a,b,c)
+                    rr = density ratio
+                    w1 = speed
+                    dnew = CJ density ratio
+                    a,b,c = quadratic fit coefficients
+        result = SolverResult of all CJ_calc solutions (optional), not
+                 converged if any of them did not converge, see
+                 sdtoolbox.convergence
+        cj_guess = [x, w1, T] CJ density ratio, speed and temperature (optional)
 
-def PostShock_fr(U1, P1, T1, q, mech):
+    """
+    with pooled_solutions(mech, 2) as [gas, gas1]:
+        # INTIAL CONDITIONS
+        gas.TPX = T1, P1, q
+        gas1.TPX = T1, P1, q
+        # INITIALIZE ERROR VALUES
+        options = get_options(options)
+        ERRFT = options.ERRFT
+        ERRFV = options.ERRFV
+        rr = []
+        w1 = []
+        last = [None]
+        record = SolverResult()
+        start = time.perf_counter()
+
+        def sonic(x):
+            # difference of post-shock velocity and equilibrium sound speed
+            [_, w, result] = CJ_calc(gas, gas1, ERRFT, ERRFV, x, guess=last[0], fullOutput=True,
+                                     options=options)
+            fold_result(record, result)
+            last[0] = [gas.T, w]
+            rr.append(x)
+            w1.append(w)
+            return w/x - soundspeed_eq(gas)
+
+        # BRACKET THE CJ DENSITY RATIO
+        if guess is None:
+            minv = 1.5
+            maxv = 2.0
+        else:
+            minv = 0.99*guess[0]
+            maxv = 1.01*guess[0]
+            if len(guess) > 2:
+                # temperature and speed of the previous solution
+                last[0] = [guess[2], guess[1]]
+        fmin = sonic(minv)
+        fmax = sonic(maxv)
+        counter = 0
+        while fmin*fmax > 0 and counter < 10:
+            step = maxv - minv
+            if fmax > 0:
+                # both points on the weak (supersonic) branch
+                minv, fmin = maxv, fmax
+                maxv = maxv + step
+                fmax = sonic(maxv)
+            else:
+                # both points on the strong (subsonic) branch
+                maxv, fmax = minv, fmin
+                minv = max(minv - step/2, 1 + (minv - 1)/2)
+                fmin = sonic(minv)
+            counter = counter + 1
+        dnew = brentq(sonic, minv, maxv, xtol=1e-6)
+        [_, cj_speed, result] = CJ_calc(gas, gas1, ERRFT, ERRFV, dnew, guess=last[0],
+                                        fullOutput=True, options=options)
+        fold_result(record, result)
+        record.time = time.perf_counter() - start
+        output = [cj_speed]
+
+        if fullOutput:
+            # Optional output data for plotting (with sdtoolbox.utilities.CJspeed_plot)
+            rr = np.array(rr)
+            w1 = np.array(w1)
+            [a, b, c, R2, SSE, SST] = LSQ_CJspeed(rr, w1)
+            plot_data = (rr, w1, dnew, a, b, c)
+            output += [R2, plot_data, record]
+        elif not record.converged:
+            warnings.warn(record.message, RuntimeWarning)
+        if state:
+            output.append([dnew, cj_speed, gas.T])
+        return output if len(output) > 1 else cj_speed
+
+
+@profiled()
+def PostShock_fr(U1, P1, T1, q, mech, jacobian='fd', options=None):
     """
     Calculates frozen post-shock state for a specified shock velocity and pre-shock state.
 
@@ -383,28 +750,37 @@ def PostShock_fr(U1, P1, T1, q, mech):
         P1 = initial pressure (Pa)
         T1 = initial temperature (K)
         q = reactant species mole fractions in one of Cantera's recognized formats
-        mech = cti file containing mechanism data (e.g. 'gri30.cti')
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml'),
+               parsed once and cached (see sdtoolbox.mechcache)
+
+    OPTIONAL INPUT:
+        jacobian = 'fd' (finite differences) or 'analytic', see shk_calc
+        options = solver options (SolverOptions, see sdtoolbox.options)
 
     OUTPUT:
         gas = gas object at frozen post-shock state
 
     """
     # INITIALIZE ERROR VALUES
-    from sdtoolbox.config import ERRFT, ERRFV
-
-    gas1 = ct.Solution(mech)
-    gas = ct.Solution(mech)
-    # INTIAL CONDITIONS
-    gas.TPX = T1, P1, q
-    gas1.TPX = T1, P1, q
-    # CALCULATES POST-SHOCK STATE
-    gas = shk_calc(U1, gas, gas1, ERRFT, ERRFV)
+    options = get_options(options)
+
+    gas = get_solution(mech)
+    with pooled_solutions(mech) as [gas1]:
+        # INTIAL CONDITIONS
+        gas.TPX = T1, P1, q
+        gas1.TPX = T1, P1, q
+        # CALCULATES POST-SHOCK STATE
+        gas = shk_calc(U1, gas, gas1, options.ERRFT, options.ERRFV, jacobian=jacobian,
+                       options=options)
     return gas
 
 
-def PostShock_eq(U1, P1, T1, q, mech):
+@profiled()
+@cached(gas_output=True)
+def PostShock_eq(U1, P1, T1, q, mech, options=None):
     """
     Calculates equilibrium post-shock state for a specified shock velocity and pre-shock state.
+    Results are stored in the on-disk cache when enabled (see sdtoolbox.resultcache).
 
     FUNCTION SYNTAX:
         gas = PostShock_eq(U1,P1,T1,q,mech)
@@ -414,37 +790,181 @@ def PostShock_eq(U1, P1, T1, q, mech):
         P1 = initial pressure (Pa)
         T1 = initial temperature (K)
         q = reactant species mole fractions in one of Cantera's recognized formats
-        mech = cti file containing mechanism data (e.g. 'gri30.cti')
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml'),
+               parsed once and cached (see sdtoolbox.mechcache)
+
+    OPTIONAL INPUT:
+        options = solver options (SolverOptions, see sdtoolbox.options)
 
     OUTPUT:
         gas = gas object at equilibrium post-shock state
 
     """
     # INITIALIZE ERROR VALUES
-    from sdtoolbox.config import ERRFT, ERRFV
-
-    gas1 = ct.Solution(mech)
-    gas = ct.Solution(mech)
-    # INTIAL CONDITIONS
-    # workaround to avoid unsized object error when only one species in a .cti file
-    # (flagged to be fixed in future Cantera version)
-    if len(q) > 1:
-        gas.TPX = T1, P1, q
-        gas1.TPX = T1, P1, q
-    else:
-        gas.TP = T1, P1
-        gas1.TP = T1, P1
-    # CALCULATES POST-SHOCK STATE
-    gas = shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV)
+    options = get_options(options)
+
+    gas = get_solution(mech)
+    with pooled_solutions(mech) as [gas1]:
+        # INTIAL CONDITIONS
+        # workaround to avoid unsized object error when only one species in a .cti file
+        # (flagged to be fixed in future Cantera version)
+        if len(q) > 1:
+            gas.TPX = T1, P1, q
+            gas1.TPX = T1, P1, q
+        else:
+            gas.TP = T1, P1
+            gas1.TP = T1, P1
+        # CALCULATES POST-SHOCK STATE
+        gas = shk_eq_calc(U1, gas, gas1, options.ERRFT, options.ERRFV, options=options)
     return gas
 
 
-def shk_calc(U1, gas, gas1, ERRFT, ERRFV):
+def _PostShock_batch(U1, P1, T1, q, mech, frozen, jacobian='fd', options=None):
+    """
+    Common part of PostShock_fr_batch and PostShock_eq_batch.
+    Shock speeds are processed in ascending order, each Newton iteration starts
+    from the converged temperature and volume ratio of the previous speed.
+    """
+    # INITIALIZE ERROR VALUES
+    options = get_options(options)
+    ERRFT = options.ERRFT
+    ERRFV = options.ERRFV
+
+    U1, P1, T1 = np.broadcast_arrays(np.atleast_1d(np.asarray(U1, dtype=float)),
+                                     np.asarray(P1, dtype=float),
+                                     np.asarray(T1, dtype=float))
+    with pooled_solutions(mech, 2) as [gas, gas1]:
+        n = U1.size
+        output = np.zeros(n, dtype=[('U1', float), ('P1', float), ('T1', float),
+                                    ('T2', float), ('P2', float), ('rho2', float),
+                                    ('w2', float), ('u2', float),
+                                    ('X', float, (gas.n_species,)), ('converged', bool)])
+        output['U1'] = U1
+        output['P1'] = P1
+        output['T1'] = T1
+
+        T2 = None
+        ratio = None
+        for i in np.argsort(U1, kind='stable'):
+            # INTIAL CONDITIONS
+            # workaround to avoid unsized object error when only one species in a .cti file
+            if len(q) > 1:
+                gas1.TPX = T1[i], P1[i], q
+            else:
+                gas1.TP = T1[i], P1[i]
+            if T2 is None:
+                gas.TPX = gas1.TPX
+            else:
+                # warm start from the previous converged state
+                # (gas keeps previous equilibrium composition as a starting point)
+                gas.TD = T2, gas1.density*ratio
+            # CALCULATES POST-SHOCK STATE
+            if frozen:
+                [gas, result] = shk_calc(U1[i], gas, gas1, ERRFT, ERRFV, guess=T2 is not None,
+                                         jacobian=jacobian, fullOutput=True, options=options)
+            else:
+                [gas, result] = shk_eq_calc(U1[i], gas, gas1, ERRFT, ERRFV, guess=T2 is not None,
+                                            fullOutput=True, options=options)
+            T2 = gas.T
+            ratio = gas.density/gas1.density
+            output['converged'][i] = result.converged
+            if not result.converged:
+                warnings.warn(result.message, RuntimeWarning)
+                T2 = None
+            output['T2'][i] = gas.T
+            output['P2'][i] = gas.P
+            output['rho2'][i] = gas.density
+            output['w2'][i] = U1[i]/ratio
+            output['u2'][i] = U1[i] - U1[i]/ratio
+            output['X'][i] = gas.X
+        return output
+
+
+@profiled()
+def PostShock_fr_batch(U1, P1, T1, q, mech, jacobian='fd', options=None):
+    """
+    Calculates frozen post-shock states for an array of shock velocities.
+    The same pair of gas objects is used for all the speeds and each solution
+    starts from the converged state of the neighbouring speed, so this is much
+    faster than calling PostShock_fr for every speed.
+
+    FUNCTION SYNTAX:
+        output = PostShock_fr_batch(U1,P1,T1,q,mech)
+
+    INPUT:
+        U1 = array of shock speeds (m/s)
+        P1 = initial pressure (Pa), scalar or array of the same shape as U1
+        T1 = initial temperature (K), scalar or array of the same shape as U1
+        q = reactant species mole fractions in one of Cantera's recognized formats
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml'),
+               parsed once and cached (see sdtoolbox.mechcache)
+
+    OPTIONAL INPUT:
+        jacobian = 'fd' (finite differences) or 'analytic', see shk_calc
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
+    OUTPUT:
+        output = structured array in the order of U1 with fields
+            U1, P1, T1 = shock speed and initial state
+            T2, P2, rho2 = frozen post-shock temperature, pressure and density
+            w2 = post-shock velocity in shock-fixed frame (m/s)
+            u2 = post-shock particle velocity in laboratory frame (m/s)
+            X = post-shock species mole fractions
+            converged = False where iteration did not converge (the next speed
+                        then starts from the basic preliminary guess)
+
+    """
+    return _PostShock_batch(U1, P1, T1, q, mech, frozen=True, jacobian=jacobian,
+                            options=options)
+
+
+@profiled()
+def PostShock_eq_batch(U1, P1, T1, q, mech, options=None):
+    """
+    Calculates equilibrium post-shock states for an array of shock velocities.
+    The same pair of gas objects is used for all the speeds and each solution
+    starts from the converged state (including composition) of the
+    neighbouring speed, so this is much faster than calling PostShock_eq for
+    every speed.
+
+    FUNCTION SYNTAX:
+        output = PostShock_eq_batch(U1,P1,T1,q,mech)
+
+    INPUT:
+        U1 = array of shock speeds (m/s)
+        P1 = initial pressure (Pa), scalar or array of the same shape as U1
+        T1 = initial temperature (K), scalar or array of the same shape as U1
+        q = reactant species mole fractions in one of Cantera's recognized formats
+        mech = yaml file containing mechanism data (e.g. 'gri30.yaml'),
+               parsed once and cached (see sdtoolbox.mechcache)
+
+    OPTIONAL INPUT:
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
+    OUTPUT:
+        output = structured array in the order of U1 with fields
+            U1, P1, T1 = shock speed and initial state
+            T2, P2, rho2 = equilibrium post-shock temperature, pressure and density
+            w2 = post-shock velocity in shock-fixed frame (m/s)
+            u2 = post-shock particle velocity in laboratory frame (m/s)
+            X = post-shock species mole fractions
+            converged = False where iteration did not converge (the next speed
+                        then starts from the basic preliminary guess)
+
+    """
+    return _PostShock_batch(U1, P1, T1, q, mech, frozen=False, options=options)
+
+
+@profiled()
+def shk_calc(U1, gas, gas1, ERRFT, ERRFV, guess=False, jacobian='fd', fullOutput=False,
+             max_iter=None, fallback=None, damping=1., options=None):
     """
     Calculates frozen post-shock state using Reynolds' iterative method.
 
     FUNCTION SYNTAX:
-        gas = shk_calc(U1,gas,gas1,ERRFT,ERRFV)
+        gas = shk_calc(U1,gas,gas1,ERRFT,ERRFV,guess=False,jacobian='fd')
+        If convergence record required:
+        [gas,result] = shk_calc(U1,gas,gas1,ERRFT,ERRFV,fullOutput=True)
 
     INPUT:
         U1 = shock speed (m/s)
@@ -452,12 +972,36 @@ def shk_calc(U1, gas, gas1, ERRFT, ERRFV):
         gas1 = gas object at initial state
         ERRFT,ERRFV = error tolerances for iteration
 
+    OPTIONAL INPUT:
+        guess = set True to start iteration from the current (T, V) state of gas
+                (e.g. converged state for a close shock speed) instead of the
+                estimate based on volumeBoundRatio
+        jacobian = 'fd' to build the Jacobian of the jump conditions by finite
+                   differences (two extra state evaluations per iteration), or
+                   'analytic' to use exact derivatives from sdtoolbox.thermo.state_derivs
+        fullOutput = set True to also return the convergence record
+        max_iter = iteration cap (maxIterations from the "config" module by default)
+        fallback = sequence of strategies tried if Newton iteration does not
+                   converge ('damped', 'bisection'; solverFallback from the
+                   "config" module by default), see sdtoolbox.convergence
+        damping = factor of the Newton step limits
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
     OUTPUT:
-        gas = gas object at frozen post-shock state
+        gas = gas object at frozen post-shock state (restored to its state on
+              entry if the calculation did not converge)
+        result = SolverResult (optional), see sdtoolbox.convergence
 
     """
-    # Lower bound on volume/density ratio (globally defined)
-    from sdtoolbox.config import volumeBoundRatio
+    # Lower bound on volume/density ratio, iteration cap and fallback strategies
+    options = get_options(options)
+    volumeBoundRatio = options.volumeBoundRatio
+    if max_iter is None:
+        max_iter = options.maxIterations
+    if fallback is None:
+        fallback = options.solverFallback
+    start = time.perf_counter()
+    initial = gas.TDY
 
     r1 = gas1.density
     V1 = 1/r1
@@ -467,10 +1011,15 @@ def shk_calc(U1, gas, gas1, ERRFT, ERRFV):
     deltaT = 1000
     deltaV = 1000
     # PRELIMINARY GUESS
-    Vg = V1/volumeBoundRatio
-    rg = 1/Vg
-    Pg = P1 + r1*(U1**2)*(1-Vg/V1)
-    Tg = T1*Pg*Vg/(P1*V1)
+    if guess:
+        Tg = gas.T
+        rg = gas.density
+        Vg = 1/rg
+    else:
+        Vg = V1/volumeBoundRatio
+        rg = 1/Vg
+        Pg = P1 + r1*(U1**2)*(1-Vg/V1)
+        Tg = T1*Pg*Vg/(P1*V1)
     [Pg, Hg] = state(gas, rg, Tg)
     # SAVE STATE
     V = Vg
@@ -478,38 +1027,51 @@ def shk_calc(U1, gas, gas1, ERRFT, ERRFV):
     P = Pg
     T = Tg
     H = Hg
+    calls = 1
+    converged = True
+    phase('newton')
     # START LOOP
     while (abs(deltaT) > ERRFT*T or abs(deltaV) > ERRFV*V):
+        if i == max_iter:
+            converged = False
+            break
         i = i + 1
-        if i == 500:
-            print('shk_calc did not converge for U = ', U1)
-            return gas
         # CALCULATE FH & FP FOR GUESS 1
         [FH, FP] = FHFP(U1, gas, gas1)
 
-        # TEMPERATURE PERTURBATION
-        DT = T*0.02
-        Tper = T + DT
-        Vper = V
-        Rper = 1/Vper
-        [Pper, Hper] = state(gas, Rper, Tper)
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP(U1, gas, gas1)
-        # ELEMENTS OF JACOBIAN
-        DFHDT = (FHX-FH)/DT
-        DFPDT = (FPX-FP)/DT
-
-        # VOLUME PERTURBATION
-        DV = 0.02*V
-        Vper = V + DV
-        Tper = T
-        Rper = 1/Vper
-        [Pper, Hper] = state(gas, Rper, Tper)
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP(U1, gas, gas1)
-        # ELEMENTS OF JACOBIAN
-        DFHDV = (FHX-FH)/DV
-        DFPDV = (FPX-FP)/DV
+        if jacobian == 'analytic':
+            # ELEMENTS OF JACOBIAN
+            # FH = H + w^2/2, FP = P + r*w^2 with w = U1*r1*V
+            [DPDT, DPDV, DHDT, DHDV] = state_derivs(gas)
+            DFHDT = DHDT
+            DFHDV = DHDV + (U1*r1)**2*V
+            DFPDT = DPDT
+            DFPDV = DPDV + (U1*r1)**2
+        else:
+            # TEMPERATURE PERTURBATION
+            DT = T*0.02
+            Tper = T + DT
+            Vper = V
+            Rper = 1/Vper
+            [Pper, Hper] = state(gas, Rper, Tper)
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP(U1, gas, gas1)
+            # ELEMENTS OF JACOBIAN
+            DFHDT = (FHX-FH)/DT
+            DFPDT = (FPX-FP)/DT
+
+            # VOLUME PERTURBATION
+            DV = 0.02*V
+            Vper = V + DV
+            Tper = T
+            Rper = 1/Vper
+            [Pper, Hper] = state(gas, Rper, Tper)
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP(U1, gas, gas1)
+            # ELEMENTS OF JACOBIAN
+            DFHDV = (FHX-FH)/DV
+            DFPDV = (FPX-FP)/DV
+            calls = calls + 2
 
         # INVERT MATRIX
         J = DFHDT*DFPDV - DFPDT*DFHDV
@@ -520,7 +1082,7 @@ def shk_calc(U1, gas, gas1, ERRFT, ERRFV):
 
         # CHECK & LIMIT CHANGE VALUES
         # TEMPERATURE
-        DTM = 0.2*T
+        DTM = 0.2*T*damping
         if abs(deltaT) > DTM:
             deltaT = DTM*deltaT/abs(deltaT)
         # VOLUME
@@ -528,7 +1090,7 @@ def shk_calc(U1, gas, gas1, ERRFT, ERRFV):
         if V2X > V1:
             DVM = 0.5*(V1 - V)
         else:
-            DVM = 0.2*V
+            DVM = 0.2*V*damping
         if abs(deltaV) > DVM:
             deltaV = DVM*deltaV/abs(deltaV)
         # MAKE THE CHANGES
@@ -536,16 +1098,46 @@ def shk_calc(U1, gas, gas1, ERRFT, ERRFV):
         V = V + deltaV
         r = 1/V
         [P, H] = state(gas, r, T)
-
+        calls = calls + 1
+
+    result = SolverResult(converged, i, FHFP(U1, gas, gas1), calls,
+                          strategy='newton' if damping == 1 else 'damped')
+    if not converged:
+        def damped():
+            gas.TD = Tg, 1/Vg
+            return shk_calc(U1, gas, gas1, ERRFT, ERRFV, guess=True, jacobian=jacobian,
+                            fullOutput=True, max_iter=max_iter, fallback=(),
+                            damping=DAMPING, options=options)[1]
+
+        def bisection():
+            return rayleigh_bisection(gas, state, lambda V: P1 + r1*U1**2*(1 - V/V1),
+                                      lambda: FHFP(U1, gas, gas1), V1, ERRFT, ERRFV)
+
+        phase('fallback')
+        result = apply_fallback(result, fallback, {'damped': damped, 'bisection': bisection})
+        if not result.converged:
+            result.message = 'shk_calc did not converge for U = %.2f' % U1
+    if not result.converged:
+        # do not leave a half-converged state
+        gas.TDY = initial
+    result.time = time.perf_counter() - start
+    if fullOutput:
+        return [gas, result]
+    if not result.converged:
+        warnings.warn(result.message, RuntimeWarning)
     return gas
 
 
-def shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV):
+@profiled()
+def shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV, guess=False, jacobian='fd', fullOutput=False,
+                max_iter=None, fallback=None, damping=1., options=None):
     """
     Calculates equilibrium post-shock state using Reynolds' iterative method.
 
     FUNCTION SYNTAX:
-        gas = shk_calc(U1,gas,gas1,ERRFT,ERRFV)
+        gas = shk_eq_calc(U1,gas,gas1,ERRFT,ERRFV,guess=False,jacobian='fd')
+        If convergence record required:
+        [gas,result] = shk_eq_calc(U1,gas,gas1,ERRFT,ERRFV,fullOutput=True)
 
     INPUT:
         U1 = shock speed (m/s)
@@ -553,12 +1145,37 @@ def shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV):
         gas1 = gas object at initial state
         ERRFT,ERRFV = error tolerances for iteration
 
+    OPTIONAL INPUT:
+        guess = set True to start iteration from the current (T, V) state of gas
+                (e.g. converged state for a close shock speed) instead of the
+                estimate based on volumeBoundRatio
+        jacobian = 'fd' to build the Jacobian of the jump conditions by finite
+                   differences (two extra equilibrium evaluations per iteration),
+                   or 'broyden' to build it by finite differences on the first
+                   iteration only and update it from the steps afterwards
+        fullOutput = set True to also return the convergence record
+        max_iter = iteration cap (maxIterations from the "config" module by default)
+        fallback = sequence of strategies tried if Newton iteration does not
+                   converge ('damped', 'bisection'; solverFallback from the
+                   "config" module by default), see sdtoolbox.convergence
+        damping = factor of the Newton step limits
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
     OUTPUT:
-        gas = gas object at equilibrium post-shock state
+        gas = gas object at equilibrium post-shock state (restored to its state on
+              entry if the calculation did not converge)
+        result = SolverResult (optional), see sdtoolbox.convergence
 
     """
-    # Lower bound on volume/density ratio (globally defined)
-    from sdtoolbox.config import volumeBoundRatio
+    # Lower bound on volume/density ratio, iteration cap and fallback strategies
+    options = get_options(options)
+    volumeBoundRatio = options.volumeBoundRatio
+    if max_iter is None:
+        max_iter = options.maxIterations
+    if fallback is None:
+        fallback = options.solverFallback
+    start = time.perf_counter()
+    initial = gas.TDY
 
     r1 = gas1.density
     V1 = 1/r1
@@ -568,43 +1185,71 @@ def shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV):
     deltaT = 1000
     deltaV = 1000
     # PRELIMINARY GUESS
-    V = V1/volumeBoundRatio
-    r = 1/V
-    P = P1 + r1*(U1**2)*(1-V/V1)
-    T = T1*P*V/(P1*V1)
+    if guess:
+        T = gas.T
+        r = gas.density
+        V = 1/r
+    else:
+        V = V1/volumeBoundRatio
+        r = 1/V
+        P = P1 + r1*(U1**2)*(1-V/V1)
+        T = T1*P*V/(P1*V1)
+    Tg = T
+    Vg = V
     [P, H] = eq_state(gas, r, T)
+    calls = 1
+    jac = None
+    FH0 = None
+    FP0 = None
+    converged = True
+    phase('newton')
     # START LOOP
     while (abs(deltaT) > ERRFT*T or abs(deltaV) > ERRFV*V):
+        if i == max_iter:
+            converged = False
+            break
         i = i + 1
-        if i == 500:
-            print('shk_calc did not converge for U = ', U1)
-            return gas
         # CALCULATE FH & FP FOR GUESS 1
         [FH, FP] = FHFP(U1, gas, gas1)
 
-        # TEMPERATURE PERTURBATION
-        DT = T*0.02
-        Tper = T + DT
-        Vper = V
-        Rper = 1/Vper
-        [Pper, Hper] = eq_state(gas, Rper, Tper)
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP(U1, gas, gas1)
-        # ELEMENTS OF JACOBIAN
-        DFHDT = (FHX-FH)/DT
-        DFPDT = (FPX-FP)/DT
-
-        # VOLUME PERTURBATION
-        DV = 0.02*V
-        Vper = V + DV
-        Tper = T
-        Rper = 1/Vper
-        [Pper, Hper] = eq_state(gas, Rper, Tper)
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP(U1, gas, gas1)
-        # ELEMENTS OF JACOBIAN
-        DFHDV = (FHX-FH)/DV
-        DFPDV = (FPX-FP)/DV
+        if jacobian == 'broyden' and jac is not None:
+            # BROYDEN UPDATE OF THE JACOBIAN with the last step, T and V scaled
+            s = np.array([deltaT/T, deltaV/V])
+            dF = np.array([FH - FH0, FP - FP0])
+            jac = jac + np.outer(dF - np.dot(jac, s*[T, V]), s/[T, V])/np.dot(s, s)
+            if not abs(np.linalg.det(jac)) > 0:
+                # singular update, rebuild by finite differences
+                jac = None
+        if jacobian == 'broyden' and jac is not None:
+            [[DFHDT, DFHDV], [DFPDT, DFPDV]] = jac
+        else:
+            # TEMPERATURE PERTURBATION
+            DT = T*0.02
+            Tper = T + DT
+            Vper = V
+            Rper = 1/Vper
+            [Pper, Hper] = eq_state(gas, Rper, Tper)
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP(U1, gas, gas1)
+            # ELEMENTS OF JACOBIAN
+            DFHDT = (FHX-FH)/DT
+            DFPDT = (FPX-FP)/DT
+
+            # VOLUME PERTURBATION
+            DV = 0.02*V
+            Vper = V + DV
+            Tper = T
+            Rper = 1/Vper
+            [Pper, Hper] = eq_state(gas, Rper, Tper)
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP(U1, gas, gas1)
+            # ELEMENTS OF JACOBIAN
+            DFHDV = (FHX-FH)/DV
+            DFPDV = (FPX-FP)/DV
+            calls = calls + 2
+            jac = np.array([[DFHDT, DFHDV], [DFPDT, DFPDV]])
+        FH0 = FH
+        FP0 = FP
 
         # INVERT MATRIX
         J = DFHDT*DFPDV - DFPDT*DFHDV
@@ -615,7 +1260,7 @@ def shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV):
 
         # CHECK & LIMIT CHANGE VALUES
         # TEMPERATURE
-        DTM = 0.2*T
+        DTM = 0.2*T*damping
         if abs(deltaT) > DTM:
             deltaT = DTM*deltaT/abs(deltaT)
         # VOLUME
@@ -623,7 +1268,7 @@ def shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV):
         if V2X > V1:
             DVM = 0.5*(V1 - V)
         else:
-            DVM = 0.2*V
+            DVM = 0.2*V*damping
         if abs(deltaV) > DVM:
             deltaV = DVM*deltaV/abs(deltaV)
         # MAKE THE CHANGES
@@ -631,5 +1276,31 @@ def shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV):
         V = V + deltaV
         r = 1/V
         [P, H] = eq_state(gas, r, T)
-
+        calls = calls + 1
+
+    result = SolverResult(converged, i, FHFP(U1, gas, gas1), calls,
+                          strategy='newton' if damping == 1 else 'damped')
+    if not converged:
+        def damped():
+            gas.TD = Tg, 1/Vg
+            return shk_eq_calc(U1, gas, gas1, ERRFT, ERRFV, guess=True, jacobian=jacobian,
+                               fullOutput=True, max_iter=max_iter, fallback=(),
+                               damping=DAMPING, options=options)[1]
+
+        def bisection():
+            return rayleigh_bisection(gas, eq_state, lambda V: P1 + r1*U1**2*(1 - V/V1),
+                                      lambda: FHFP(U1, gas, gas1), V1, ERRFT, ERRFV)
+
+        phase('fallback')
+        result = apply_fallback(result, fallback, {'damped': damped, 'bisection': bisection})
+        if not result.converged:
+            result.message = 'shk_eq_calc did not converge for U = %.2f' % U1
+    if not result.converged:
+        # do not leave a half-converged state
+        gas.TDY = initial
+    result.time = time.perf_counter() - start
+    if fullOutput:
+        return [gas, result]
+    if not result.converged:
+        warnings.warn(result.message, RuntimeWarning)
     return gas
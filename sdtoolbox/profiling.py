@@ -0,0 +1,303 @@
+"""
+Shock and Detonation Toolbox
+"profiling" module
+
+Opt-in instrumentation of the toolbox: counts and times Cantera calls made on
+gas objects (equilibrate, state setters such as TD, TP, SVX or DPY,
+thermodynamic property reads and kinetics property reads) and the phases of
+the solvers (e.g. integration and post-processing of cvsolve, Newton
+iteration and fallback of shk_eq_calc):
+
+    with Profile() as profile:
+        cj_speed = CJspeed(P1, T1, q, mech)
+    print(profile.summary())
+    profile.save('cjspeed.json')
+
+Profile may also decorate a function (@Profile('report.json') saves the
+report on every return). A profile records the calls made by the thread (or
+asyncio task) which entered it.
+
+Solver phases are nested: a function decorated with profiled opens a frame
+named after the function inside the frame of its caller ('CJspeed/CJ_calc'),
+and phase switches the current phase of the innermost frame, which lasts
+until the next switch or the return from the function
+('cvsolve/integration', 'cvsolve/post-processing'). Times of frames and
+phases include the time of nested frames.
+
+While no profile is active, Cantera classes are not modified and profiled
+functions only check for an active profile, so the instrumentation costs
+practically nothing.
+
+This module defines the following functions:
+
+    profiled
+    phase
+
+and the following classes:
+
+    Profile
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+
+import cantera as ct
+
+# profile of the current thread (or task)
+_current = contextvars.ContextVar('sdtoolbox_profile', default=None)
+# number of active profiles and the original attributes of cantera.Solution
+_active = [0]
+_saved = {}
+_lock = threading.Lock()
+
+
+def _counted_method(name, original):
+    def method(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return original(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            profile._record(name, name, time.perf_counter() - start)
+    return method
+
+
+def _counted_property(name, descriptor, group):
+    get_name = 'get ' + name
+    set_name = 'set ' + name
+    set_group = 'state_set' if group == 'thermo_get' else 'kinetics_set'
+
+    def get(self):
+        profile = _current.get()
+        if profile is None:
+            return descriptor.__get__(self)
+        start = time.perf_counter()
+        try:
+            return descriptor.__get__(self)
+        finally:
+            profile._record(group, get_name, time.perf_counter() - start)
+
+    def set(self, value):
+        profile = _current.get()
+        if profile is None:
+            return descriptor.__set__(self, value)
+        start = time.perf_counter()
+        try:
+            descriptor.__set__(self, value)
+        finally:
+            profile._record(set_group, set_name, time.perf_counter() - start)
+    return property(get, set)
+
+
+def _install():
+    """
+    Replaces methods and properties of cantera.Solution by counting wrappers
+    when the first profile becomes active.
+    """
+    with _lock:
+        _active[0] += 1
+        if _active[0] > 1:
+            return
+        wrappers = {'equilibrate': _counted_method('equilibrate', ct.Solution.equilibrate)}
+        for base, group in [(ct.ThermoPhase, 'thermo_get'), (ct.Kinetics, 'kinetics_get')]:
+            for name, descriptor in vars(base).items():
+                if (type(descriptor).__name__ == 'getset_descriptor'
+                        and not name.startswith('_')):
+                    wrappers[name] = _counted_property(name, descriptor, group)
+        for name, wrapper in wrappers.items():
+            _saved[name] = ct.Solution.__dict__.get(name)
+            setattr(ct.Solution, name, wrapper)
+
+
+def _uninstall():
+    """
+    Restores cantera.Solution when the last profile becomes inactive.
+    """
+    with _lock:
+        _active[0] -= 1
+        if _active[0] > 0:
+            return
+        for name, value in _saved.items():
+            if value is None:
+                delattr(ct.Solution, name)
+            else:
+                setattr(ct.Solution, name, value)
+        _saved.clear()
+
+
+class Profile(contextlib.ContextDecorator):
+    """
+    Context manager (or function decorator) recording Cantera calls and
+    solver phases.
+
+    SYNTAX:
+        with Profile() as profile:
+            ...
+        report = profile.report()
+
+    OPTIONAL INPUT:
+        path = JSON file the report is saved to on exit
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.time = 0.
+        self.calls = {}
+        self.groups = {}
+        self.phases = {}
+        # stack of frames [path, phase, phase start time]
+        self._frames = []
+        self._entered = []
+
+    def __enter__(self):
+        self._entered.append((_current.set(self), time.perf_counter()))
+        _install()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        token, start = self._entered.pop()
+        self.time += time.perf_counter() - start
+        _current.reset(token)
+        _uninstall()
+        if self.path is not None and not self._entered:
+            self.save(self.path)
+        return False
+
+    def _record(self, group, name, elapsed):
+        for table, key in [(self.calls, name), (self.groups, group)]:
+            entry = table.get(key)
+            if entry is None:
+                table[key] = [1, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def _push(self, name):
+        path = self._frames[-1][0] + '/' + name if self._frames else name
+        self._frames.append([path, None, 0.])
+        return time.perf_counter()
+
+    def _pop(self, start):
+        now = time.perf_counter()
+        frame = self._frames.pop()
+        if frame[1] is not None:
+            self._record_phase(frame[0] + '/' + frame[1], now - frame[2])
+        self._record_phase(frame[0], now - start)
+
+    def _switch(self, name):
+        now = time.perf_counter()
+        frame = self._frames[-1]
+        if frame[1] is not None:
+            self._record_phase(frame[0] + '/' + frame[1], now - frame[2])
+        frame[1] = name
+        frame[2] = now
+
+    def _record_phase(self, path, elapsed):
+        entry = self.phases.get(path)
+        if entry is None:
+            self.phases[path] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def report(self):
+        """
+        Returns the report as a dictionary:
+
+            time = total time inside the profile (s)
+            cantera_time = time spent in the recorded Cantera calls (s)
+            python_time = remaining time (s), including the profiling overhead
+            groups = calls and time of equilibrate, state_set, thermo_get,
+                     kinetics_get and kinetics_set calls
+            calls = calls and time of every method or property ('equilibrate',
+                    'set TD', 'get net_production_rates', ...)
+            phases = calls and time of every frame and phase ('CJspeed',
+                     'CJspeed/CJ_calc', 'cvsolve/integration', ...)
+        """
+        def table(entries):
+            return dict((key, {'calls': value[0], 'time': value[1]})
+                        for key, value in sorted(entries.items()))
+
+        cantera_time = sum(entry[1] for entry in self.groups.values())
+        return {'time': self.time, 'cantera_time': cantera_time,
+                'python_time': self.time - cantera_time,
+                'groups': table(self.groups), 'calls': table(self.calls),
+                'phases': table(self.phases)}
+
+    def save(self, path):
+        """
+        Saves the report to a JSON file.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=1)
+
+    def summary(self, calls=10):
+        """
+        Returns the report as text: totals, groups, phases and the most
+        expensive Cantera calls (the given number of them).
+        """
+        report = self.report()
+        lines = ['total %.4f s, Cantera %.4f s, Python %.4f s'
+                 % (report['time'], report['cantera_time'], report['python_time']),
+                 '', '%-40s %10s %10s' % ('group', 'calls', 'time, s')]
+        for title, entries, limit in [('group', report['groups'], None),
+                                      ('phase', report['phases'], None),
+                                      ('call', report['calls'], calls)]:
+            if title != 'group':
+                lines += ['', '%-40s %10s %10s' % (title, 'calls', 'time, s')]
+            items = list(entries.items())
+            if title != 'phase':
+                items.sort(key=lambda item: -item[1]['time'])
+            for key, entry in items[:limit]:
+                lines.append('%-40s %10d %10.4f' % (key, entry['calls'], entry['time']))
+        return '\n'.join(lines)
+
+
+def profiled(name=None):
+    """
+    Decorator recording the calls of a function as a frame of the active
+    profile (does nothing while no profile is active).
+
+    FUNCTION SYNTAX:
+        @profiled()
+        def cvsolve(gas, ...):
+
+    OPTIONAL INPUT:
+        name = frame name, the function name by default
+    """
+    def decorator(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            start = profile._push(label)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile._pop(start)
+        return wrapper
+    return decorator
+
+
+def phase(name):
+    """
+    Starts a new phase of the innermost profiled function (ending the previous
+    one). Does nothing while no profile is active.
+
+    FUNCTION SYNTAX:
+        phase('integration')
+
+    INPUT:
+        name = phase name
+    """
+    profile = _current.get()
+    if profile is not None and profile._frames:
+        profile._switch(name)
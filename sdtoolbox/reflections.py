@@ -10,6 +10,7 @@ This module defines the following functions:
     reflected_eq
     PostReflectedShock_fr
     PostReflectedShock_eq
+    reflected_sweep
     FHFP_reflected_fr
 
 ###############################################################################
@@ -38,11 +39,20 @@ Under these operating systems:
     Windows 10, Linux (Ubuntu)
 """
 
+import time
+import warnings
+
 import numpy as np
-from sdtoolbox.thermo import eq_state, state
+from sdtoolbox.convergence import DAMPING, SolverResult, apply_fallback, rayleigh_bisection
+from sdtoolbox.mechcache import copy_solution
+from sdtoolbox.options import get_options
+from sdtoolbox.postshock import shk_calc, shk_eq_calc
+from sdtoolbox.profiling import phase, profiled
+from sdtoolbox.thermo import eq_state, state, state_derivs
 
 
-def reflected_fr(gas1, gas2, gas3, UI):
+@profiled()
+def reflected_fr(gas1, gas2, gas3, UI, jacobian='fd', options=None):
     """
     Calculates frozen post-reflected-shock state assumming u1 = 0.
 
@@ -55,14 +65,18 @@ def reflected_fr(gas1, gas2, gas3, UI):
         gas3 = working gas object
         UI = incident shock speed (m/s)
 
+    OPTIONAL INPUT:
+        jacobian = 'fd' (finite differences) or 'analytic', see PostReflectedShock_fr
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
     OUTPUT:
         p3 = post-reflected-shock pressure (Pa)
         UR = reflected shock speed (m/s)
         gas3 = gas object at frozen post-reflected-shock state
 
     """
-    # Lower bound on volume/density ratio (globally defined)
-    from sdtoolbox.config import volumeBoundRatio
+    # Lower bound on volume/density ratio
+    volumeBoundRatio = get_options(options).volumeBoundRatio
 
     p2 = gas2.P
     p1 = gas1.P
@@ -80,14 +94,15 @@ def reflected_fr(gas1, gas2, gas3, UI):
     T3 = T2*p3*v3/(p2*v2)
 
     gas3.TPX = T3, p3, gas2.X
-    gas3 = PostReflectedShock_fr(u2, gas2, gas3)
+    gas3 = PostReflectedShock_fr(u2, gas2, gas3, jacobian=jacobian, options=options)
     p3 = gas3.P
     UR = (p3-p2)/u2/rho2-u2
 
     return [p3, UR, gas3]
 
 
-def reflected_eq(gas1, gas2, gas3, UI):
+@profiled()
+def reflected_eq(gas1, gas2, gas3, UI, options=None):
     """
     Calculates equilibrium post-reflected-shock state assumming u1 = 0.
 
@@ -100,14 +115,17 @@ def reflected_eq(gas1, gas2, gas3, UI):
         gas3 = working gas object
         UI = incident shock speed (m/s)
 
+    OPTIONAL INPUT:
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
     OUTPUT:
         p3 = post-reflected-shock pressure (Pa)
         UR = reflected shock speed (m/s)
         gas3 = gas object at equilibrium post-reflected-shock state
 
     """
-    # Lower bound on volume/density ratio (globally defined)
-    from sdtoolbox.config import volumeBoundRatio
+    # Lower bound on volume/density ratio
+    volumeBoundRatio = get_options(options).volumeBoundRatio
 
     p2 = gas2.P
     p1 = gas1.P
@@ -125,31 +143,58 @@ def reflected_eq(gas1, gas2, gas3, UI):
     T3 = T2*p3*v3/(p2*v2)
 
     gas3.TPX = T3, p3, gas2.X
-    gas3 = PostReflectedShock_eq(u2, gas2, gas3)
+    gas3 = PostReflectedShock_eq(u2, gas2, gas3, options=options)
     p3 = gas3.P
     UR = (p3-p2)/u2/rho2-u2
 
     return [p3, UR, gas3]
 
 
-def PostReflectedShock_fr(u2, gas2, gas3):
+@profiled()
+def PostReflectedShock_fr(u2, gas2, gas3, jacobian='fd', fullOutput=False,
+                          max_iter=None, fallback=None, damping=1.,
+                          options=None):
     """
     Calculates frozen post-reflected-shock state for a specified shock velocity.
 
     FUNCTION SYNTAX:
-        gas3 = PostReflectedShock_fr(u2,gas2,gas3)
+        gas3 = PostReflectedShock_fr(u2,gas2,gas3,jacobian='fd')
+        If convergence record required:
+        [gas3,result] = PostReflectedShock_fr(u2,gas2,gas3,fullOutput=True)
 
     INPUT:
         u2 = current post-incident-shock lab frame particle speed
         gas2 = gas object at post-incident-shock state (already computed)
         gas3 = working gas object
 
+    OPTIONAL INPUT:
+        jacobian = 'fd' to build the Jacobian of the jump conditions by finite
+                   differences (two extra state evaluations per iteration), or
+                   'analytic' to use exact derivatives from sdtoolbox.thermo.state_derivs
+        fullOutput = set True to also return the convergence record
+        max_iter = iteration cap (maxIterations from the "config" module by default)
+        fallback = sequence of strategies tried if Newton iteration does not
+                   converge ('damped', 'bisection'; solverFallback from the
+                   "config" module by default), see sdtoolbox.convergence
+        damping = factor of the Newton step limits
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
     OUTPUT:
-        gas3 = gas object at frozen post-reflected-shock state
+        gas3 = gas object at frozen post-reflected-shock state (restored to
+               its state on entry if the calculation did not converge)
+        result = SolverResult (optional), see sdtoolbox.convergence
 
     """
-    # INITIALIZE ERROR VALUES (globally defined)
-    from sdtoolbox.config import ERRFT, ERRFV
+    # INITIALIZE ERROR VALUES, ITERATION CAP AND FALLBACK STRATEGIES
+    options = get_options(options)
+    ERRFT = options.ERRFT
+    ERRFV = options.ERRFV
+    if max_iter is None:
+        max_iter = options.maxIterations
+    if fallback is None:
+        fallback = options.solverFallback
+    start = time.perf_counter()
+    initial = gas3.TDY
 
     # CALCULATE POST-REFLECTED SHOCK STATE
     r2 = gas2.density
@@ -166,48 +211,62 @@ def PostReflectedShock_fr(u2, gas2, gas3):
     T = gas3.T
     r = gas3.density
     V = 1/r
+    Tg = T
+    Vg = V
+    calls = 0
     ###########################################################################
 
+    converged = True
+    phase('newton')
     # START LOOP
     while ((abs(deltaT) > ERRFT*T) or (abs(deltaV) > ERRFV*V)):
+        if j == max_iter:
+            converged = False
+            break
         j = j + 1
 
-        if j == 500:
-            print('Calculation did not converge for U = %.2f' % (u2))
-            return
-
         #######################################################################
         # CALCULATE FH & FP FOR GUESS 1
         [FH, FP] = FHFP_reflected_fr(u2, gas3, gas2)
         #######################################################################
-        # TEMPERATURE PERTURBATION
-        DT = T*0.02
-        Tper = T + DT
-        Vper = V
-        Rper = 1/Vper
-        [Pper, Hper] = state(gas3, Rper, Tper)
-
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
-
-        # ELEMENTS OF JACOBIAN
-        DFHDT = (FHX-FH)/DT
-        DFPDT = (FPX-FP)/DT
-        #######################################################################
-        # VOLUME PERTURBATION
-        DV = 0.02*V
-        Vper = V + DV
-        Tper = T
-        Rper = 1/Vper
-
-        [Pper, Hper] = state(gas3, Rper, Tper)
-
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
-
-        # ELEMENTS OF JACOBIAN
-        DFHDV = (FHX-FH)/DV
-        DFPDV = (FPX-FP)/DV
+        if jacobian == 'analytic':
+            # ELEMENTS OF JACOBIAN
+            # FH = H3 - H2 - u2^2/2*(V2+V)/(V2-V), FP = P3 - P2 - u2^2/(V2-V)
+            [DPDT, DPDV, DHDT, DHDV] = state_derivs(gas3)
+            DFHDT = DHDT
+            DFHDV = DHDV - (u2**2)*V2/(V2-V)**2
+            DFPDT = DPDT
+            DFPDV = DPDV - (u2**2)/(V2-V)**2
+        else:
+            # TEMPERATURE PERTURBATION
+            DT = T*0.02
+            Tper = T + DT
+            Vper = V
+            Rper = 1/Vper
+            [Pper, Hper] = state(gas3, Rper, Tper)
+
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
+
+            # ELEMENTS OF JACOBIAN
+            DFHDT = (FHX-FH)/DT
+            DFPDT = (FPX-FP)/DT
+            ###################################################################
+            # VOLUME PERTURBATION
+            DV = 0.02*V
+            Vper = V + DV
+            Tper = T
+            Rper = 1/Vper
+
+            [Pper, Hper] = state(gas3, Rper, Tper)
+
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
+
+            # ELEMENTS OF JACOBIAN
+            DFHDV = (FHX-FH)/DV
+            DFPDV = (FPX-FP)/DV
+            calls = calls + 2
         #######################################################################
         # INVERT MATRIX
         J = DFHDT*DFPDV - DFPDT*DFHDV
@@ -221,7 +280,7 @@ def PostReflectedShock_fr(u2, gas2, gas3):
         ############################
         # TEMPERATURE
         # VOLUME
-        DTM = 0.2*T
+        DTM = 0.2*T*damping
         if (abs(deltaT) > DTM):
             deltaT = DTM*deltaT/abs(deltaT)
 
@@ -231,7 +290,7 @@ def PostReflectedShock_fr(u2, gas2, gas3):
         if V3X > V2:
             DVM = 0.5*(V2 - V)
         else:
-            DVM = 0.2*V
+            DVM = 0.2*V*damping
 
         if abs(deltaV) > DVM:
             deltaV = DVM*deltaV/abs(deltaV)
@@ -242,28 +301,83 @@ def PostReflectedShock_fr(u2, gas2, gas3):
         V = V + deltaV
         r = 1/V
         [P, H] = state(gas3, r, T)
-
+        calls = calls + 1
+
+    result = SolverResult(converged, j, FHFP_reflected_fr(u2, gas3, gas2), calls,
+                          strategy='newton' if damping == 1 else 'damped')
+    if not converged:
+        def damped():
+            gas3.TD = Tg, 1/Vg
+            return PostReflectedShock_fr(u2, gas2, gas3, jacobian=jacobian, fullOutput=True,
+                                         max_iter=max_iter, fallback=(), damping=DAMPING,
+                                         options=options)[1]
+
+        def bisection():
+            return rayleigh_bisection(gas3, state, lambda V: gas2.P + u2**2/(V2 - V),
+                                      lambda: FHFP_reflected_fr(u2, gas3, gas2), V2,
+                                      ERRFT, ERRFV)
+
+        phase('fallback')
+        result = apply_fallback(result, fallback, {'damped': damped, 'bisection': bisection})
+        if not result.converged:
+            result.message = 'Calculation did not converge for U = %.2f' % u2
+    result.time = time.perf_counter() - start
+    if not result.converged:
+        # do not leave a half-converged state
+        gas3.TDY = initial
+        if not fullOutput:
+            warnings.warn(result.message, RuntimeWarning)
+    if fullOutput:
+        return [gas3, result]
     return gas3
 
 
-def PostReflectedShock_eq(u2, gas2, gas3):
+@profiled()
+def PostReflectedShock_eq(u2, gas2, gas3, jacobian='fd', fullOutput=False,
+                          max_iter=None, fallback=None, damping=1.,
+                          options=None):
     """
     Calculates equilibrium post-reflected-shock state for a specified shock velocity.
 
     FUNCTION SYNTAX:
         gas3 = PostReflectedShock_fr(u2,gas2,gas3)
+        If convergence record required:
+        [gas3,result] = PostReflectedShock_eq(u2,gas2,gas3,fullOutput=True)
 
     INPUT:
         u2 = current post-incident-shock lab frame particle speed
         gas2 = gas object at post-incident-shock state (already computed)
         gas3 = working gas object
 
+    OPTIONAL INPUT:
+        jacobian = 'fd' to build the Jacobian of the jump conditions by finite
+                   differences (two extra equilibrium evaluations per iteration),
+                   or 'broyden' to build it by finite differences on the first
+                   iteration only and update it from the steps afterwards
+        fullOutput = set True to also return the convergence record
+        max_iter = iteration cap (maxIterations from the "config" module by default)
+        fallback = sequence of strategies tried if Newton iteration does not
+                   converge ('damped', 'bisection'; solverFallback from the
+                   "config" module by default), see sdtoolbox.convergence
+        damping = factor of the Newton step limits
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
     OUTPUT:
-        gas3 = gas object at equilibrium post-reflected-shock state
+        gas3 = gas object at equilibrium post-reflected-shock state (restored
+               to its state on entry if the calculation did not converge)
+        result = SolverResult (optional), see sdtoolbox.convergence
 
     """
-    # INITIALIZE ERROR VALUES (globally defined)
-    from sdtoolbox.config import ERRFT, ERRFV
+    # INITIALIZE ERROR VALUES, ITERATION CAP AND FALLBACK STRATEGIES
+    options = get_options(options)
+    ERRFT = options.ERRFT
+    ERRFV = options.ERRFV
+    if max_iter is None:
+        max_iter = options.maxIterations
+    if fallback is None:
+        fallback = options.solverFallback
+    start = time.perf_counter()
+    initial = gas3.TDY
 
     # CALCULATE POST-REFLECTED SHOCK STATE
     r2 = gas2.density
@@ -280,45 +394,68 @@ def PostReflectedShock_eq(u2, gas2, gas3):
     T = gas3.T
     r = gas3.density
     V = 1/r
+    Tg = T
+    Vg = V
     [P, H] = eq_state(gas3, r, T)
+    calls = 1
+    jac = None
+    FH0 = None
+    FP0 = None
     ###########################################################################
+    phase('newton')
     # START LOOP
 
+    converged = True
     while (abs(deltaT) > ERRFT*T or abs(deltaV) > ERRFV*V):
+        if j == max_iter:
+            converged = False
+            break
         j = j + 1
-        if j == 500:
-            print('Calculation did not converge for U = %.2f' % (u2))
-            return gas3
 
         #######################################################################
         # CALCULATE FH & FP FOR GUESS 1
         [FH, FP] = FHFP_reflected_fr(u2, gas3, gas2)
         #######################################################################
-        # TEMPERATURE PERTURBATION
-        DT = T*0.02
-        Tper = T + DT
-        Vper = V
-        Rper = 1/Vper
-        [Pper, Hper] = eq_state(gas3, Rper, Tper)
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
-
-        # ELEMENTS OF JACOBIAN
-        DFHDT = (FHX-FH)/DT
-        DFPDT = (FPX-FP)/DT
-        #######################################################################
-
-        # VOLUME PERTURBATION
-        DV = 0.02*V
-        Vper = V + DV
-        Tper = T
-        Rper = 1/Vper
-        [Pper, Hper] = eq_state(gas3, Rper, Tper)
-        # CALCULATE FHX & FPX FOR "IO" STATE
-        [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
-        # ELEMENTS OF JACOBIAN
-        DFHDV = (FHX-FH)/DV
-        DFPDV = (FPX-FP)/DV
+        if jacobian == 'broyden' and jac is not None:
+            # BROYDEN UPDATE OF THE JACOBIAN with the last step, T and V scaled
+            s = np.array([deltaT/T, deltaV/V])
+            dF = np.array([FH - FH0, FP - FP0])
+            jac = jac + np.outer(dF - np.dot(jac, s*[T, V]), s/[T, V])/np.dot(s, s)
+            if not abs(np.linalg.det(jac)) > 0:
+                # singular update, rebuild by finite differences
+                jac = None
+        if jacobian == 'broyden' and jac is not None:
+            [[DFHDT, DFHDV], [DFPDT, DFPDV]] = jac
+        else:
+            # TEMPERATURE PERTURBATION
+            DT = T*0.02
+            Tper = T + DT
+            Vper = V
+            Rper = 1/Vper
+            [Pper, Hper] = eq_state(gas3, Rper, Tper)
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
+
+            # ELEMENTS OF JACOBIAN
+            DFHDT = (FHX-FH)/DT
+            DFPDT = (FPX-FP)/DT
+            ###################################################################
+
+            # VOLUME PERTURBATION
+            DV = 0.02*V
+            Vper = V + DV
+            Tper = T
+            Rper = 1/Vper
+            [Pper, Hper] = eq_state(gas3, Rper, Tper)
+            # CALCULATE FHX & FPX FOR "IO" STATE
+            [FHX, FPX] = FHFP_reflected_fr(u2, gas3, gas2)
+            # ELEMENTS OF JACOBIAN
+            DFHDV = (FHX-FH)/DV
+            DFPDV = (FPX-FP)/DV
+            calls = calls + 2
+            jac = np.array([[DFHDT, DFHDV], [DFPDT, DFPDV]])
+        FH0 = FH
+        FP0 = FP
         #######################################################################
 
         # INVERT MATRIX
@@ -333,7 +470,7 @@ def PostReflectedShock_eq(u2, gas2, gas3):
         ############################
         # TEMPERATURE
         # VOLUME
-        DTM = 0.2*T
+        DTM = 0.2*T*damping
         if (abs(deltaT) > DTM):
             deltaT = DTM*deltaT/abs(deltaT)
 
@@ -343,7 +480,7 @@ def PostReflectedShock_eq(u2, gas2, gas3):
         if V3X > V2:
             DVM = 0.5*(V2 - V)
         else:
-            DVM = 0.2*V
+            DVM = 0.2*V*damping
 
         if abs(deltaV) > DVM:
             deltaV = DVM*deltaV/abs(deltaV)
@@ -354,10 +491,189 @@ def PostReflectedShock_eq(u2, gas2, gas3):
         V = V + deltaV
         r = 1/V
         [P, H] = eq_state(gas3, r, T)
-
+        calls = calls + 1
+
+    result = SolverResult(converged, j, FHFP_reflected_fr(u2, gas3, gas2), calls,
+                          strategy='newton' if damping == 1 else 'damped')
+    if not converged:
+        def damped():
+            gas3.TD = Tg, 1/Vg
+            return PostReflectedShock_eq(u2, gas2, gas3, jacobian=jacobian, fullOutput=True,
+                                         max_iter=max_iter, fallback=(), damping=DAMPING,
+                                         options=options)[1]
+
+        def bisection():
+            return rayleigh_bisection(gas3, eq_state, lambda V: gas2.P + u2**2/(V2 - V),
+                                      lambda: FHFP_reflected_fr(u2, gas3, gas2), V2,
+                                      ERRFT, ERRFV)
+
+        phase('fallback')
+        result = apply_fallback(result, fallback, {'damped': damped, 'bisection': bisection})
+        if not result.converged:
+            result.message = 'Calculation did not converge for U = %.2f' % u2
+    result.time = time.perf_counter() - start
+    if not result.converged:
+        # do not leave a half-converged state
+        gas3.TDY = initial
+        if not fullOutput:
+            warnings.warn(result.message, RuntimeWarning)
+    if fullOutput:
+        return [gas3, result]
     return gas3
 
 
+@profiled()
+def reflected_sweep(gas1, UI_array, frozen=True, jacobian=None, options=None):
+    """
+    Calculates post-incident-shock and post-reflected-shock states (u1 = 0)
+    for an array of incident shock speeds. Speeds are processed in ascending
+    order; the incident shock iteration starts from the previous converged
+    state and the reflected shock iteration from the temperature and volume
+    ratios (T3/T2, V3/V2) extrapolated from the two previous points (instead of
+    the crude guess of reflected_fr/reflected_eq). Equilibrium iterations
+    update the Jacobian by Broyden steps instead of building it by finite
+    differences every iteration. Far fewer iterations and equilibrium
+    evaluations are needed than calling reflected_fr/eq for every speed.
+
+    FUNCTION SYNTAX:
+        output = reflected_sweep(gas1,UI_array)
+        output = reflected_sweep(gas1,UI_array,frozen=False)
+
+    INPUT:
+        gas1 = gas object at initial state (not modified)
+        UI_array = array of incident shock speeds (m/s)
+
+    OPTIONAL INPUT:
+        frozen = True for frozen states (reflected_fr), False for equilibrium
+                 states (reflected_eq)
+        jacobian = Jacobian option of shk_calc and PostReflectedShock_fr ('fd'
+                   by default) or shk_eq_calc and PostReflectedShock_eq
+                   ('broyden' by default)
+        options = solver options (SolverOptions, see sdtoolbox.options)
+
+    OUTPUT:
+        output = structured array in the order of UI_array with fields
+            UI = incident shock speed (m/s)
+            P2, T2, rho2 = post-incident-shock pressure (Pa), temperature (K)
+                           and density (kg/m^3)
+            u2 = post-incident-shock lab frame particle speed (m/s)
+            P3, T3, rho3 = post-reflected-shock pressure, temperature, density
+            UR = reflected shock speed (m/s)
+            X = post-reflected-shock mole fractions
+            iterations = number of reflected shock Newton iterations
+            state_calls = number of reflected shock state evaluations
+        Values for speeds where calculation failed are nan.
+    """
+    # INITIALIZE ERROR VALUES
+    options = get_options(options)
+    ERRFT = options.ERRFT
+    ERRFV = options.ERRFV
+    volumeBoundRatio = options.volumeBoundRatio
+
+    UI = np.atleast_1d(np.asarray(UI_array, dtype=float))
+    gas2 = copy_solution(gas1)
+    gas3 = copy_solution(gas1)
+    p1 = gas1.P
+    rho1 = gas1.density
+    v1 = 1/rho1
+    output = np.zeros(UI.size, dtype=[('UI', float), ('P2', float), ('T2', float),
+                                      ('rho2', float), ('u2', float), ('P3', float),
+                                      ('T3', float), ('rho3', float), ('UR', float),
+                                      ('X', float, (gas1.n_species,)),
+                                      ('iterations', int), ('state_calls', int)])
+    output['UI'] = UI
+    for name in output.dtype.names[1:-3]:
+        output[name] = np.nan
+    output['X'] = np.nan
+
+    # previous converged points: (UI, T2, V2) and (UI, T3/T2, V3/V2)
+    incident = []
+    points = []
+    X3 = None
+    if jacobian is None:
+        jacobian = 'fd' if frozen else 'broyden'
+    for i in np.argsort(UI, kind='stable'):
+        #######################################################################
+        # INCIDENT SHOCK, start from the state extrapolated from the previous
+        # converged points
+        if len(incident) >= 2:
+            (Ua, Ta, Va), (Ub, Tb, Vb) = incident[-2:]
+            T2 = Tb + (Tb - Ta)*(UI[i] - Ub)/(Ub - Ua)
+            v2 = Vb + (Vb - Va)*(UI[i] - Ub)/(Ub - Ua)
+            gas2.TD = max(T2, gas1.T), 1/min(max(v2, 0.5*Vb), 0.5*(Vb + v1))
+        elif incident:
+            gas2.TD = incident[-1][1], 1/incident[-1][2]
+        else:
+            gas2.TPY = gas1.T, p1, gas1.Y
+        solve = shk_calc if frozen else shk_eq_calc
+        try:
+            [gas2, info] = solve(UI[i], gas2, gas1, ERRFT, ERRFV, guess=bool(incident),
+                                 jacobian=jacobian, fullOutput=True, options=options)
+            converged = info.converged
+        except Exception:
+            converged = False
+        if not (converged and gas2.P > p1 and gas2.density > rho1):
+            # start again from the basic guess
+            incident = []
+            points = []
+            X3 = None
+            continue
+        p2 = gas2.P
+        rho2 = gas2.density
+        v2 = 1/rho2
+        T2 = gas2.T
+        incident.append((UI[i], T2, v2))
+        u2 = np.sqrt((p2 - p1)*(v1 - v2))  # particle velocity
+
+        #######################################################################
+        # REFLECTED SHOCK
+        if len(points) >= 2:
+            # linear extrapolation along the curve
+            (Ua, Ta, Va), (Ub, Tb, Vb) = points[-2:]
+            Tratio = Tb + (Tb - Ta)*(UI[i] - Ub)/(Ub - Ua)
+            Vratio = Vb + (Vb - Va)*(UI[i] - Ub)/(Ub - Ua)
+            Vratio = min(max(Vratio, 0.5*Vb), 1 - 0.5*(1 - Vb))
+            Tratio = max(Tratio, 1.)
+        elif points:
+            Tratio, Vratio = points[-1][1:]
+        else:
+            # basic preliminary guess as in reflected_fr/reflected_eq
+            Vratio = 1/volumeBoundRatio
+            p3 = p2 + rho2*(UI[i]**2)*(1 - Vratio)
+            Tratio = p3*Vratio/p2
+        if frozen or X3 is None:
+            gas3.TDX = T2*Tratio, rho2/Vratio, gas2.X
+        else:
+            # start from the previous equilibrium composition
+            gas3.TDX = T2*Tratio, rho2/Vratio, X3
+        output['P2'][i] = p2
+        output['T2'][i] = T2
+        output['rho2'][i] = rho2
+        output['u2'][i] = u2
+        solve = PostReflectedShock_fr if frozen else PostReflectedShock_eq
+        try:
+            [gas3, info] = solve(u2, gas2, gas3, jacobian=jacobian, fullOutput=True,
+                                 options=options)
+            output['iterations'][i] = info.iterations
+            output['state_calls'][i] = info.state_calls
+            converged = info.converged
+        except Exception:
+            converged = False
+        if not converged:
+            points = []
+            X3 = None
+            continue
+        p3 = gas3.P
+        output['P3'][i] = p3
+        output['T3'][i] = gas3.T
+        output['rho3'][i] = gas3.density
+        output['UR'][i] = (p3 - p2)/u2/rho2 - u2
+        output['X'][i] = gas3.X
+        points.append((UI[i], gas3.T/T2, rho2/gas3.density))
+        X3 = gas3.X
+    return output
+
+
 def FHFP_reflected_fr(u2, gas3, gas2):
     """
     Uses the momentum and energy conservation equations to calculate error in
@@ -0,0 +1,301 @@
+"""
+Shock and Detonation Toolbox
+"resultcache" module
+
+Persistent on-disk cache of results of expensive calculations (CJ speeds,
+equilibrium post-shock states), shared by all processes using the same cache
+directory. Results are stored under a key built from the function name, all
+its arguments (composition normalized to sorted mole fractions), the solver
+options in effect (see the "options" module), a hash of the mechanism file
+contents, the Cantera version and a hash of the toolbox sources, so editing the
+mechanism, the tolerances or the code never returns stale results.
+
+Results are stored with pickle, and loading a pickle can run arbitrary code:
+anyone able to write to the cache directory could run code in the processes
+using it. The directory is therefore created private to the user (mode 0700),
+and a directory owned by another user or open to others is not used.
+
+The cache is controlled by the following settings of the "config" module:
+
+    resultCache = set True to enable the cache (disabled by default)
+    resultCacheDir = cache directory
+    resultCacheSize = maximal total size of cached results (bytes); least
+                      recently used results are removed first
+
+This module defines the following functions:
+
+    cached
+    cache_info
+    clear_cache
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import threading
+import warnings
+
+import cantera as ct
+import numpy as np
+
+from sdtoolbox.mechcache import _resolve, get_solution, pooled_solutions
+from sdtoolbox.options import get_options
+
+_stats = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+_mech_hashes = {}
+_source_hash = []
+_directories = {}
+_sizes = {}
+
+
+def _mech_hash(mech):
+    """
+    Returns sha256 hash of the mechanism file contents (cached while the file
+    is not modified).
+    """
+    path, mtime = _resolve(mech)
+    if mtime is None:
+        return mech
+    key = (path, mtime)
+    if key not in _mech_hashes:
+        with open(path, 'rb') as f:
+            _mech_hashes[key] = hashlib.sha256(f.read()).hexdigest()
+    return _mech_hashes[key]
+
+
+def _code_hash():
+    """
+    Returns sha256 hash of the toolbox sources (computed once per process).
+    """
+    if not _source_hash:
+        package = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(package)):
+            if name.endswith('.py'):
+                with open(os.path.join(package, name), 'rb') as f:
+                    digest.update(name.encode())
+                    digest.update(f.read())
+        _source_hash.append(digest.hexdigest())
+    return _source_hash[0]
+
+
+def _composition(q, mech):
+    """
+    Returns normalized composition: sorted list of (species, mole fraction).
+    """
+    with pooled_solutions(mech) as [gas]:
+        # workaround to avoid unsized object error when only one species in a .cti file
+        if len(q) > 1:
+            gas.X = q
+        return [[name, float('%.12g' % x)] for name, x in
+                sorted(zip(gas.species_names, gas.X)) if x > 0]
+
+
+def _key(name, arguments):
+    # per-call options completed by the defaults of this thread and config
+    options = get_options(arguments.get('options'))
+    mech = arguments['mech']
+    data = {'function': name,
+            'tolerances': [options.ERRFT, options.ERRFV, options.volumeBoundRatio],
+            'iterations': [options.maxIterations, list(options.solverFallback)],
+            'mech': _mech_hash(mech),
+            'cantera': ct.__version__,
+            'code': _code_hash()}
+    for arg, value in arguments.items():
+        if arg in ('mech', 'options'):
+            continue
+        elif arg == 'q':
+            value = _composition(value, mech)
+        elif isinstance(value, (float, np.floating)):
+            value = float('%.12g' % value)
+        data[arg] = value
+    text = json.dumps(data, sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _private(directory):
+    """
+    Creates the cache directory with mode 0700 and checks that it is owned by
+    the user and closed to others (checked once per process).
+    """
+    if directory not in _directories:
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            if hasattr(os, 'getuid'):
+                stat = os.stat(directory)
+                if stat.st_uid != os.getuid():
+                    raise PermissionError('owned by another user')
+                if stat.st_mode & 0o077:
+                    os.chmod(directory, 0o700)
+            _directories[directory] = True
+        except OSError as error:
+            warnings.warn('Result cache disabled, directory %s cannot be made private: %s'
+                          % (directory, error), RuntimeWarning)
+            _directories[directory] = False
+    return _directories[directory]
+
+
+def _stored(directory, size, entry_size):
+    """
+    Adds a new result to the total size of the directory (scanned on the first
+    call) and evicts results only when the total exceeds the limit.
+    """
+    with _lock:
+        if directory in _sizes:
+            _sizes[directory] = _sizes[directory] + entry_size
+            if _sizes[directory] <= size:
+                return
+    _sizes[directory] = _evict(directory, size)
+
+
+def _evict(directory, size):
+    """
+    Removes least recently used results until total size fits the limit and
+    returns the remaining total size.
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.pkl'):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(entry[1] for entry in entries)
+    for mtime, entry_size, path in sorted(entries):
+        if total <= size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total = total - entry_size
+    return total
+
+
+def cached(gas_output=False):
+    """
+    Decorator memoizing results of a function taking composition (q) and
+    mechanism (mech) arguments in the on-disk cache.
+
+    FUNCTION SYNTAX:
+        @cached()
+        def CJspeed(P1, T1, q, mech, ...):
+
+    OPTIONAL INPUT:
+        gas_output = set True for functions returning gas object; the state
+                     (T, density, Y) is stored and a new gas object is returned
+                     on cache hit
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            from sdtoolbox.config import resultCache, resultCacheDir, resultCacheSize
+
+            if not resultCache or not _private(resultCacheDir):
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            try:
+                key = _key(func.__name__, arguments)
+            except Exception:
+                # invalid input, let the function report it
+                return func(*args, **kwargs)
+            path = os.path.join(resultCacheDir, key + '.pkl')
+            try:
+                with open(path, 'rb') as f:
+                    result = pickle.load(f)
+                os.utime(path)
+            except Exception:
+                # missing, partially written or unreadable result
+                pass
+            else:
+                with _lock:
+                    _stats['hits'] += 1
+                if gas_output:
+                    gas = get_solution(arguments['mech'])
+                    gas.TDY = result
+                    return gas
+                return result
+
+            with _lock:
+                _stats['misses'] += 1
+            result = func(*args, **kwargs)
+            data = (result.T, result.density, result.Y) if gas_output else result
+            tmp = None
+            try:
+                fd, tmp = tempfile.mkstemp(dir=resultCacheDir, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(data, f)
+                os.replace(tmp, path)
+                tmp = None
+                _stored(resultCacheDir, resultCacheSize, os.path.getsize(path))
+            except Exception:
+                # the result is returned even if it cannot be stored
+                pass
+            finally:
+                if tmp is not None:
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def cache_info():
+    """
+    Returns cache statistics of the current process.
+
+    FUNCTION SYNTAX:
+        info = cache_info()
+
+    OUTPUT:
+        info = dictionary with number of hits and misses, number of stored
+               results and their total size (bytes)
+    """
+    from sdtoolbox.config import resultCacheDir
+
+    files = 0
+    size = 0
+    if os.path.isdir(resultCacheDir):
+        for entry in os.scandir(resultCacheDir):
+            if entry.name.endswith('.pkl'):
+                files = files + 1
+                size = size + entry.stat().st_size
+    with _lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses'],
+                'files': files, 'size': size}
+
+
+def clear_cache():
+    """
+    Removes all stored results and resets hit/miss counters.
+
+    FUNCTION SYNTAX:
+        clear_cache()
+    """
+    from sdtoolbox.config import resultCacheDir
+
+    if os.path.isdir(resultCacheDir):
+        for entry in os.scandir(resultCacheDir):
+            if entry.name.endswith(('.pkl', '.tmp')):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+    with _lock:
+        _stats['hits'] = 0
+        _stats['misses'] = 0
+        _sizes.pop(resultCacheDir, None)
@@ -37,8 +37,10 @@ Under these operating systems:
     Windows 10, Linux (Ubuntu)
 """
 
+from sdtoolbox.mechcache import preserves_state
+from sdtoolbox.profiling import phase, profiled
 from sdtoolbox.thermo import soundspeed_fr
-from sdtoolbox.znd import getThermicity
+from sdtoolbox.znd import _profile_properties, getThermicity
 import numpy as np
 from scipy.integrate import solve_ivp
 
@@ -74,6 +76,8 @@ class StgSys(object):
         return np.hstack((Pdot, rdot, Udot, U, dYdt))
 
 
+@profiled()
+@preserves_state('gas')
 def stgsolve(gas, gas1, U1, Delta,
              t_end=1e-3, max_step=1e-4, t_eval=None,
              relTol=1e-5, absTol=1e-8):
@@ -85,7 +89,7 @@ def stgsolve(gas, gas1, U1, Delta,
     output = stgsolve(gas,gas1,U1,Delta,**kwargs)
 
     INPUT
-        gas = Cantera gas object - postshock state
+        gas = Cantera gas object - postshock state (restored on return)
         gas1 = Cantera gas object - initial state
         U1 = shock velocity (m/s)
         Delta = shock standoff distance (m)
@@ -135,8 +139,10 @@ def stgsolve(gas, gas1, U1, Delta,
 
     output = {}
 
+    phase('integration')
     out = solve_ivp(StgSys(gas, U1, r1, Delta), tel, y0, method='Radau',
                     atol=absTol, rtol=relTol, max_step=max_step, t_eval=t_eval)
+    phase('post-processing')
 
     output['time'] = out.t
     output['P'] = out.y[0, :]
@@ -145,39 +151,19 @@ def stgsolve(gas, gas1, U1, Delta,
     output['distance'] = out.y[3, :]
     output['species'] = out.y[4:, :]
 
-    # Initialize additional output matrices where needed
-    b = len(output['time'])
-    output['T'] = np.zeros(b)
-    output['thermicity'] = np.zeros(b)
-    output['M'] = np.zeros(b)
-    output['af'] = np.zeros(b)
-    output['g'] = np.zeros(b)
-    output['wt'] = np.zeros(b)
-    output['sonic'] = np.zeros(b)
     output['Delta'] = Delta
 
-    # Have to loop for operations involving the working gas object
-    for i, P in enumerate(output['P']):
-        gas.DPY = output['rho'][i], P, output['species'][:, i]
-        output['T'][i] = gas.T
-
-        #######################################################################
-        # Extract WEIGHT, GAMMA, SOUND SPEED, VELOCITY, MACH NUMBER, c^2-U^2,
-        # THERMICITY, and TEMPERATURE GRADIENT
-        #######################################################################
-
-        af = soundspeed_fr(gas)     # frozen sound speed
-        M = output['U'][i]/af       # Mach Number in shock-fixed frame
-        eta = 1-M**2                # Sonic Parameter
-        sonic = af**2*eta
-
-        # Assign output structure
-        output['thermicity'][i] = getThermicity(gas)
-        output['M'][i] = M
-        output['af'][i] = af
-        output['g'][i] = gas.cp/gas.cv
-        output['wt'][i] = gas.mean_molecular_weight
-        output['sonic'][i] = sonic
+    ###########################################################################
+    # Extract TEMPERATURE, WEIGHT, GAMMA, SOUND SPEED, MACH NUMBER, c^2-U^2
+    # and THERMICITY
+    ###########################################################################
+
+    # Evaluate properties of all points at once
+    [output['T'], output['af'], output['g'], output['wt'], output['thermicity'],
+     wdot] = _profile_properties(gas, output['rho'], output['P'], output['species'])
+    output['M'] = output['U']/output['af']      # Mach Number in shock-fixed frame
+    eta = 1 - output['M']**2                     # Sonic Parameter
+    output['sonic'] = output['af']**2*eta
 
     output['gas1'] = gas1
     output['U1'] = U1
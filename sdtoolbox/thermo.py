@@ -8,11 +8,16 @@ Gruneisen coefficient for frozen and equilibrium cases.
 This module defines the following functions:
 
     soundspeed_eq
+    soundspeed_eq_batch
     soundspeed_fr
+    soundspeed_fr_batch
     gruneisen_eq
+    gruneisen_eq_batch
     gruneisen_fr
+    gruneisen_fr_batch
     eq_state
     state
+    state_derivs
 
 ###############################################################################
 Theory, numerical methods and applications are described in the following report:
@@ -37,17 +42,27 @@ Tested with:
 Under these operating systems:
     Windows 10, Linux (Ubuntu)
 """
+import cantera as ct
 import numpy as np
+from sdtoolbox.profiling import profiled
 
 
-def soundspeed_eq(gas):
+@profiled()
+def soundspeed_eq(gas, exact=True):
     """
-    Computes the equilibrium sound speed by using a finite
-    difference approximation. Directly evaluating pressure at two density/specific
-    volume states along an isentrope requires use of equilibrate('SV'). However,
-    this may not always converge at high pressure. Instead, a more robust method
-    using equilibrate('TP') is used that employs thermodynamic identities detailed
-    further in Appendix G2 of the report.
+    Computes the equilibrium sound speed. For an ideal gas mixture the gas is
+    brought to equilibrium at its temperature and pressure (a single
+    equilibrate call, starting from the composition of the gas) and the
+    derivatives of the equilibrium composition with respect to temperature
+    and pressure are found from a linear system of the element potential
+    sensitivities (see _equilibrium_derivs). Otherwise, a finite difference
+    approximation is used. Directly evaluating pressure at two
+    density/specific volume states along an isentrope requires use of
+    equilibrate('SV'). However, this may not always converge at high pressure.
+    Instead, a more robust method using equilibrate('TP') is used that employs
+    thermodynamic identities detailed further in Appendix G2 of the report.
+    Every perturbed equilibrium state starts from the composition of the gas
+    (the reference equilibrium composition if the gas is in equilibrium).
 
     The old version of this code that used 'SV' instead of 'TP' is commented out
     below for reference.
@@ -58,6 +73,9 @@ def soundspeed_eq(gas):
     INPUT:
         gas = working gas object (restored to original state at end of function)
 
+    OPTIONAL INPUT:
+        exact = set False to always use the finite difference approximation
+
     OUTPUT:
         ae = equilibrium sound speed = sqrt({d P/d rho)_s, eq) (m/s)
 
@@ -75,19 +93,27 @@ def soundspeed_eq(gas):
 #    aequil = math.sqrt(dpdrho_s)
 #    gas.SVX =  s0, 1./rho0, x0
 
-    # New method based on Taylor series expansion, centered differences
-    # using thermodynamic identities
     T0 = gas.T
     P0 = gas.P
     x0 = gas.X
 
+    if exact and gas.thermo_model in ('ideal-gas', 'IdealGas'):
+        gas.equilibrate('TP')
+        ae = _soundspeed_eq_ideal(gas)
+        if ae is not None:
+            gas.TPX = T0, P0, x0
+            return ae
+        gas.TPX = T0, P0, x0
+
+    # New method based on Taylor series expansion, centered differences
+    # using thermodynamic identities
     T2 = 1.01*T0
     T1 = 0.99*T0
-    gas.TP = T1, P0
+    gas.TPX = T1, P0, x0
     gas.equilibrate('TP')
     s1 = gas.entropy_mass
 
-    gas.TP = T2, P0
+    gas.TPX = T2, P0, x0
     gas.equilibrate('TP')
     s2 = gas.entropy_mass
 
@@ -95,11 +121,11 @@ def soundspeed_eq(gas):
 
     P1 = 0.99*P0
     P2 = 1.01*P0
-    gas.TP = T0, P1
+    gas.TPX = T0, P1, x0
     gas.equilibrate('TP')
     s1 = gas.entropy_mass
 
-    gas.TP = T0, P2
+    gas.TPX = T0, P2, x0
     gas.equilibrate('TP')
     s2 = gas.entropy_mass
 
@@ -108,12 +134,12 @@ def soundspeed_eq(gas):
     DTDP = -DSDP/DSDT
 
     TA = T0 + DTDP*(P1-P0)
-    gas.TP = TA, P1
+    gas.TPX = TA, P1, x0
     gas.equilibrate('TP')
     rhoA = gas.density
 
     TB = T0 + DTDP*(P2-P0)
-    gas.TP = TB, P2
+    gas.TPX = TB, P2, x0
     gas.equilibrate('TP')
     rhoB = gas.density
 
@@ -126,12 +152,46 @@ def soundspeed_eq(gas):
     return ae
 
 
-def soundspeed_fr(gas):
+@profiled()
+def soundspeed_eq_batch(states, T=None, rho=None, Y=None, exact=True):
     """
-    Computes the frozen sound speed by using a finite
-    difference approximation and evaluating frozen composition states on the
-    isentrope passing through the reference (S, V) state supplied by the gas
-    object passed to the function.
+    Computes the equilibrium sound speed (see soundspeed_eq) of an array of
+    states, e.g. along a ZND or CV explosion profile. Along the array the
+    equilibrium calculation of every state starts from the equilibrium
+    composition of the previous one if both have the same elemental
+    composition.
+
+    FUNCTION SYNTAX:
+        ae = soundspeed_eq_batch(states)
+        ae = soundspeed_eq_batch(gas,T,rho,Y)
+
+    INPUT:
+        states = SolutionArray of the states, or
+        gas = working gas object (restored to original state at end of function)
+              with the states given by
+        T = temperature array (K)
+        rho = density array (kg/m^3)
+        Y = mass fraction array, one row per state
+
+    OPTIONAL INPUT:
+        exact = set False to always use the finite difference approximation
+
+    OUTPUT:
+        ae = array of equilibrium sound speeds (m/s)
+
+    """
+    return _equilibrium_batch(states, T, rho, Y, exact, _soundspeed_eq_ideal,
+                              lambda gas: soundspeed_eq(gas, exact=False))
+
+
+@profiled()
+def soundspeed_fr(gas, exact=True):
+    """
+    Computes the frozen sound speed. For an ideal gas mixture the exact
+    expression afrz = sqrt(gamma*P/rho) = sqrt(gamma*R*T/W) is used, otherwise
+    the sound speed is found by using a finite difference approximation and
+    evaluating frozen composition states on the isentrope passing through the
+    reference (S, V) state supplied by the gas object passed to the function.
 
     FUNCTION SYNTAX:
         afrz =  soundspeed_fr(gas)
@@ -139,9 +199,15 @@ def soundspeed_fr(gas):
     INPUT:
         gas = working gas object (restored to original state at end of function)
 
+    OPTIONAL INPUT:
+        exact = set False to always use the finite difference approximation
+
     OUTPUT:
         afrz = frozen sound speed = sqrt({d P/d rho)_{s,x0})
     """
+    if exact and gas.thermo_model in ('ideal-gas', 'IdealGas'):
+        return np.sqrt(gas.cp_mass/gas.cv_mass*gas.P/gas.density)
+
     rho0 = gas.density
     p0 = gas.P
     s0 = gas.entropy_mass
@@ -166,6 +232,43 @@ def soundspeed_fr(gas):
     return afrz
 
 
+@profiled()
+def soundspeed_fr_batch(states, T=None, rho=None, Y=None, exact=True):
+    """
+    Computes the frozen sound speed (see soundspeed_fr) of an array of
+    states. For an ideal gas mixture with NASA 7-coefficient polynomials the
+    heat capacities of all states are evaluated at once from the species
+    polynomials, without setting the state of the gas object.
+
+    FUNCTION SYNTAX:
+        afrz = soundspeed_fr_batch(states)
+        afrz = soundspeed_fr_batch(gas,T,rho,Y)
+
+    INPUT:
+        states = SolutionArray of the states, or
+        gas = working gas object (restored to original state at end of function)
+              with the states given by
+        T = temperature array (K)
+        rho = density array (kg/m^3)
+        Y = mass fraction array, one row per state
+
+    OPTIONAL INPUT:
+        exact = set False to always use the finite difference approximation
+
+    OUTPUT:
+        afrz = array of frozen sound speeds (m/s)
+
+    """
+    [gas, T, rho, Y, shape] = _batch_states(states, T, rho, Y)
+    heat_capacities = _ideal_heat_capacities(gas, T, Y) if exact else None
+    if heat_capacities is None:
+        return _frozen_batch(gas, T, rho, Y, shape,
+                             lambda gas: soundspeed_fr(gas, exact=exact))
+    [cp, cv, R] = heat_capacities
+    return np.sqrt(cp/cv*R*T).reshape(shape)
+
+
+@profiled()
 def gruneisen_eq(gas):
     """
     Computes the equilibrium Gruneisen coefficient by using a centered finite
@@ -208,6 +311,43 @@ def gruneisen_eq(gas):
     return G_eq
 
 
+@profiled()
+def gruneisen_eq_batch(states, T=None, rho=None, Y=None, exact=True):
+    """
+    Computes the equilibrium Gruneisen coefficient of an array of states.
+    For an ideal gas mixture every state is brought to equilibrium at its
+    temperature and pressure (starting from the equilibrium composition of
+    the previous state if both have the same elemental composition) and the
+    coefficient G_eq = (v/cv)(dP/dT)_{v,eq} is found from the derivatives of
+    the equilibrium composition (see _equilibrium_derivs). Otherwise, or with
+    exact=False, gruneisen_eq is evaluated at every state. For states out of
+    equilibrium (e.g. in a reaction zone) the results differ: gruneisen_eq
+    follows the isentrope from the frozen reference state, while the exact
+    coefficient is that of the equilibrium state at the same T and P.
+
+    FUNCTION SYNTAX:
+        G_eq = gruneisen_eq_batch(states)
+        G_eq = gruneisen_eq_batch(gas,T,rho,Y)
+
+    INPUT:
+        states = SolutionArray of the states, or
+        gas = working gas object (restored to original state at end of function)
+              with the states given by
+        T = temperature array (K)
+        rho = density array (kg/m^3)
+        Y = mass fraction array, one row per state
+
+    OPTIONAL INPUT:
+        exact = set False to always use the finite difference approximation
+
+    OUTPUT:
+        G_eq = array of equilibrium Gruneisen coefficients
+
+    """
+    return _equilibrium_batch(states, T, rho, Y, exact, _gruneisen_eq_ideal, gruneisen_eq)
+
+
+@profiled()
 def gruneisen_fr(gas):
     """
     Computes the frosen Gruneisen coefficient by using a centered finite
@@ -243,6 +383,46 @@ def gruneisen_fr(gas):
     return G_fr
 
 
+@profiled()
+def gruneisen_fr_batch(states, T=None, rho=None, Y=None, exact=True):
+    """
+    Computes the frozen Gruneisen coefficient of an array of states. For an
+    ideal gas mixture with NASA 7-coefficient polynomials the exact
+    expression G_fr = cp/cv - 1 is evaluated for all states at once, without
+    setting the state of the gas object. Otherwise, or with exact=False,
+    gruneisen_fr is evaluated at every state.
+
+    FUNCTION SYNTAX:
+        G_fr = gruneisen_fr_batch(states)
+        G_fr = gruneisen_fr_batch(gas,T,rho,Y)
+
+    INPUT:
+        states = SolutionArray of the states, or
+        gas = working gas object (restored to original state at end of function)
+              with the states given by
+        T = temperature array (K)
+        rho = density array (kg/m^3)
+        Y = mass fraction array, one row per state
+
+    OPTIONAL INPUT:
+        exact = set False to always use the finite difference approximation
+
+    OUTPUT:
+        G_fr = array of frozen Gruneisen coefficients
+
+    """
+    [gas, T, rho, Y, shape] = _batch_states(states, T, rho, Y)
+    ideal = exact and gas.thermo_model in ('ideal-gas', 'IdealGas')
+    heat_capacities = _ideal_heat_capacities(gas, T, Y) if exact else None
+    if heat_capacities is None:
+        if ideal:
+            return _frozen_batch(gas, T, rho, Y, shape,
+                                 lambda gas: gas.cp_mass/gas.cv_mass - 1)
+        return _frozen_batch(gas, T, rho, Y, shape, gruneisen_fr)
+    [cp, cv, R] = heat_capacities
+    return (cp/cv - 1).reshape(shape)
+
+
 def eq_state(gas, r1, T1):
     """
     Calculates equilibrium state given T & rho.
@@ -286,3 +466,232 @@ def state(gas, r1, T1):
     P = gas.P
     H = gas.enthalpy_mass
     return [P, H]
+
+
+def state_derivs(gas):
+    """
+    Calculates partial derivatives of pressure and enthalpy with respect to
+    temperature and specific volume at frozen composition. Used in postshock
+    and reflections modules to evaluate the Jacobian of the shock jump
+    conditions analytically instead of perturbing the state.
+
+    For an ideal gas dP/dT = P/T, dP/dV = -P/V, dH/dT = cp and dH/dV = 0;
+    the general thermodynamic identities are used so that other equations of
+    state are handled as well.
+
+    FUNCTION SYNTAX:
+        [DPDT,DPDV,DHDT,DHDV] = state_derivs(gas)
+
+    INPUT:
+        gas = working gas object (not modified in function)
+
+    OUTPUT:
+        DPDT = (dP/dT)_{v,x} (Pa/K)
+        DPDV = (dP/dv)_{T,x} (Pa kg/m^3)
+        DHDT = (dh/dT)_{v,x} (J/kg/K)
+        DHDV = (dh/dv)_{T,x} (J/m^3)
+
+    """
+    T = gas.T
+    V = 1/gas.density
+    beta = gas.thermal_expansion_coeff
+    kappa = gas.isothermal_compressibility
+    DPDT = beta/kappa
+    DPDV = -1/(V*kappa)
+    DHDT = gas.cv_mass + V*DPDT
+    DHDV = T*DPDT + V*DPDV
+    return [DPDT, DPDV, DHDT, DHDV]
+
+
+# element matrices of mechanisms, (species names, element names) -> array
+_element_matrices = {}
+
+
+def _element_matrix(gas):
+    """
+    Returns the matrix of the number of atoms of every element (rows) in
+    every species (columns) of the gas object.
+    """
+    key = (tuple(gas.species_names), tuple(gas.element_names))
+    A = _element_matrices.get(key)
+    if A is None:
+        if len(_element_matrices) > 32:
+            _element_matrices.clear()
+        A = np.array([[gas.n_atoms(k, m) for k in range(gas.n_species)]
+                      for m in range(gas.n_elements)])
+        _element_matrices[key] = A
+    return A
+
+
+def _batch_states(states, T, rho, Y):
+    """
+    Returns [gas, T, rho, Y, shape]: working gas object and flat arrays of the
+    states given as SolutionArray or as gas object with arrays T, rho, Y.
+    """
+    if T is None:
+        shape = states.shape
+        gas = states._phase
+        T = states.T
+        rho = states.density
+        Y = states.Y
+    else:
+        gas = states
+        shape = np.shape(T)
+    T = np.asarray(T, dtype=float).ravel()
+    rho = np.asarray(rho, dtype=float).ravel()
+    Y = np.asarray(Y, dtype=float).reshape(len(T), gas.n_species)
+    return [gas, T, rho, Y, shape]
+
+
+def _equilibrium_batch(states, T, rho, Y, exact, ideal_value, fd_value):
+    """
+    Evaluates an equilibrium property at an array of states (see
+    soundspeed_eq_batch): ideal_value(gas) at the equilibrium state of an
+    ideal gas mixture (None if it fails), fd_value(gas) otherwise.
+    """
+    [gas, T, rho, Y, shape] = _batch_states(states, T, rho, Y)
+    state0 = gas.TDY
+    ideal = exact and gas.thermo_model in ('ideal-gas', 'IdealGas')
+    # elemental composition (kmol of every element per kg)
+    Z = (Y/gas.molecular_weights) @ _element_matrix(gas).T
+    values = np.zeros(len(T))
+    xeq = None
+    for i in range(len(T)):
+        gas.TDY = T[i], rho[i], Y[i]
+        if not ideal:
+            values[i] = fd_value(gas)
+            continue
+        if xeq is not None and np.allclose(Z[i], Z[i-1], rtol=1e-10, atol=0):
+            # seed with the previous equilibrium composition
+            gas.TPX = T[i], gas.P, xeq
+        gas.equilibrate('TP')
+        xeq = gas.X
+        value = ideal_value(gas)
+        if value is None:
+            gas.TDY = T[i], rho[i], Y[i]
+            value = fd_value(gas)
+        values[i] = value
+    gas.TDY = state0
+    return values.reshape(shape)
+
+
+def _frozen_batch(gas, T, rho, Y, shape, value):
+    """
+    Evaluates value(gas) at every state of the arrays, the gas object is
+    restored to its original state.
+    """
+    state0 = gas.TDY
+    values = np.zeros(len(T))
+    for i in range(len(T)):
+        gas.TDY = T[i], rho[i], Y[i]
+        values[i] = value(gas)
+    gas.TDY = state0
+    return values.reshape(shape)
+
+
+def _ideal_heat_capacities(gas, T, Y):
+    """
+    Returns [cp, cv, R]: arrays of the heat capacities and the gas constant
+    (J/kg/K) of ideal gas mixtures at temperatures T with mass fractions Y
+    (one row per state), evaluated from the NASA 7-coefficient polynomials
+    of the species. Returns None if the gas is not an ideal gas mixture or
+    other species thermo parametrizations are used.
+    """
+    if gas.thermo_model not in ('ideal-gas', 'IdealGas'):
+        return None
+    species = gas.species()
+    if any(type(sp.thermo).__name__ != 'NasaPoly2' for sp in species):
+        return None
+    # coefficients: [T_mid, 7 high temperature, 7 low temperature]
+    coeffs = np.array([sp.thermo.coeffs for sp in species])
+    Tc = T[:, np.newaxis]
+    [high, low] = [coeffs[:, 5], coeffs[:, 12]]
+    for k in range(4, 0, -1):
+        high = high*Tc + coeffs[:, k]
+        low = low*Tc + coeffs[:, k + 7]
+    cp_R = np.where(Tc < coeffs[:, 0], low, high)
+    n = Y/gas.molecular_weights
+    R = ct.gas_constant*np.sum(n, axis=1)
+    cp = ct.gas_constant*np.sum(n*cp_R, axis=1)
+    return [cp, cp - R, R]
+
+
+def _equilibrium_derivs(gas):
+    """
+    Computes thermodynamic derivatives of an ideal gas mixture in chemical
+    equilibrium at the current state from the derivatives of the equilibrium
+    composition, Gordon & McBride, NASA RP-1311 (1994), Sec. 2.5. With the
+    moles n_j of species per unit mass, element matrix a_ij and
+    h_j = H_j/RT, the sensitivities of the element potentials pi_i and of the
+    total moles n to ln T (and ln P) are the solution of
+
+        sum_k (sum_j a_ij a_kj n_j) dpi_k + b_i dln(n) = -sum_j a_ij n_j h_j  (b_i)
+        sum_k b_k dpi_k                               = -sum_j n_j h_j       (n)
+
+    which gives the equilibrium heat capacities and (dlnV/dlnT)_P,
+    (dlnV/dlnP)_T. Returns [cp, cv, DVDT, DVDP, N]: heat capacities per unit
+    mass divided by the universal gas constant, the logarithmic derivatives
+    of volume and the moles per unit mass N (kmol/kg), or None if the system
+    cannot be solved.
+    """
+    A = _element_matrix(gas)
+    n = gas.X/gas.mean_molecular_weight
+    b = A @ n
+    # elements absent from the mixture
+    present = b > 1e-14*np.max(b)
+    A = A[present]
+    b = b[present]
+    h = gas.standard_enthalpies_RT
+    m = len(b)
+    M = np.zeros((m + 1, m + 1))
+    M[:m, :m] = (A*n) @ A.T
+    M[:m, m] = b
+    M[m, :m] = b
+    nh = A @ (n*h)
+    rhs = np.array([np.append(-nh, -n @ h), np.append(b, np.sum(n))]).T
+    try:
+        # least squares: the system is singular if the equilibrium
+        # composition does not depend on some element potentials
+        [dT, dP] = np.linalg.lstsq(M, rhs, rcond=None)[0].T
+    except np.linalg.LinAlgError:
+        return None
+    DVDT = 1 + dT[m]
+    DVDP = -1 + dP[m]
+    # heat capacities per unit mass divided by the gas constant
+    cp = nh @ dT[:m] + (n @ h)*dT[m] + n @ gas.standard_cp_R + n @ h**2
+    cv = cp + np.sum(n)*DVDT**2/DVDP
+    return [cp, cv, DVDT, DVDP, np.sum(n)]
+
+
+def _soundspeed_eq_ideal(gas):
+    """
+    Computes the equilibrium sound speed of an ideal gas mixture in chemical
+    equilibrium at the current state from the isentropic exponent
+    gamma_s = -(cp/cv)/(dlnV/dlnP)_T (see _equilibrium_derivs),
+    ae = sqrt(gamma_s P/rho). Returns None if it cannot be found.
+    """
+    derivs = _equilibrium_derivs(gas)
+    if derivs is None:
+        return None
+    [cp, cv, DVDT, DVDP, N] = derivs
+    gamma_s = -cp/cv/DVDP
+    if not gamma_s > 0:
+        return None
+    return np.sqrt(gamma_s*gas.P/gas.density)
+
+
+def _gruneisen_eq_ideal(gas):
+    """
+    Computes the equilibrium Gruneisen coefficient of an ideal gas mixture in
+    chemical equilibrium at the current state,
+    G_eq = (v/cv)(dP/dT)_{v,eq} = -N (dlnV/dlnT)_P/(dlnV/dlnP)_T/cv
+    (see _equilibrium_derivs). Returns None if it cannot be found.
+    """
+    derivs = _equilibrium_derivs(gas)
+    if derivs is None:
+        return None
+    [cp, cv, DVDT, DVDP, N] = derivs
+    G_eq = -N*DVDT/DVDP/cv
+    if not (cv > 0 and np.isfinite(G_eq)):
+        return None
+    return G_eq
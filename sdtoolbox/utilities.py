@@ -39,8 +39,6 @@ Under these operating systems:
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-from cycler import cycler
 
 masterFontSize = 12
 defaultColors = ['#1f77b4',
@@ -53,10 +51,25 @@ defaultColors = ['#1f77b4',
                  '#7f7f7f',
                  '#bcbd22',
                  '#17becf']
-plt.rc('font', size=masterFontSize)
-# Change linestyle once all colors cycled through
-plt.rc('axes', prop_cycle=(cycler('linestyle', ['-', '--', '-.', ':']) *
-                           cycler('color', defaultColors[:4])))
+_styled = False
+
+
+def _pyplot():
+    """
+    Imports matplotlib on the first call of a plotting function (so that
+    importing this module does not require a display backend) and sets the
+    plot style.
+    """
+    global _styled
+    import matplotlib.pyplot as plt
+    if not _styled:
+        from cycler import cycler
+        plt.rc('font', size=masterFontSize)
+        # Change linestyle once all colors cycled through
+        plt.rc('axes', prop_cycle=(cycler('linestyle', ['-', '--', '-.', ':']) *
+                                   cycler('color', defaultColors[:4])))
+        _styled = True
+    return plt
 
 
 def CJspeed_plot(plot_data, cj_speed):
@@ -82,6 +95,8 @@ def CJspeed_plot(plot_data, cj_speed):
     OUTPUT:
         (none, but displays plots)
     """
+    plt = _pyplot()
+
     # Unpack tuple of plot data
     rr, w1, dnew, a, b, c = plot_data
 
@@ -143,6 +158,8 @@ def cv_plot(cv_output, xscale='linear', maxt=None,
         List of figure handles: [temperature, pressure, {major species}, {minor species}]
 
     """
+    plt = _pyplot()
+
     ###########################################################
     # PLOT TEMPERATURE PROFILE - MAX TIME = MAX TEMP + 10%
     ###########################################################
@@ -274,6 +291,8 @@ def znd_plot(znd_output, xscale='linear', maxx=None,
                                  thermicity, {major species}, {minor species}]
 
     """
+    plt = _pyplot()
+
     k = znd_output['T'].argmax()
 
     if maxx is None:
@@ -524,6 +543,8 @@ def cp_plot(cp_output, xscale='linear', maxt=None,
         List of figure handles: [temperature, pressure, {major species}, {minor species}]
 
     """
+    plt = _pyplot()
+
     ###########################################################
     # PLOT TEMPERATURE PROFILE - MAX TIME = MAX TEMP + 10%
     ###########################################################
@@ -0,0 +1,367 @@
+"""
+Shock and Detonation Toolbox
+"vp" module
+
+Calculates explosions under a prescribed pressure history, e.g. behind the
+reflected shock wave in a shock tube with non-ideal pressure rise.
+
+Following the VTIM approach (Chaos & Dryer, Int. J. Chem. Kinet. 42 (2010)
+143-150), the measured pressure history P(t) (or a linear rise with the
+given dP/dt) is converted to the volume (density) history of the unreacted
+mixture compressed isentropically, and the adiabatic reactor is integrated
+with this prescribed density. Until ignition the pressure follows the
+prescribed history, heat release then raises the pressure above it.
+
+This module defines the following functions:
+
+    vpsolve
+
+and the following classes:
+
+    IsentropicCompression
+    VPSys
+"""
+
+import bisect
+
+import cantera as ct
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+from sdtoolbox.ignition import explosion_times, integrate
+from sdtoolbox.mechcache import preserves_state
+from sdtoolbox.profiling import phase, profiled
+from sdtoolbox.thermo import soundspeed_fr
+
+
+class _Hermite(object):
+    """
+    Cubic Hermite interpolant with knots xk, values fk and slopes dk.
+    Returns [f, df/dx] at x (scalar or array, clipped to the knots); scalars
+    are evaluated with Python floats, which is several times faster than
+    NumPy for single right-hand side evaluations.
+    """
+    def __init__(self, xk, fk, dk):
+        self.xk = np.asarray(xk, dtype=float)
+        self.fk = np.asarray(fk, dtype=float)
+        self.dk = np.asarray(dk, dtype=float)
+        self.knots = [self.xk.tolist(), self.fk.tolist(), self.dk.tolist()]
+
+    def __call__(self, x):
+        if np.ndim(x) == 0:
+            [xk, fk, dk] = self.knots
+            x = min(max(float(x), xk[0]), xk[-1])
+            i = min(max(bisect.bisect_left(xk, x) - 1, 0), len(xk) - 2)
+        else:
+            [xk, fk, dk] = [self.xk, self.fk, self.dk]
+            x = np.clip(x, xk[0], xk[-1])
+            i = np.clip(np.searchsorted(xk, x) - 1, 0, len(xk) - 2)
+        h = xk[i + 1] - xk[i]
+        s = (x - xk[i])/h
+        f = ((1 + 2*s)*(1 - s)**2*fk[i] + s*(1 - s)**2*h*dk[i]
+             + s**2*(3 - 2*s)*fk[i + 1] + s**2*(s - 1)*h*dk[i + 1])
+        df = (6*s*(s - 1)*(fk[i] - fk[i + 1])/h
+              + (3*s - 1)*(s - 1)*dk[i] + s*(3*s - 2)*dk[i + 1])
+        return [f, df]
+
+
+class IsentropicCompression(object):
+    """
+    Density history of the unreacted mixture compressed isentropically
+    (frozen composition) along a prescribed pressure history, starting from
+    the state of the gas object.
+
+    The isentrope is tabulated once as ln(rho) against ln(P) with spacing
+    resolution in ln(P) and the slopes (d ln rho/d ln P)_s = P/(rho a_fr^2);
+    the pressure history is a linear rise or a monotone cubic (PCHIP)
+    interpolant of the given trace. Both are evaluated as cubic Hermite
+    interpolants, which is cheap enough for every right-hand side evaluation.
+
+    SYNTAX:
+        history = IsentropicCompression(gas, dPdt=20.)
+        history = IsentropicCompression(gas, profile=(time, pressure))
+        [rho, drhodt] = history(t)
+
+    INPUT:
+        gas = gas object at the initial state (restored at end of function)
+
+    OPTIONAL INPUT:
+        dPdt = normalized rate of linear pressure rise (1/P0)(dP/dt), 1/s
+               (e.g. 20 for 2 %/ms); 0 (default) gives constant volume
+        profile = pressure history (time, pressure) arrays instead of dPdt;
+                  time in s from the start of the integration, only the ratio
+                  P(t)/P(0) is used (pressure may be in any units, e.g. a
+                  normalized trace); the pressure is held constant outside the
+                  given time interval
+        t_max = end of the time interval of the linear pressure rise, s
+        resolution = spacing of the isentrope table in ln(P)
+    """
+    def __init__(self, gas, dPdt=0., profile=None, t_max=1., resolution=0.01):
+        if profile is None:
+            self.dPdt = dPdt
+            rise = 1 + dPdt*t_max
+            if rise <= 0:
+                raise ValueError('pressure history becomes non-positive before t = %g s' % t_max)
+            x_range = sorted([0., np.log(rise)])
+        else:
+            self.dPdt = None
+            time = np.asarray(profile[0], dtype=float)
+            lnP = np.log(np.asarray(profile[1], dtype=float))
+            interpolant = PchipInterpolator(time, lnP)
+            lnP = lnP - interpolant(min(max(0., time[0]), time[-1]))
+            self.interval = [time[0], time[-1]]
+            self.trace = _Hermite(time, lnP, interpolant.derivative()(time))
+            x_range = [min(lnP), max(lnP)]
+
+        n = max(2, int(np.ceil((x_range[1] - x_range[0])/resolution)) + 1)
+        x = np.linspace(x_range[0], max(x_range[1], x_range[0] + resolution), n)
+        f = np.zeros(n)
+        df = np.zeros(n)
+        state0 = gas.TDY
+        P0 = gas.P
+        s0 = gas.entropy_mass
+        self.rho0 = gas.density
+        for k in range(n):
+            gas.SPY = s0, P0*np.exp(x[k]), state0[2]
+            f[k] = np.log(gas.density/self.rho0)
+            df[k] = gas.P/(gas.density*soundspeed_fr(gas)**2)
+        gas.TDY = state0
+        self.isentrope = _Hermite(x, f, df)
+
+    def pressure(self, t):
+        """
+        Returns [x, dxdt]: logarithm of the pressure ratio ln(P(t)/P(0)) and
+        its time derivative at time t (scalar or array).
+        """
+        if self.dPdt is not None:
+            rise = 1 + self.dPdt*t
+            return [np.log(rise), self.dPdt/rise]
+        [x, dxdt] = self.trace(t)
+        inside = (t >= self.interval[0]) & (t <= self.interval[1])
+        return [x, dxdt*inside]
+
+    def __call__(self, t):
+        """
+        Returns [rho, drhodt]: density (kg/m^3) and its time derivative
+        (kg/m^3/s) at time t (scalar or array).
+        """
+        [x, dxdt] = self.pressure(t)
+        [f, dfdx] = self.isentrope(x)
+        rho = self.rho0*np.exp(f)
+        return [rho, rho*dfdx*dxdt]
+
+
+class VPSys(object):
+    def __init__(self, gas, history):
+        self.gas = gas
+        self.history = history
+
+    def __call__(self, t, y):
+        """
+        Evaluates the system of ordinary differential equations for an
+        adiabatic, zero-dimensional reactor with prescribed density history
+        (see IsentropicCompression). Energy equation is
+        de = -P dv = (P/rho^2) d rho.
+        It assumes that the 'gas' object represents a reacting ideal gas mixture.
+
+        INPUT:
+            t = time
+            y = solution array [temperature, species mass 1, 2, ...]
+
+        OUTPUT:
+            An array containing time derivatives of:
+                temperature and species mass fractions,
+            formatted in a way that the integrator in vpsolve can recognize.
+
+        """
+        [rho, drhodt] = self.history(t)
+        self.gas.TDY = y[0], rho, y[1:]
+
+        # Energy/temperature equation: heat release and compression
+        cv = self.gas.cv_mass
+        a = self.gas.standard_enthalpies_RT - np.ones(self.gas.n_species)
+        b = self.gas.net_production_rates / (rho * cv)
+        dTdt = (-self.gas.T * ct.gas_constant * np.dot(a, b)
+                + self.gas.P * drhodt / (rho**2 * cv))
+
+        # Species equations
+        dYdt = self.gas.net_production_rates*self.gas.molecular_weights/rho
+
+        return np.hstack((dTdt, dYdt))
+
+    def jac(self, t, y):
+        """
+        Evaluates the Jacobian of the system defined in __call__ using
+        Cantera's analytic derivatives of net production rates with respect
+        to temperature and species concentrations (as CVSys.jac, with the
+        compression term). Derivative of the mixture heat capacity with
+        respect to temperature is evaluated by a finite difference.
+
+        INPUT:
+            t = time
+            y = solution array [temperature, species mass 1, 2, ...]
+
+        OUTPUT:
+            Jacobian matrix d(dy/dt)/dy (dense array, see CVSys.jac).
+
+        """
+        gas = self.gas
+        [rho, drhodt] = self.history(t)
+        # Heat capacity derivative
+        gas.TDY = y[0]*1.0001, rho, y[1:]
+        cv1 = gas.cv_mass
+        gas.TDY = y[0], rho, y[1:]
+        T = gas.T
+        cv = gas.cv_mass
+        dcvdT = (cv1 - cv)/(0.0001*T)
+
+        W = gas.molecular_weights
+        Wm = gas.mean_molecular_weight
+        wdot = gas.net_production_rates
+        u = ct.gas_constant*T*(gas.standard_enthalpies_RT - 1)
+        cvk = ct.gas_constant*(gas.standard_cp_R - 1)
+
+        # Derivatives of production rates at constant density, P = RT*sum(C)
+        ddP = gas.net_production_rates_ddP
+        dwdT = gas.net_production_rates_ddT + ddP*gas.P/T
+        dwdY = (gas.net_production_rates_ddCi
+                + np.outer(ddP, ct.gas_constant*T*np.ones(gas.n_species)))*(rho/W)
+
+        dTdt = -np.dot(u, wdot)/(rho*cv)
+        # compression term, P = rho*R*T/Wm
+        c = gas.P*drhodt/(rho**2*cv)
+        J = np.empty((gas.n_species + 1, gas.n_species + 1))
+        J[0, 0] = (-(np.dot(cvk, wdot) + np.dot(u, dwdT))/(rho*cv) - dTdt*dcvdT/cv
+                   + c/T - c*dcvdT/cv)
+        J[0, 1:] = (-np.dot(u, dwdY)/(rho*cv) - dTdt*cvk/(W*cv)
+                    + c*Wm/W - c*cvk/(W*cv))
+        J[1:, 0] = W*dwdT/rho
+        J[1:, 1:] = (W/rho)[:, np.newaxis]*dwdY
+
+        # Cantera clips negative mass fractions and normalizes the rest
+        # when the state is set, account for that in mass fraction derivatives
+        Y = y[1:]
+        dfdY = J[:, 1:]
+        dfdY -= np.dot(dfdY, gas.Y)[:, np.newaxis]
+        dfdY /= np.sum(Y[Y > 0])
+        dfdY[:, Y < 0] = 0
+        return J
+
+
+@profiled()
+@preserves_state('gas')
+def vpsolve(gas, dPdt=0., profile=None,
+            t_end=1e-6, max_step=1e-5, t_eval=None,
+            relTol=1e-5, absTol=1e-8, Method='LSODA',
+            jacobian='auto', ignition=None, ignition_threshold=None, t_max=None):
+    """
+    Solves the ODE system defined in VPSys, taking the gas object input as the
+    initial state (e.g. the reflected shock state) and the density history of
+    isentropic compression along the prescribed pressure history.
+
+    FUNCTION SYNTAX:
+        output = vpsolve(gas,dPdt,**kwargs)
+        output = vpsolve(gas,profile=(time,pressure),**kwargs)
+
+    INPUT:
+        gas = gas object at initial state (restored on return)
+
+    OPTIONAL INPUT:
+        dPdt = normalized rate of linear pressure rise (1/P0)(dP/dt), 1/s
+               (e.g. 20 for 2 %/ms); 0 (default) gives constant volume
+        profile = measured pressure history (time, pressure) arrays instead
+                  of dPdt, see IsentropicCompression
+        t_end = end time for integration, in sec
+        max_step = maximum time step for integration, in sec
+        t_eval = array of time values to evaluate the solution at.
+                    If left as 'None', solver will select values.
+                    Sometimes these may be too sparse for good-looking plots.
+        relTol = relative tolerance
+        absTol = absolute tolerances
+        Method = method of integration, 'LSODA' is default.
+        jacobian = 'auto' (default) to pass Jacobian from VPSys.jac to 'LSODA'
+                   and 'BDF' methods, 'analytic' to pass it to 'Radau' as well
+                   (usually slower there than the integrator's own estimate),
+                   'fd' to let the integrator estimate it by finite differences
+        ignition = ignition criterion stopping the integration shortly after
+                   ignition: 'dTdt', 'T' or species name (see ignition module);
+                   t_end is then only the first guess of the end time and is
+                   doubled while ignition has not occurred.
+                   None (default) integrates to t_end.
+        ignition_threshold = threshold of the ignition criterion
+        t_max = maximal end time with ignition criterion, 1000*t_end by default
+
+    OUTPUT:
+        output = a dictionary containing the following results:
+            time = time array
+            T = temperature profile array
+            P = pressure profile array
+            D = density profile array
+            speciesY = species mass fraction array
+            speciesX = species mole fraction array
+
+            gas = input gas object (restored to its initial state on return)
+            state = final state (T, density, Y) of the reacted gas,
+                    set with gas.TDY = output['state']
+
+            exo_time = pulse width (in secs) of temperature gradient (using 1/2 max)
+            ind_time = time to maximum temperature gradient
+            ind_time_10 = time to 10% of maximum temperature gradient
+            ind_time_90 = time to 90% of maximum temperature gradient
+    """
+    y0 = np.hstack((gas.T, gas.Y))
+    if ignition is None:
+        t_lim = t_end if t_eval is None else max(t_end, np.max(t_eval))
+    else:
+        t_lim = 1000*t_end if t_max is None else t_max
+    history = IsentropicCompression(gas, dPdt, profile, t_lim)
+
+    output = {}
+
+    system = VPSys(gas, history)
+    if (jacobian == 'auto' and Method in ('LSODA', 'BDF')
+            or jacobian == 'analytic' and Method in ('LSODA', 'Radau', 'BDF')):
+        jac = system.jac
+    else:
+        jac = None
+
+    phase('integration')
+    [t, y, ignited] = integrate(system, y0, t_end, ignition, ignition_threshold,
+                                t_max, t_eval=t_eval, method=Method, jac=jac,
+                                atol=absTol, rtol=relTol, max_step=max_step)
+    phase('post-processing')
+
+    output['time'] = t
+    output['T'] = y[0, :]
+    output['speciesY'] = y[1:, :]
+
+    b = len(output['time'])
+
+    #############################################################################
+    # Extract PRESSSURE and TEMPERATURE GRADIENT
+    #############################################################################
+
+    # Evaluate properties of all states at once
+    [rho, drhodt] = history(output['time'])
+    states = ct.SolutionArray(gas, b)
+    states.TDY = output['T'], rho, output['speciesY'].T
+    W = gas.molecular_weights
+    wt = states.mean_molecular_weight
+    e = ct.gas_constant*output['T'][:, np.newaxis]*(states.standard_enthalpies_RT/W
+                                                    - 1/wt[:, np.newaxis])
+    s = np.sum(e*W*states.net_production_rates, axis=1)
+
+    cv = states.cv_mass
+    P = states.P
+    temp_grad = -s/(rho*cv) + P*drhodt/(rho**2*cv)
+    output['P'] = P
+    output['D'] = rho
+    output['speciesX'] = states.X.T
+    output['dTdt'] = temp_grad
+    output['state'] = (output['T'][-1], output['D'][-1], output['speciesY'][:, -1])
+    output['gas'] = gas
+
+    [output['ind_time'], output['ind_time_10'], output['ind_time_90'],
+     output['exo_time']] = explosion_times(output['time'], temp_grad)
+
+    return output
@@ -39,6 +39,8 @@ Under these operating systems:
 
 import cantera as ct
 import numpy as np
+from sdtoolbox.mechcache import preserves_state
+from sdtoolbox.profiling import phase, profiled
 from sdtoolbox.thermo import soundspeed_fr
 from scipy.integrate import solve_ivp
 
@@ -125,6 +127,48 @@ def getTempDeriv(gas, r1, U1):
     return DTDt
 
 
+def _profile_properties(gas, rho, P, Y):
+    """
+    Evaluates temperature, frozen sound speed, gamma, mean molecular weight,
+    thermicity and sum of net production rates at all points of a solution
+    at once. Used by zndsolve and the stagnation module.
+
+    INPUT:
+        gas = Cantera gas object, left at the state of the last point
+        rho = density array
+        P = pressure array
+        Y = species mass fraction array (species x points)
+
+    OUTPUT:
+        [T, af, g, wt, thermicity, wdot] arrays
+    """
+    states = ct.SolutionArray(gas, len(rho))
+    states.DPY = rho, P, Y.T
+    T = states.T
+    cp = states.cp_mass
+    g = cp/states.cv_mass
+    wt = states.mean_molecular_weight
+    w = gas.molecular_weights
+    wdot = states.net_production_rates
+
+    hs = states.standard_enthalpies_RT*ct.gas_constant*T[:, np.newaxis]/w
+    dydt = wdot*w/rho[:, np.newaxis]
+    thermicity = np.sum((wt[:, np.newaxis]/w - hs/(cp*T)[:, np.newaxis])*dydt, axis=1)
+
+    if gas.thermo_model in ('ideal-gas', 'IdealGas'):
+        af = np.sqrt(g*P/rho)
+    else:
+        af = np.zeros(len(rho))
+        for i in range(len(rho)):
+            gas.DPY = rho[i], P[i], Y[:, i]
+            af[i] = soundspeed_fr(gas)
+    if len(rho):
+        gas.DPY = rho[-1], P[-1], Y[:, -1]
+    return [T, af, g, wt, thermicity, np.sum(wdot, axis=1)]
+
+
+@profiled()
+@preserves_state('gas')
 def zndsolve(gas, gas1, U1,
              t_end=1e-3, max_step=1e-4, t_eval=None,
              relTol=1e-5, absTol=1e-8,
@@ -137,7 +181,7 @@ def zndsolve(gas, gas1, U1,
     output = zndsolve(gas,gas1,U1,**kwargs)
 
     INPUT
-        gas = Cantera gas object - postshock state
+        gas = Cantera gas object - postshock state (restored on return)
         gas1 = Cantera gas object - initial state
         U1 = shock velocity (m/s)
 
@@ -195,8 +239,10 @@ def zndsolve(gas, gas1, U1,
 
     output = {}
 
+    phase('integration')
     out = solve_ivp(ZNDSys(gas, U1, r1), tel, y0, method=Method,
                     atol=absTol, rtol=relTol, max_step=max_step, t_eval=t_eval)
+    phase('post-processing')
 
     output['time'] = out.t
     output['P'] = out.y[0, :]
@@ -207,15 +253,7 @@ def zndsolve(gas, gas1, U1,
     output['tfinal'] = t_end
     output['xfinal'] = output['distance'][-1]
 
-    # Initialize additional output matrices where needed
     b = len(output['time'])
-    output['T'] = np.zeros(b)
-    output['U'] = np.zeros(b)
-    output['thermicity'] = np.zeros(b)
-    output['af'] = np.zeros(b)
-    output['g'] = np.zeros(b)
-    output['wt'] = np.zeros(b)
-    output['dTdt'] = np.zeros(b)
     if advanced_output:
         output['ind_len_ZND'] = 0
         output['ind_time_ZND'] = 0
@@ -227,24 +265,17 @@ def zndsolve(gas, gas1, U1,
     # c^2-U^2, THERMICITY, and TEMPERATURE GRADIENT
     ###########################################################################
 
-    # Have to loop for operations involving the working gas object
-    for i, P in enumerate(output['P']):
-        gas.DPY = output['rho'][i], P, output['species'][:, i]
-        af = soundspeed_fr(gas)
-        U = U1*r1/gas.density
-
-        output['T'][i] = gas.T
-        output['U'][i] = U
-        output['thermicity'][i] = getThermicity(gas)
-        output['af'][i] = af
-        output['g'][i] = gas.cp/gas.cv
-        output['wt'][i] = gas.mean_molecular_weight
-        output['dTdt'][i] = getTempDeriv(gas, r1, U1)
+    # Evaluate properties of all points at once
+    [output['T'], output['af'], output['g'], output['wt'], output['thermicity'],
+     wdot] = _profile_properties(gas, output['rho'], output['P'], output['species'])
+    output['U'] = U1*r1/output['rho']
 
     # Vectorize operations where possible
     output['M'] = output['U']/output['af']
     eta = 1 - output['M']**2
     output['sonic'] = eta*output['af']**2
+    output['dTdt'] = output['T']*((1 - output['g']*output['M']**2)*output['thermicity']/eta
+                                  - output['wt']*wdot/output['rho'])
 
     if advanced_output:
         #######################################################################